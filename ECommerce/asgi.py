@@ -3,6 +3,11 @@ ASGI config for ECommerce project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve with an ASGI server so the payment status stream can hold connections
+without tying up a worker, e.g.:
+
+    gunicorn -k uvicorn.workers.UvicornWorker ECommerce.asgi:application
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -13,4 +18,21 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ECommerce.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+
+async def application(scope, receive, send):
+    """Django app plus lifespan: run the payment status watcher per worker."""
+    if scope['type'] != 'lifespan':
+        return await django_application(scope, receive, send)
+
+    from main.payment_events import payment_hub
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            payment_hub.ensure_watcher()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            payment_hub.stop()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
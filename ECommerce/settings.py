@@ -60,6 +60,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'main.mongo_users.MongoUserMiddleware',  # lazy request.mongo_user
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -115,10 +116,45 @@ MONGODB_CONFIG = {
     'port': config('MONGODB_PORT', default=27017, cast=int),
     'database': config('MONGODB_DATABASE', default='ECommerceSU2'),
     'collection': config('MONGODB_COLLECTION', default='users'),
-    'atlas_uri': config('MONGODB_ATLAS_URI', default='')
+    'atlas_uri': config('MONGODB_ATLAS_URI', default=''),
+    # Connection pool (per gunicorn worker process)
+    'max_pool_size': config('MONGODB_MAX_POOL_SIZE', default=50, cast=int),
+    'min_pool_size': config('MONGODB_MIN_POOL_SIZE', default=0, cast=int),
+    'max_idle_time_ms': config('MONGODB_MAX_IDLE_TIME_MS', default=60000, cast=int),
+    'wait_queue_timeout_ms': config('MONGODB_WAIT_QUEUE_TIMEOUT_MS', default=0, cast=int),
+    'server_selection_timeout_ms': config('MONGODB_SERVER_SELECTION_TIMEOUT_MS', default=5000, cast=int),
+    'connect_timeout_ms': config('MONGODB_CONNECT_TIMEOUT_MS', default=5000, cast=int),
+    # Wire compression, first available wins (zstd needs zstandard, snappy needs python-snappy)
+    'compressors': config('MONGODB_COMPRESSORS', default='zstd,snappy,zlib'),
+    # primary, primaryPreferred, secondary, secondaryPreferred or nearest
+    'read_preference': config('MONGODB_READ_PREFERENCE', default='primary'),
 }
 
 
+# Cache - defaults to per-process memory; set CACHE_BACKEND/CACHE_LOCATION to a
+# shared cache (e.g. django.core.cache.backends.redis.RedisCache) in production
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='ecommerce-default'),
+    }
+}
+
+# Shop product grid
+SHOP_PAGE_SIZE = config('SHOP_PAGE_SIZE', default=12, cast=int)
+SHOP_FRAGMENT_CACHE_TTL = config('SHOP_FRAGMENT_CACHE_TTL', default=300, cast=int)
+# Hydrated wishlist cards per user (0 disables)
+WISHLIST_CACHE_TTL = config('WISHLIST_CACHE_TTL', default=300, cast=int)
+# Orders per profile history page (later pages via /api/order-history/)
+ORDER_HISTORY_PAGE_SIZE = config('ORDER_HISTORY_PAGE_SIZE', default=10, cast=int)
+
+# In-process category tree (main/category_tree.py): rebuilt on local writes,
+# after CATEGORY_TREE_TTL seconds, or on change stream events when enabled
+# (requires a replica set / Atlas)
+CATEGORY_TREE_TTL = config('CATEGORY_TREE_TTL', default=300, cast=int)
+CATEGORY_TREE_WATCH = config('CATEGORY_TREE_WATCH', default=False, cast=bool)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -269,3 +305,77 @@ DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default=EMAIL_HOST_USER)
 PAYPAL_CLIENT_ID = config('PAYPAL_CLIENT_ID', default='')
 PAYPAL_CLIENT_SECRET = config('PAYPAL_CLIENT_SECRET', default='')
 PAYPAL_ENV = config('PAYPAL_ENV', default='sandbox')  # 'sandbox' or 'live'
+# Optional endpoint override, e.g. the local `fake_paypal_server` command
+PAYPAL_BASE_URL = config('PAYPAL_BASE_URL', default='')
+# main/paypal_client.py: OAuth token refreshed this many seconds before it expires,
+# HTTP retries (connection errors, 429/5xx) and keep-alive pool size per process
+PAYPAL_TOKEN_REFRESH_MARGIN = config('PAYPAL_TOKEN_REFRESH_MARGIN', default=300, cast=int)
+PAYPAL_HTTP_RETRIES = config('PAYPAL_HTTP_RETRIES', default=3, cast=int)
+PAYPAL_POOL_SIZE = config('PAYPAL_POOL_SIZE', default=10, cast=int)
+
+# Listing totals (main/listing_totals.py): cached per normalized filter for
+# LISTING_TOTAL_CACHE_TTL seconds; unfiltered listings use the collection's
+# estimated count unless LISTING_ESTIMATE_UNFILTERED_TOTALS is off
+LISTING_TOTAL_CACHE_TTL = config('LISTING_TOTAL_CACHE_TTL', default=30, cast=int)
+LISTING_ESTIMATE_UNFILTERED_TOTALS = config('LISTING_ESTIMATE_UNFILTERED_TOTALS', default=True, cast=bool)
+
+# Django user id -> Mongo user _id mappings kept per process (main/mongo_users.py)
+MONGO_USER_ID_CACHE_SIZE = config('MONGO_USER_ID_CACHE_SIZE', default=1024, cast=int)
+
+# Notification outbox (main/notification_outbox.py); run
+# `python manage.py dispatch_notifications` as a separate worker process
+NOTIFICATION_BATCH_SIZE = config('NOTIFICATION_BATCH_SIZE', default=20, cast=int)
+NOTIFICATION_POLL_INTERVAL = config('NOTIFICATION_POLL_INTERVAL', default=2, cast=float)
+NOTIFICATION_MAX_ATTEMPTS = config('NOTIFICATION_MAX_ATTEMPTS', default=8, cast=int)
+NOTIFICATION_RETRY_BASE_SECONDS = config('NOTIFICATION_RETRY_BASE_SECONDS', default=30, cast=int)
+NOTIFICATION_LEASE_SECONDS = config('NOTIFICATION_LEASE_SECONDS', default=120, cast=int)
+
+# Public base URL used in links built outside a request (emails queued by the
+# reconcile_bakong_payments worker, which refuses to start without it when
+# DEBUG is off); views build links from the request instead
+SITE_URL = config('SITE_URL', default='http://127.0.0.1:8000' if DEBUG else '')
+
+# Bakong reconciler (main/bakong_reconciler.py); run
+# `python manage.py reconcile_bakong_payments` as a separate worker process
+BAKONG_RECONCILE_INTERVAL = config('BAKONG_RECONCILE_INTERVAL', default=3, cast=float)
+BAKONG_RECONCILE_STALE_SECONDS = config('BAKONG_RECONCILE_STALE_SECONDS', default=15, cast=int)
+BAKONG_PENDING_WINDOW = config('BAKONG_PENDING_WINDOW', default=1800, cast=int)
+BAKONG_BULK_SIZE = config('BAKONG_BULK_SIZE', default=50, cast=int)
+
+# Orders still unpaid this many seconds after checkout are cancelled and their
+# stock released by the reconcile_bakong_payments worker (main/order_service.py)
+ORDER_RESERVATION_TTL = config('ORDER_RESERVATION_TTL', default=86400, cast=int)
+
+# Payment status push (main/payment_events.py): how long one SSE / long-poll
+# request is held, keep-alive interval, and the polling fallback used when the
+# orders change stream is unavailable (standalone mongod)
+PAYMENT_STREAM_TIMEOUT = config('PAYMENT_STREAM_TIMEOUT', default=60, cast=int)
+PAYMENT_STREAM_HEARTBEAT = config('PAYMENT_STREAM_HEARTBEAT', default=15, cast=int)
+PAYMENT_STREAM_CHANGE_STREAM = config('PAYMENT_STREAM_CHANGE_STREAM', default=True, cast=bool)
+PAYMENT_STREAM_POLL_INTERVAL = config('PAYMENT_STREAM_POLL_INTERVAL', default=2, cast=float)
+
+# Server-side order pricing (main/pricing.py). Product price snapshots are
+# cached for PRICING_SNAPSHOT_TTL seconds per catalog version.
+ORDER_TAX_RATE = config('ORDER_TAX_RATE', default=0.1, cast=float)
+ORDER_SHIPPING_COST = config('ORDER_SHIPPING_COST', default=0.0, cast=float)
+PRICING_SNAPSHOT_TTL = config('PRICING_SNAPSHOT_TTL', default=30, cast=int)
+
+# Order placement (main/order_service.py): reserve stock and write the order
+# and payment in one transaction on replica sets / Atlas. Set False to use the
+# compensating (non-transactional) path everywhere.
+ORDER_USE_TRANSACTIONS = config('ORDER_USE_TRANSACTIONS', default=True, cast=bool)
+
+# Order numbers / payment transaction IDs (main/sequences.py): each worker
+# reserves this many values per counters round trip
+SEQUENCE_BLOCK_SIZE = config('SEQUENCE_BLOCK_SIZE', default=50, cast=int)
+
+# Password hashing (main/passwords.py): bcrypt cost for new hashes (existing
+# hashes are upgraded on login) and hashing threads per worker (0 = CPU count)
+BCRYPT_ROUNDS = config('BCRYPT_ROUNDS', default=12, cast=int)
+PASSWORD_HASH_WORKERS = config('PASSWORD_HASH_WORKERS', default=0, cast=int)
+
+# MongoDB last_login write-behind (main/last_login.py): pending logins are
+# written together after this many seconds or once this many are queued
+# (interval 0 writes each login immediately)
+LAST_LOGIN_FLUSH_INTERVAL = config('LAST_LOGIN_FLUSH_INTERVAL', default=5, cast=float)
+LAST_LOGIN_BUFFER_SIZE = config('LAST_LOGIN_BUFFER_SIZE', default=100, cast=int)
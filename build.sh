@@ -6,3 +6,6 @@ pip install -r requirements.txt
 
 python manage.py collectstatic --no-input
 python manage.py migrate
+
+# Create missing MongoDB indexes; fails the build if a required index is missing
+python manage.py ensure_mongo_indexes
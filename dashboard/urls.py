@@ -5,6 +5,7 @@ app_name = 'dashboard'
 
 urlpatterns = [
     path('', views.index, name='dashboard'),
+    path('metrics/', views.metrics, name='metrics'),
     path('sliders/', views.sliders_list, name='sliders_list'),
     path('sliders/create/', views.slider_create, name='slider_create'),
     path('sliders/<str:slider_id>/edit/', views.slider_edit, name='slider_edit'),
@@ -29,6 +29,22 @@ def index(request):
     }
     return render(request, 'dashboard/dashboard.html', context)
 
+@login_required
+def metrics(request):
+    """Runtime metrics for the worker process that served this request (JSON)"""
+    # Only allow superusers to access dashboard
+    if not request.user.is_superuser:
+        return JsonResponse({'success': False, 'message': 'Access denied. Superuser privileges required.'}, status=403)
+    
+    from main.mongodb_utils import mongodb_manager
+    from main.notification_outbox import queue_stats
+    return JsonResponse({
+        'success': True,
+        'pid': os.getpid(),
+        'mongo_pool': mongodb_manager.pool_stats(),
+        'notification_outbox': queue_stats(),
+    })
+
 @login_required
 def sliders_list(request):
     """Display list of all sliders from MongoDB"""
@@ -276,8 +292,9 @@ def products_list(request):
     except (ValueError, TypeError):
         page = 1
     
-    # Pagination settings
+    # Pagination settings - Previous/Next use keyset cursors, page links stay numbered
     per_page = 10
+    cursor = request.GET.get('cursor', '').strip() or None
     
     # Get categories for filter dropdown
     try:
@@ -291,6 +308,8 @@ def products_list(request):
         params = {
             'page': page,
             'page_size': per_page,
+            'cursor': cursor,
+            'fields': 'admin_row',
         }
         
         # Only add search if it's not empty
@@ -307,9 +326,12 @@ def products_list(request):
         result = api_client.get_products(**params)
         products = result.get('items', [])
         total = result.get('total', 0)
+        next_cursor = result.get('next_cursor')
+        prev_cursor = result.get('prev_cursor')
     except Exception as e:
         products = []
         total = 0
+        next_cursor = prev_cursor = None
         messages.error(request, f'Error loading products: {str(e)}')
     
     # Calculate pagination
@@ -331,6 +353,8 @@ def products_list(request):
         'has_prev': has_prev,
         'has_next': has_next,
         'per_page': per_page,
+        'next_cursor': next_cursor,
+        'prev_cursor': prev_cursor,
     }
     return render(request, 'dashboard/products_list.html', context)
 
@@ -795,7 +819,7 @@ def categories_list(request):
         messages.error(request, 'Access denied. Superuser privileges required.')
         return redirect('main:home')
     
-    api_client = get_api_client(request, use_api=True)
+    from main.mongodb_utils import mongodb_manager
     
     # Get search query
     search_query = request.GET.get('q', '').strip()
@@ -813,59 +837,10 @@ def categories_list(request):
     per_page = 10
     
     try:
-        # Get all categories (for now, we'll filter and paginate manually since API might not support it)
-        result = api_client.get_categories()
-        all_categories = result.get('items', [])
-        
-        # Apply search filter
-        if search_query:
-            search_lower = search_query.lower()
-            all_categories = [
-                cat for cat in all_categories
-                if search_lower in cat.get('name', '').lower() or 
-                   search_lower in cat.get('slug', '').lower() or
-                   search_lower in (cat.get('description', '') or '').lower()
-            ]
-        
-        # Build hierarchical structure for display
-        category_map = {}
-        top_level_categories = []
-        
-        # First pass: create map and identify top-level categories
-        for cat in all_categories:
-            category_map[cat['id']] = cat
-            cat['children'] = []
-            cat['level'] = 0
-        
-        # Second pass: build tree and calculate levels
-        for cat in all_categories:
-            parent_id = cat.get('parent_id')
-            if parent_id and parent_id in category_map:
-                # This is a child category
-                category_map[parent_id]['children'].append(cat)
-                # Calculate level based on parent
-                parent = category_map[parent_id]
-                cat['level'] = parent.get('level', 0) + 1
-            else:
-                # This is a top-level category
-                top_level_categories.append(cat)
-        
-        # Flatten tree for display (maintaining hierarchy order)
-        def flatten_categories(cats, result_list):
-            for cat in sorted(cats, key=lambda x: x.get('sort_order', 0)):
-                result_list.append(cat)
-                if cat['children']:
-                    flatten_categories(cat['children'], result_list)
-        
-        categories_flat = []
-        flatten_categories(top_level_categories, categories_flat)
-        
-        total = len(categories_flat)
-        
-        # Manual pagination
-        start = (page - 1) * per_page
-        end = start + per_page
-        categories = categories_flat[start:end]
+        # One page in tree order (with 'level'), substring-searched from the tree snapshot
+        result = mongodb_manager.category_tree.admin_page(search=search_query, page=page, page_size=per_page)
+        categories = result['items']
+        total = result['total']
         
     except Exception as e:
         categories = []
@@ -1295,14 +1270,17 @@ def orders_list(request):
     except (ValueError, TypeError):
         page = 1
     
-    # Pagination settings
+    # Pagination settings - Previous/Next use keyset cursors, page links stay numbered
     per_page = 10
+    cursor = request.GET.get('cursor', '').strip() or None
     
     try:
         # Build query parameters
         params = {
             'page': page,
             'page_size': per_page,
+            'cursor': cursor,
+            'fields': 'admin_row',
         }
         
         if status_filter:
@@ -1315,9 +1293,12 @@ def orders_list(request):
         result = api_client.get_orders(**params)
         orders = result.get('items', [])
         total = result.get('total', 0)
+        next_cursor = result.get('next_cursor')
+        prev_cursor = result.get('prev_cursor')
     except Exception as e:
         orders = []
         total = 0
+        next_cursor = prev_cursor = None
         messages.error(request, f'Error loading orders: {str(e)}')
     
     # Calculate pagination
@@ -1348,6 +1329,8 @@ def orders_list(request):
         'has_prev': has_prev,
         'has_next': has_next,
         'per_page': per_page,
+        'next_cursor': next_cursor,
+        'prev_cursor': prev_cursor,
     }
     return render(request, 'dashboard/orders_list.html', context)
 
@@ -1376,14 +1359,17 @@ def payments_list(request):
     except (ValueError, TypeError):
         page = 1
     
-    # Pagination settings
+    # Pagination settings - Previous/Next use keyset cursors, page links stay numbered
     per_page = 10
+    cursor = request.GET.get('cursor', '').strip() or None
     
     try:
         # Build query parameters
         params = {
             'page': page,
             'page_size': per_page,
+            'cursor': cursor,
+            'fields': 'admin_row',
         }
         
         if status_filter:
@@ -1396,9 +1382,12 @@ def payments_list(request):
         result = api_client.get_payments(**params)
         payments = result.get('items', [])
         total = result.get('total', 0)
+        next_cursor = result.get('next_cursor')
+        prev_cursor = result.get('prev_cursor')
     except Exception as e:
         payments = []
         total = 0
+        next_cursor = prev_cursor = None
         messages.error(request, f'Error loading payments: {str(e)}')
     
     # Calculate pagination
@@ -1428,6 +1417,8 @@ def payments_list(request):
         'has_prev': has_prev,
         'has_next': has_next,
         'per_page': per_page,
+        'next_cursor': next_cursor,
+        'prev_cursor': prev_cursor,
     }
     return render(request, 'dashboard/payments_list.html', context)
 
@@ -1457,68 +1448,32 @@ def users_list(request):
     except (ValueError, TypeError):
         page = 1
     
-    # Pagination settings
+    # Pagination settings - Previous/Next use keyset cursors, page links stay numbered
     per_page = 10
+    cursor = request.GET.get('cursor', '').strip() or None
     
     try:
-        # Get all users from MongoDB
-        all_mongo_users = mongodb_manager.get_all_users()
-        
-        # Also get Django users for sync
-        django_users = {u.username: u for u in User.objects.all()}
-        
-        # Format users
-        formatted_users = []
-        for mongo_user in all_mongo_users:
-            user_dict = {
-                'id': str(mongo_user.get('_id')),
-                'username': mongo_user.get('username', ''),
-                'email': mongo_user.get('email', ''),
-                'first_name': mongo_user.get('first_name', ''),
-                'last_name': mongo_user.get('last_name', ''),
-                'is_active': mongo_user.get('is_active', True),
-                'is_staff': mongo_user.get('is_staff', False),
-                'is_superuser': mongo_user.get('is_superuser', False),
-                'date_joined': mongo_user.get('date_joined'),
-                'last_login': mongo_user.get('last_login'),
-                'phone': mongo_user.get('phone', ''),
-            }
-            
-            # Sync with Django user if exists
-            if user_dict['username'] in django_users:
-                django_user = django_users[user_dict['username']]
-                user_dict['django_user_id'] = django_user.id
-            
-            formatted_users.append(user_dict)
-        
-        # Apply search filter
-        if search_query:
-            search_lower = search_query.lower()
-            formatted_users = [
-                u for u in formatted_users
-                if search_lower in u.get('username', '').lower() or
-                   search_lower in u.get('email', '').lower() or
-                   search_lower in (u.get('first_name', '') or '').lower() or
-                   search_lower in (u.get('last_name', '') or '').lower()
-            ]
-        
-        # Apply role filter
-        if role_filter:
-            if role_filter == 'admin':
-                formatted_users = [u for u in formatted_users if u.get('is_staff') or u.get('is_superuser')]
-            elif role_filter == 'normal':
-                formatted_users = [u for u in formatted_users if not u.get('is_staff') and not u.get('is_superuser')]
-        
-        total = len(formatted_users)
+        # Filter, search (username/email prefix) and page in MongoDB
+        result = mongodb_manager.search_users(
+            search=search_query, role=role_filter or None, page=page, page_size=per_page, cursor=cursor,
+        )
+        users = result['items']
+        total = result['total']
+        next_cursor = result['next_cursor']
+        prev_cursor = result['prev_cursor']
         
-        # Manual pagination
-        start = (page - 1) * per_page
-        end = start + per_page
-        users = formatted_users[start:end]
+        # Django ids for this page only
+        django_ids = dict(
+            User.objects.filter(username__in=[u['username'] for u in users]).values_list('username', 'id')
+        )
+        for user_dict in users:
+            if user_dict['username'] in django_ids:
+                user_dict['django_user_id'] = django_ids[user_dict['username']]
         
     except Exception as e:
         users = []
         total = 0
+        next_cursor = prev_cursor = None
         messages.error(request, f'Error loading users: {str(e)}')
     
     # Calculate pagination
@@ -1537,6 +1492,8 @@ def users_list(request):
         'has_prev': has_prev,
         'has_next': has_next,
         'per_page': per_page,
+        'next_cursor': next_cursor,
+        'prev_cursor': prev_cursor,
     }
     return render(request, 'dashboard/users_list.html', context)
 
@@ -2,6 +2,7 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAuthenticatedOrReadOnly
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 from django.contrib.auth import get_user_model
 from django.contrib.auth import login, logout
 from .models import UserAddress, UserProfile, UserSession, UserActivity
@@ -12,10 +13,38 @@ from .serializers import (
 from .product_serializers import ProductSerializer
 from .category_serializers import CategorySerializer
 from .mongodb_utils import mongodb_manager
+from . import services
 
 User = get_user_model()
 
 
+def _paginated_response(request, result, page, page_size):
+    """
+    Build a DRF-style paginated response from a MongoDB list result.
+
+    next/previous keep every query parameter. Requests that pass `cursor` get
+    keyset links; page-number requests keep getting page links.
+    """
+    # Relative links: internal API calls use a synthetic host that is not in ALLOWED_HOSTS
+    url = request.get_full_path()
+    next_cursor = result.get('next_cursor')
+    prev_cursor = result.get('prev_cursor')
+    if request.query_params.get('cursor'):
+        next_link = replace_query_param(remove_query_param(url, 'page'), 'cursor', next_cursor) if next_cursor else None
+        previous_link = replace_query_param(remove_query_param(url, 'page'), 'cursor', prev_cursor) if prev_cursor else None
+    else:
+        next_link = replace_query_param(url, 'page', page + 1) if page * page_size < result['total'] else None
+        previous_link = replace_query_param(url, 'page', page - 1) if page > 1 else None
+    return Response({
+        'count': result['total'],
+        'next': next_link,
+        'previous': previous_link,
+        'next_cursor': next_cursor,
+        'previous_cursor': prev_cursor,
+        'results': result['items']
+    })
+
+
 class UserViewSet(viewsets.ModelViewSet):
     """ViewSet for User model"""
     queryset = User.objects.all()
@@ -156,8 +185,10 @@ class ProductAPIViewSet(viewsets.ViewSet):
         date_to = request.query_params.get('date_to', '').strip() or None
         page = int(request.query_params.get('page', 1))
         page_size = int(request.query_params.get('page_size', 20))
+        cursor = request.query_params.get('cursor') or None
+        fields = request.query_params.get('fields') or 'detail'
         
-        result = mongodb_manager.list_products(
+        result = services.list_products(
             category=category,
             search=search,
             max_price=max_price,
@@ -165,15 +196,12 @@ class ProductAPIViewSet(viewsets.ViewSet):
             date_from=date_from,
             date_to=date_to,
             page=page,
-            page_size=page_size
+            page_size=page_size,
+            cursor=cursor,
+            fields=fields
         )
         
-        return Response({
-            'count': result['total'],
-            'next': None if len(result['items']) < page_size else f"?page={page + 1}",
-            'previous': None if page == 1 else f"?page={page - 1}",
-            'results': result['items']
-        })
+        return _paginated_response(request, result, page, page_size)
     
     def create(self, request):
         """Create a new product"""
@@ -185,7 +213,7 @@ class ProductAPIViewSet(viewsets.ViewSet):
     
     def retrieve(self, request, pk=None):
         """Get single product by ID"""
-        product = mongodb_manager.get_product_by_id(str(pk))
+        product = services.get_product(pk)
         if not product:
             return Response(
                 {'error': 'Product not found'},
@@ -243,39 +271,39 @@ class ProductAPIViewSet(viewsets.ViewSet):
         result = mongodb_manager.list_products(
             sort_by='newest',
             page=1,
-            page_size=4
+            page_size=4,
+            fields='card'
         )
         return Response({'results': result['items']})
     
     @action(detail=False, methods=['get'], permission_classes=[AllowAny])
     def new_arrivals(self, request):
         """Get new arrivals"""
-        result = mongodb_manager.list_products(
-            sort_by='newest',
-            page=1,
-            page_size=4
-        )
-        return Response({'results': result['items']})
+        return Response({'results': services.new_arrivals(limit=4)})
+    
+    @action(detail=False, methods=['get'], permission_classes=[AllowAny])
+    def autocomplete(self, request):
+        """Get product name suggestions for a search prefix"""
+        prefix = (request.query_params.get('q') or '').strip()
+        try:
+            # .limit(0) would return every match
+            limit = max(1, min(int(request.query_params.get('limit', 8)), 20))
+        except (TypeError, ValueError):
+            limit = 8
+        if len(prefix) < 2:
+            return Response({'results': []})
+        return Response({'results': mongodb_manager.autocomplete_products(prefix, limit=limit)})
     
     @action(detail=True, methods=['get'], permission_classes=[AllowAny])
     def related(self, request, pk=None):
         """Get related products"""
-        product = mongodb_manager.get_product_by_id(str(pk))
-        if not product:
+        related = services.related_products(pk)
+        if related is None:
             return Response(
                 {'error': 'Product not found'},
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        related = []
-        if product.get('category_id'):
-            rel_result = mongodb_manager.list_products(
-                category=product['category_id'],
-                page=1,
-                page_size=4
-            )
-            related = [p for p in rel_result['items'] if p['id'] != product['id']][:4]
-        
         return Response({'results': related})
 
 
@@ -296,26 +324,25 @@ class OrderAPIViewSet(viewsets.ViewSet):
         date_to = request.query_params.get('date_to')
         page = int(request.query_params.get('page', 1))
         page_size = int(request.query_params.get('page_size', 20))
+        cursor = request.query_params.get('cursor') or None
+        fields = request.query_params.get('fields') or 'detail'
         
-        result = mongodb_manager.list_orders(
+        result = services.list_orders(
             user_id=user_id,
             status=status,
             date_from=date_from,
             date_to=date_to,
             page=page,
-            page_size=page_size
+            page_size=page_size,
+            cursor=cursor,
+            fields=fields
         )
         
-        return Response({
-            'count': result['total'],
-            'next': None if len(result['items']) < page_size else f"?page={page + 1}",
-            'previous': None if page == 1 else f"?page={page - 1}",
-            'results': result['items']
-        })
+        return _paginated_response(request, result, page, page_size)
     
     def retrieve(self, request, pk=None):
         """Get single order by ID"""
-        order = mongodb_manager.get_order_by_id(str(pk))
+        order = services.get_order(pk)
         if not order:
             return Response(
                 {'error': 'Order not found'},
@@ -342,27 +369,26 @@ class PaymentAPIViewSet(viewsets.ViewSet):
         date_to = request.query_params.get('date_to')
         page = int(request.query_params.get('page', 1))
         page_size = int(request.query_params.get('page_size', 20))
+        cursor = request.query_params.get('cursor') or None
+        fields = request.query_params.get('fields') or 'detail'
         
-        result = mongodb_manager.list_payments(
+        result = services.list_payments(
             order_id=order_id,
             user_id=user_id,
             status=status,
             date_from=date_from,
             date_to=date_to,
             page=page,
-            page_size=page_size
+            page_size=page_size,
+            cursor=cursor,
+            fields=fields
         )
         
-        return Response({
-            'count': result['total'],
-            'next': None if len(result['items']) < page_size else f"?page={page + 1}",
-            'previous': None if page == 1 else f"?page={page - 1}",
-            'results': result['items']
-        })
+        return _paginated_response(request, result, page, page_size)
     
     def retrieve(self, request, pk=None):
         """Get single payment by ID"""
-        payment = mongodb_manager.get_payment_by_id(str(pk))
+        payment = services.get_payment(pk)
         if not payment:
             return Response(
                 {'error': 'Payment not found'},
@@ -390,8 +416,8 @@ class CategoryAPIViewSet(viewsets.ViewSet):
         if is_active is not None:
             is_active_bool = is_active.lower() == 'true'
         
-        categories = mongodb_manager.list_categories(
-            parent_id=parent_id if parent_id else None,
+        categories = services.list_categories(
+            parent_id=parent_id,
             is_active=is_active_bool,
             top_level_only=top_level_only
         )
@@ -414,7 +440,7 @@ class CategoryAPIViewSet(viewsets.ViewSet):
     
     def retrieve(self, request, pk=None):
         """Get single category by ID"""
-        category = mongodb_manager.get_category_by_id(str(pk))
+        category = services.get_category(pk)
         if not category:
             return Response(
                 {'error': 'Category not found'},
@@ -469,21 +495,7 @@ class CategoryAPIViewSet(viewsets.ViewSet):
     @action(detail=False, methods=['get'], permission_classes=[AllowAny])
     def tree(self, request):
         """Get category tree (hierarchical structure)"""
-        all_categories = mongodb_manager.list_categories(is_active=True)
-        
-        # Build tree structure
-        category_dict = {cat['id']: {**cat, 'children': []} for cat in all_categories}
-        root_categories = []
-        
-        for cat in all_categories:
-            if cat['parent_id']:
-                parent = category_dict.get(cat['parent_id'])
-                if parent:
-                    parent['children'].append(category_dict[cat['id']])
-            else:
-                root_categories.append(category_dict[cat['id']])
-        
-        return Response({'results': root_categories})
+        return Response({'results': services.category_tree()})
 
 
 # MongoDB FAQ API Views
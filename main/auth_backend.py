@@ -1,6 +1,7 @@
 from django.contrib.auth.backends import BaseBackend
 from django.contrib.auth import get_user_model
 from .mongodb_utils import mongodb_manager
+from .user_sync import sync_django_user
 from django.contrib.auth.hashers import make_password, check_password
 
 User = get_user_model()
@@ -23,38 +24,14 @@ class MongoDBBackend(BaseBackend):
         if not mongo_user.get('is_active', True):
             return None
         
-        # Verify password
-        if mongodb_manager.verify_password(username, password):
-            # Update last login
-            mongodb_manager.update_last_login(username)
-            
-            # Create or get Django User object
-            django_user, created = User.objects.get_or_create(
-                username=username,
-                defaults={
-                    'email': mongo_user.get('email', ''),
-                    'first_name': mongo_user.get('first_name', ''),
-                    'last_name': mongo_user.get('last_name', ''),
-                    'is_active': mongo_user.get('is_active', True),
-                    'is_staff': mongo_user.get('is_staff', False),
-                    'is_superuser': mongo_user.get('is_superuser', False),
-                    'date_joined': mongo_user.get('date_joined'),
-                    'last_login': mongo_user.get('last_login'),
-                }
-            )
-            
-            # Update Django user if not created
-            if not created:
-                django_user.email = mongo_user.get('email', '')
-                django_user.first_name = mongo_user.get('first_name', '')
-                django_user.last_name = mongo_user.get('last_name', '')
-                django_user.is_active = mongo_user.get('is_active', True)
-                django_user.is_staff = mongo_user.get('is_staff', False)
-                django_user.is_superuser = mongo_user.get('is_superuser', False)
-                django_user.last_login = mongo_user.get('last_login')
-                django_user.save()
-            
-            return django_user
+        # Verify password against the document already loaded (hashing runs in
+        # the bounded bcrypt pool, see main/passwords.py)
+        if mongodb_manager.check_user_password(mongo_user, password):
+            # Batched write (main/last_login.py)
+            mongodb_manager.stamp_last_login(username)
+
+            # Create or get Django User object, saving only fields that changed
+            return sync_django_user(mongo_user)
         
         return None
     
@@ -0,0 +1,178 @@
+"""
+Server-side reconciliation of pending Bakong KHQR payments.
+
+Instead of every open payment page asking Bakong about its own md5 hash, the
+`reconcile_bakong_payments` worker collects the md5 hashes of all recently
+updated pending payments and checks them in batches of up to
+BAKONG_BULK_SIZE with KHQR.check_bulk_payments, once every
+BAKONG_RECONCILE_INTERVAL seconds. The outcome is stored on the payment:
+
+  status             -> 'completed' once Bakong reports it paid
+  bakong_checked_at  -> last time the reconciler asked Bakong
+
+check_payment_status then only reads Mongo. If the worker is not running
+(bakong_checked_at older than BAKONG_RECONCILE_STALE_SECONDS) the view
+falls back to check_one() so payments still complete.
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.urls import reverse
+from decouple import config
+from pymongo import DESCENDING
+
+from . import notification_outbox
+from .mongodb_utils import mongodb_manager
+from .payment_events import payment_hub
+
+
+_khqr = None
+
+
+def _get_khqr():
+    """Return a process-wide KHQR client (raises ImportError/ValueError if unavailable)."""
+    global _khqr
+    if _khqr is None:
+        from bakong_khqr import KHQR
+        bakong_token = config('BAKONG_TOKEN', default='', cast=str).strip()
+        if not bakong_token:
+            raise ValueError('Bakong token not configured. Please check your .env file.')
+        _khqr = KHQR(bakong_token)
+    return _khqr
+
+
+def latest_payment(order_id, projection=None):
+    """Return the newest payment document for an order."""
+    from bson import ObjectId
+    return mongodb_manager.payments_collection.find_one(
+        {'order_id': ObjectId(order_id)}, projection, sort=[('created_at', DESCENDING)],
+    )
+
+
+def _pending_query():
+    window = timedelta(seconds=getattr(settings, 'BAKONG_PENDING_WINDOW', 1800))
+    return {
+        'status': 'pending',
+        'payment_details.md5_hash': {'$exists': True},
+        'updated_at': {'$gte': datetime.utcnow() - window},
+    }
+
+
+def order_url(order_id):
+    """Absolute order page URL for links built outside a request (needs SITE_URL)."""
+    if not settings.SITE_URL:
+        raise ImproperlyConfigured('SITE_URL must be set to build order links outside a request')
+    return settings.SITE_URL.rstrip('/') + reverse('main:order_detail', args=[order_id])
+
+
+def mark_paid(payment_doc, order_link=None):
+    """
+    Complete a paid Bakong payment and its order, then queue notifications.
+
+    The payment is only flipped from pending once, so the worker and the
+    fallback path in the view can race without double notifications.
+    order_link is the order page URL from the request, when there is one;
+    the worker falls back to SITE_URL. Returns True if this call completed it.
+    """
+    now = datetime.utcnow()
+    result = mongodb_manager.payments_collection.update_one(
+        {'_id': payment_doc['_id'], 'status': 'pending'},
+        {'$set': {'status': 'completed', 'updated_at': now, 'bakong_checked_at': now}},
+    )
+    if result.modified_count == 0:
+        return False
+
+    order_id = str(payment_doc.get('order_id'))
+    mongodb_manager.update_order_status(order_id, 'completed', payment_status='completed')
+    mongodb_manager.update_order(order_id, {'payment_method': 'Bakong'})
+    # Wake payment pages streaming from this process (others see the change stream)
+    payment_hub.publish(order_id, 'completed')
+
+    order = mongodb_manager.get_order_by_id(order_id) or {}
+    user = mongodb_manager.get_user_by_id(str(payment_doc.get('user_id'))) or {}
+    customer_name = f"{user.get('first_name', '')} {user.get('last_name', '')}".strip() or user.get('username', '')
+    try:
+        if user.get('email'):
+            notification_outbox.enqueue_email(
+                'payment_received', order_id, user['email'],
+                f"Payment received for Order {order.get('order_number', order_id)}",
+                'emails/payment_received.html',
+                {
+                    'user_name': customer_name,
+                    'order_number': order.get('order_number', order_id),
+                    'total_amount': f"${order.get('total_amount', 0):.2f}",
+                    'payment_method': 'Bakong',
+                    'order_url': order_link or order_url(order_id),
+                    'cta_label': 'View your order',
+                    'headline': 'Payment received ✔',
+                    'subtext': 'Your order is now being processed.'
+                },
+            )
+        notification_outbox.enqueue_telegram('payment_received', order_id, 'payment', {
+            'order_number': order.get('order_number', order_id),
+            'total_amount': order.get('total_amount', 0),
+            'payment_method': 'Bakong',
+            'customer_name': customer_name,
+            'customer_email': user.get('email', ''),
+            'items': order.get('items', []),
+        })
+    except Exception as e:
+        print(f"Error queueing Bakong payment notifications for order {order_id}: {e}")
+    return True
+
+
+def _mark_checked(payment_ids):
+    if payment_ids:
+        mongodb_manager.payments_collection.update_many(
+            {'_id': {'$in': payment_ids}, 'status': 'pending'},
+            {'$set': {'bakong_checked_at': datetime.utcnow()}},
+        )
+
+
+def reconcile_pending():
+    """
+    Check every recently active pending Bakong payment in bulk.
+
+    Returns {'checked', 'paid'} counts.
+    """
+    khqr = _get_khqr()
+    docs = list(mongodb_manager.payments_collection.find(
+        _pending_query(), {'order_id': 1, 'user_id': 1, 'payment_details.md5_hash': 1},
+    ))
+    bulk_size = getattr(settings, 'BAKONG_BULK_SIZE', 50)
+    checked = paid = 0
+    for start in range(0, len(docs), bulk_size):
+        batch = docs[start:start + bulk_size]
+        by_md5 = {doc['payment_details']['md5_hash']: doc for doc in batch}
+        try:
+            paid_hashes = set(khqr.check_bulk_payments(list(by_md5)) or [])
+        except Exception as e:
+            print(f"Bakong bulk payment check failed: {e}")
+            continue
+        checked += len(batch)
+        for md5_hash in paid_hashes:
+            doc = by_md5.get(md5_hash)
+            if doc and mark_paid(doc):
+                paid += 1
+        _mark_checked([doc['_id'] for md5_hash, doc in by_md5.items() if md5_hash not in paid_hashes])
+    return {'checked': checked, 'paid': paid}
+
+
+def check_one(payment_doc, order_link=None):
+    """Ask Bakong about a single payment (fallback when the worker is not running)."""
+    md5_hash = (payment_doc.get('payment_details') or {}).get('md5_hash')
+    payment_status = _get_khqr().check_payment(md5_hash)
+    if payment_status in ('PAID', 'paid'):
+        mark_paid(payment_doc, order_link)
+        return True
+    _mark_checked([payment_doc['_id']])
+    return False
+
+
+def is_stale(payment_doc):
+    """True if the reconciler has not looked at this payment recently."""
+    # A QR generated moments ago has not been picked up by the worker yet
+    last_seen = payment_doc.get('bakong_checked_at') or payment_doc.get('updated_at')
+    stale_after = timedelta(seconds=getattr(settings, 'BAKONG_RECONCILE_STALE_SECONDS', 15))
+    return last_seen is None or datetime.utcnow() - last_seen > stale_after
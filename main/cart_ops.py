@@ -0,0 +1,176 @@
+"""
+Delta updates for the per-user cart document.
+
+A cart is one document per user: {user_id, cart_data: [line, ...], version}.
+A line is identified by (id, size, color). Instead of rewriting cart_data on
+every click, clients send operations that touch a single line:
+
+  {'op': 'add',    'item': {...line...}}          $inc quantity, or $push the line
+  {'op': 'update', 'item': {id, size, color},
+                   'set': {'quantity': n, 'selected': bool}}   positional $set
+  {'op': 'remove', 'item': {id, size, color}}     $pull
+  {'op': 'clear'}                                  $set cart_data: []
+
+Every applied operation increments `version`. A batch may carry the version
+the client last saw; each operation is then guarded on the expected version,
+so a write from another tab makes the batch stop with a conflict. The client
+takes the returned cart and version and re-sends the operations it still
+has (deltas rebase cleanly).
+"""
+from datetime import datetime
+
+from pymongo.errors import DuplicateKeyError
+
+
+LINE_FIELDS = ('id', 'name', 'price', 'compare_price', 'quantity', 'size', 'color', 'image', 'selected')
+UPDATABLE_FIELDS = ('quantity', 'selected')
+MAX_QUANTITY = 99
+MAX_OPS = 50
+
+
+class CartOpError(ValueError):
+    """An operation that cannot be applied (bad op name or missing item)."""
+
+
+def _quantity(value, default=1):
+    try:
+        quantity = int(value)
+    except (TypeError, ValueError):
+        quantity = default
+    return max(1, min(quantity, MAX_QUANTITY))
+
+
+def line_key(item):
+    """The fields identifying a cart line, as a $elemMatch/$pull condition."""
+    if not isinstance(item, dict) or not item.get('id'):
+        raise CartOpError('Cart operation needs an item with an id')
+    return {
+        'id': str(item['id']),
+        'size': item.get('size') or 'Standard',
+        'color': item.get('color') or 'Default',
+    }
+
+
+def normalize_line(item):
+    """Keep only known line fields, with the key fields and quantity normalized."""
+    line = {field: item[field] for field in LINE_FIELDS if field in item}
+    line.update(line_key(item))
+    line['quantity'] = _quantity(item.get('quantity'))
+    line['selected'] = bool(item.get('selected', False))
+    return line
+
+
+def _version_filter(version):
+    # Carts saved before versioning have no version field
+    return {'$in': [0, None]} if version == 0 else version
+
+
+def _apply_one(collection, owner_id, op, version):
+    """
+    Apply one operation. Returns True if the cart changed, False if the
+    operation did not match anything (the version guard or a missing line).
+    """
+    if not isinstance(op, dict):
+        raise CartOpError('Cart operations must be objects')
+    kind = op.get('op')
+    query = {'user_id': owner_id}
+    if version is not None:
+        query['version'] = _version_filter(version)
+    now = datetime.utcnow()
+
+    if kind == 'add':
+        line = normalize_line(op.get('item'))
+        key = line_key(line)
+        for _ in range(2):
+            result = collection.update_one(
+                dict(query, cart_data={'$elemMatch': key}),
+                {'$inc': {'cart_data.$.quantity': line['quantity'], 'version': 1}, '$set': {'updated_at': now}},
+            )
+            if result.matched_count:
+                return True
+            try:
+                result = collection.update_one(
+                    dict(query, cart_data={'$not': {'$elemMatch': key}}),
+                    {
+                        '$push': {'cart_data': line},
+                        '$inc': {'version': 1},
+                        '$set': {'updated_at': now},
+                        '$setOnInsert': {'created_at': now},
+                    },
+                    # Only a client that has never seen a cart may create one
+                    upsert=version in (None, 0),
+                )
+                return result.matched_count > 0 or result.upserted_id is not None
+            except DuplicateKeyError:
+                # The cart exists and the line appeared between the two updates
+                continue
+        return False
+
+    if kind == 'update':
+        values = op.get('set') if isinstance(op.get('set'), dict) else {}
+        changes = {f'cart_data.$.{field}': values[field] for field in UPDATABLE_FIELDS if field in values}
+        if 'cart_data.$.quantity' in changes:
+            changes['cart_data.$.quantity'] = _quantity(changes['cart_data.$.quantity'])
+        if 'cart_data.$.selected' in changes:
+            changes['cart_data.$.selected'] = bool(changes['cart_data.$.selected'])
+        if not changes:
+            raise CartOpError('Update needs quantity or selected')
+        changes['updated_at'] = now
+        result = collection.update_one(
+            dict(query, cart_data={'$elemMatch': line_key(op.get('item'))}),
+            {'$set': changes, '$inc': {'version': 1}},
+        )
+        return result.matched_count > 0
+
+    if kind == 'remove':
+        result = collection.update_one(
+            query, {'$pull': {'cart_data': line_key(op.get('item'))}, '$inc': {'version': 1}, '$set': {'updated_at': now}},
+        )
+        return result.matched_count > 0
+
+    if kind == 'clear':
+        result = collection.update_one(
+            query, {'$set': {'cart_data': [], 'updated_at': now}, '$inc': {'version': 1}},
+        )
+        return result.matched_count > 0
+
+    raise CartOpError(f'Unknown cart operation: {kind}')
+
+
+def apply_ops(collection, owner_id, ops, version=None):
+    """
+    Apply a batch of operations in order.
+
+    Returns {'processed', 'version', 'conflict', 'cart'}. On a conflict,
+    `processed` is how many operations went through before it (the client
+    re-sends the rest) and `cart` is the server copy to adopt; otherwise
+    `cart` is None.
+    """
+    if len(ops) > MAX_OPS:
+        raise CartOpError(f'At most {MAX_OPS} operations per batch')
+    processed = 0
+    conflict = False
+    for op in ops:
+        if _apply_one(collection, owner_id, op, version):
+            processed += 1
+            if version is not None:
+                version += 1
+            continue
+        if version is not None:
+            doc = collection.find_one({'user_id': owner_id}, {'version': 1})
+            current = (doc.get('version') or 0) if doc else 0
+            if current != version:
+                conflict = True
+                break
+        # Nothing to change (e.g. updating a line another tab removed) - skip it
+        processed += 1
+
+    doc = collection.find_one(
+        {'user_id': owner_id}, {'version': 1, 'cart_data': 1} if conflict else {'version': 1},
+    ) or {}
+    return {
+        'processed': processed,
+        'version': doc.get('version') or 0,
+        'conflict': conflict,
+        'cart': doc.get('cart_data', []) if conflict else None,
+    }
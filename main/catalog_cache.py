@@ -0,0 +1,89 @@
+"""
+Cache helpers for rendered catalog fragments.
+
+Shop product-grid fragments are cached per (filter, sort, page) under a key
+that embeds the current catalog version. MongoDBManager bumps the version on
+every product or category write, which orphans all cached fragments at once
+instead of hunting down individual keys.
+
+Hydrated wishlists are cached per user (WISHLIST_CACHE_TTL) tagged with the
+catalog version they were built from; wishlist writes drop the user's entry.
+
+The version lives in the Django cache. With the default per-process LocMemCache
+other gunicorn workers only see a bump once their own copies expire
+(SHOP_FRAGMENT_CACHE_TTL), so multi-worker deployments should point CACHE_BACKEND
+at a shared cache such as Redis or Memcached.
+"""
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+CATALOG_VERSION_KEY = 'catalog:version'
+
+
+def get_catalog_version():
+    """Return the current catalog version, initializing it if needed."""
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # Seed from the clock so an evicted counter never reuses an old version
+        cache.add(CATALOG_VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    """Invalidate every cached catalog fragment."""
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        # Key missing (never read yet or evicted)
+        cache.set(CATALOG_VERSION_KEY, int(time.time() * 1000), None)
+    except Exception as e:
+        print(f"Error bumping catalog cache version: {e}")
+
+
+def fragment_key(prefix, params):
+    """Return a versioned cache key for a fragment rendered from params."""
+    raw = json.dumps(params, sort_keys=True, default=str)
+    digest = hashlib.sha1(raw.encode('utf-8')).hexdigest()
+    return f'{prefix}:v{get_catalog_version()}:{digest}'
+
+
+def get_or_build(prefix, params, builder):
+    """Return the cached fragment for params, calling builder() on a miss."""
+    key = fragment_key(prefix, params)
+    value = cache.get(key)
+    if value is None:
+        value = builder()
+        cache.set(key, value, getattr(settings, 'SHOP_FRAGMENT_CACHE_TTL', 300))
+    return value
+
+
+def wishlist_key(user_id):
+    return f'wishlist:{user_id}'
+
+
+def get_cached_wishlist(user_id):
+    """Return a user's cached wishlist cards, or None if missing or built from an older catalog."""
+    entry = cache.get(wishlist_key(user_id))
+    if entry and entry.get('version') == get_catalog_version():
+        return entry['items']
+    return None
+
+
+def set_cached_wishlist(user_id, items):
+    ttl = getattr(settings, 'WISHLIST_CACHE_TTL', 300)
+    if ttl:
+        cache.set(wishlist_key(user_id), {'version': get_catalog_version(), 'items': items}, ttl)
+
+
+def forget_wishlist(user_id):
+    """Drop a user's cached wishlist after it changes."""
+    try:
+        cache.delete(wishlist_key(user_id))
+    except Exception as e:
+        print(f"Error clearing wishlist cache: {e}")
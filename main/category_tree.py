@@ -0,0 +1,248 @@
+"""
+In-process category tree index.
+
+Categories change rarely but are read on every category-filtered product
+query, the shop sidebar, the dashboard list and the tree API. The index loads
+the whole collection once, precomputes ancestor paths and descendant sets,
+and serves every lookup from memory.
+
+A snapshot is rebuilt when:
+  - MongoDBManager.create/update/delete_category calls invalidate() (this process),
+  - the optional change stream watcher sees a write (any process), or
+  - it is older than CATEGORY_TREE_TTL seconds (fallback when change streams
+    are unavailable, e.g. a standalone mongod).
+
+The dashboard list pages through the precomputed tree order. Its search is a
+case-insensitive substring match on name, slug and description, run against
+lowercased copies of those fields built once per snapshot.
+"""
+import os
+import threading
+import time
+
+from bson import ObjectId
+from django.conf import settings
+
+
+SEARCH_FIELDS = ('name', 'slug', 'description')
+
+
+class _TreeSnapshot:
+    """Immutable view of the category hierarchy at one point in time."""
+
+    def __init__(self, categories, version):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        # categories arrive sorted by sort_order, so children lists are too
+        self.nodes = {cat['id']: cat for cat in categories}
+        self.children = {cat_id: [] for cat_id in self.nodes}
+        self.roots = []
+        for cat in categories:
+            parent_id = cat.get('parent_id')
+            if parent_id and parent_id in self.nodes and parent_id != cat['id']:
+                self.children[parent_id].append(cat['id'])
+            else:
+                self.roots.append(cat['id'])
+
+        self.ancestors = {}
+        self.descendants = {}
+        self.flat = []
+        visited = set()
+        for root_id in self.roots:
+            self._walk(root_id, (), visited)
+        # Nodes caught in a parent cycle are unreachable from any root
+        for cat_id in self.nodes:
+            if cat_id not in visited:
+                self.roots.append(cat_id)
+                self._walk(cat_id, (), visited)
+        # Keep only the edges the walk followed, so a cycle cannot recurse
+        self.children = {
+            cat_id: [child_id for child_id in child_ids if self.ancestors[child_id][-1:] == (cat_id,)]
+            for cat_id, child_ids in self.children.items()
+        }
+        self._search_fields = None
+
+    def _build_search_index(self):
+        # Built at most once per snapshot; a concurrent duplicate build is harmless
+        self._search_fields = [
+            tuple(str(self.nodes[cat_id].get(field) or '').lower() for field in SEARCH_FIELDS)
+            for cat_id, _ in self.flat
+        ]
+
+    def search(self, query):
+        """Positions in `flat` of categories whose name, slug or description contains query."""
+        query = (query or '').strip().lower()
+        if not query:
+            return range(len(self.flat))
+        if self._search_fields is None:
+            self._build_search_index()
+        return [position for position, fields in enumerate(self._search_fields)
+                if any(query in value for value in fields)]
+
+    def _walk(self, root_id, root_path, visited):
+        """Iterative DFS filling ancestors, descendants and the flattened order."""
+        stack = [(root_id, root_path, False)]
+        while stack:
+            cat_id, path, done = stack.pop()
+            if done:
+                below = {cat_id}
+                for child_id in self.children[cat_id]:
+                    below |= self.descendants.get(child_id, frozenset())
+                self.descendants[cat_id] = frozenset(below)
+                continue
+            if cat_id in visited:
+                continue
+            visited.add(cat_id)
+            self.ancestors[cat_id] = path
+            self.flat.append((cat_id, len(path)))
+            stack.append((cat_id, path, True))
+            for child_id in reversed(self.children[cat_id]):
+                stack.append((child_id, path + (cat_id,), False))
+
+
+class CategoryTreeIndex:
+    """Shared, versioned category tree for one MongoDBManager."""
+
+    def __init__(self, manager):
+        self._manager = manager
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._version = 0
+        self._watcher_pid = None
+
+    @property
+    def version(self):
+        """Version of the current snapshot; increases on every rebuild."""
+        return self._get().version
+
+    def invalidate(self):
+        """Drop the current snapshot; the next lookup rebuilds it."""
+        with self._lock:
+            self._snapshot = None
+
+    def _get(self):
+        snapshot = self._snapshot
+        ttl = getattr(settings, 'CATEGORY_TREE_TTL', 300)
+        if snapshot is not None and time.monotonic() - snapshot.loaded_at < ttl:
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or time.monotonic() - snapshot.loaded_at >= ttl:
+                snapshot = self._load()
+                self._snapshot = snapshot
+        self._ensure_watcher()
+        return snapshot
+
+    def _load(self):
+        docs = self._manager.categories_collection.find({}).sort('sort_order', 1)
+        categories = [self._manager._format_category_doc(doc) for doc in docs]
+        self._version += 1
+        return _TreeSnapshot(categories, self._version)
+
+    # --------------------
+    # Change stream
+    # --------------------
+    def _ensure_watcher(self):
+        """Start the change stream thread once per process if enabled."""
+        if not getattr(settings, 'CATEGORY_TREE_WATCH', False):
+            return
+        pid = os.getpid()
+        if self._watcher_pid == pid:
+            return
+        self._watcher_pid = pid
+        thread = threading.Thread(target=self._watch, name='category-tree-watch', daemon=True)
+        thread.start()
+
+    def _watch(self):
+        backoff = 1
+        while True:
+            try:
+                with self._manager.categories_collection.watch() as stream:
+                    backoff = 1
+                    for _ in stream:
+                        self.invalidate()
+            except Exception as e:
+                # Standalone servers do not support change streams - rely on the TTL
+                print(f"Category change stream unavailable, using TTL refresh: {e}")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 300)
+
+    # --------------------
+    # Lookups
+    # --------------------
+    def get(self, category_id):
+        """Return the category dict for an id (shared - do not mutate)."""
+        return self._get().nodes.get(str(category_id))
+
+    def descendant_ids(self, category_id):
+        """Return ObjectIds of the category and all of its descendants."""
+        category_id = str(category_id)
+        ids = self._get().descendants.get(category_id)
+        if ids is None:
+            # Unknown category: filter on the id alone so nothing else matches
+            return [ObjectId(category_id)]
+        return [ObjectId(cat_id) for cat_id in ids]
+
+    def ancestors(self, category_id):
+        """Return the ancestor categories of a category, root first."""
+        snapshot = self._get()
+        return [snapshot.nodes[cat_id] for cat_id in snapshot.ancestors.get(str(category_id), ())]
+
+    def tree(self, active_only=True, orphans_as_roots=False):
+        """
+        Return the hierarchy as fresh nested dicts with a 'children' list.
+
+        With active_only, inactive categories are left out together with their
+        subtree, unless orphans_as_roots lists such orphaned categories at the
+        top level instead (the shop sidebar behaviour).
+        """
+        snapshot = self._get()
+
+        def include(cat_id):
+            return not active_only or snapshot.nodes[cat_id].get('is_active', True)
+
+        def build(cat_id):
+            node = dict(snapshot.nodes[cat_id])
+            node['children'] = [build(child_id) for child_id in snapshot.children[cat_id] if include(child_id)]
+            return node
+
+        if orphans_as_roots:
+            # nodes is in sort_order order, so the roots come out sorted
+            root_ids = []
+            for cat_id, cat in snapshot.nodes.items():
+                parent_id = cat.get('parent_id')
+                parent_shown = parent_id in snapshot.nodes and cat_id in snapshot.children[parent_id] and include(parent_id)
+                if include(cat_id) and not parent_shown:
+                    root_ids.append(cat_id)
+        else:
+            root_ids = [cat_id for cat_id in snapshot.roots if include(cat_id)]
+        return [build(cat_id) for cat_id in root_ids]
+
+    @staticmethod
+    def _flat_row(snapshot, position):
+        cat_id, level = snapshot.flat[position]
+        cat = dict(snapshot.nodes[cat_id])
+        cat['level'] = level
+        cat['children'] = list(snapshot.children[cat_id])
+        return cat
+
+    def flattened(self):
+        """Return every category in tree order as fresh dicts with a 'level' key."""
+        snapshot = self._get()
+        return [self._flat_row(snapshot, position) for position in range(len(snapshot.flat))]
+
+    def admin_page(self, search='', page=1, page_size=10):
+        """
+        One page of the dashboard list: {'items', 'total'}.
+
+        Items are flattened() rows in tree order, optionally narrowed by a
+        substring search on name, slug and description; only the rows of
+        the requested page are copied.
+        """
+        snapshot = self._get()
+        positions = snapshot.search(search)
+        start = (page - 1) * page_size
+        return {
+            'items': [self._flat_row(snapshot, position) for position in positions[start:start + page_size]],
+            'total': len(positions),
+        }
@@ -0,0 +1,77 @@
+"""
+Write-behind buffer for MongoDB users' last_login.
+
+A login used to pay for its own update_one on the users collection. Stamps
+are now collected in memory per process and written together with one
+unordered bulk_write when LAST_LOGIN_BUFFER_SIZE users are pending or
+LAST_LOGIN_FLUSH_INTERVAL seconds after the first pending stamp, whichever
+comes first (and at interpreter exit). Each write is a $max, so a late flush
+never moves last_login backwards.
+
+last_login in MongoDB is informational (dashboard user list), so a stamp lost
+in a crash costs nothing but a slightly older timestamp.
+"""
+import atexit
+import os
+import threading
+from datetime import datetime
+
+from django.conf import settings
+from pymongo import UpdateOne
+
+
+class LastLoginBuffer:
+    """Pending last_login stamps for one process (owned by MongoDBManager)."""
+
+    def __init__(self, manager):
+        self.manager = manager
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._pid = os.getpid()
+        self._timer = None
+        atexit.register(self.flush)
+
+    def _reset_after_fork(self):
+        # Stamps inherited from the parent are the parent's to write
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._pending = {}
+            self._timer = None
+
+    def stamp(self, username, when=None):
+        """Record a login; written on the next flush."""
+        when = when or datetime.utcnow()
+        interval = getattr(settings, 'LAST_LOGIN_FLUSH_INTERVAL', 5)
+        with self._lock:
+            self._reset_after_fork()
+            if username in self._pending:
+                when = max(when, self._pending[username])
+            self._pending[username] = when
+            full = interval <= 0 or len(self._pending) >= getattr(settings, 'LAST_LOGIN_BUFFER_SIZE', 100)
+            if not full and self._timer is None:
+                self._timer = threading.Timer(interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Write all pending stamps in one bulk_write. Returns how many were written."""
+        with self._lock:
+            self._reset_after_fork()
+            pending, self._pending = self._pending, {}
+            timer, self._timer = self._timer, None
+        if timer is not None and timer is not threading.current_thread():
+            timer.cancel()
+        if not pending:
+            return 0
+        try:
+            self.manager.users_collection.bulk_write(
+                [UpdateOne({'username': username}, {'$max': {'last_login': when}})
+                 for username, when in pending.items()],
+                ordered=False,
+            )
+            return len(pending)
+        except Exception as e:
+            print(f"Error writing last_login for {len(pending)} users: {e}")
+            return 0
@@ -0,0 +1,84 @@
+"""
+Totals for paginated listings without a separate count on every request.
+
+Each listing needs the page and the number of matching documents. The page
+always comes from an index-backed pagination.fetch_page(); for the total,
+page_with_total():
+
+  1. reuses a total cached for the same collection and normalized filter
+     (LISTING_TOTAL_CACHE_TTL seconds - dashboard paging does not recount),
+  2. uses estimated_document_count() (collection metadata) for unfiltered
+     listings when LISTING_ESTIMATE_UNFILTERED_TOTALS is on (the default),
+  3. otherwise runs count_documents() and caches the result.
+
+The page and the count are deliberately separate queries: inside a $facet
+the sort and keyset range could not use an index.
+
+Totals can lag real writes by up to the TTL; has_next / cursors come from the
+page itself and are always exact. Product totals also embed the catalog
+version, so product writes invalidate them immediately.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from . import pagination
+from .catalog_cache import get_catalog_version
+
+
+def total_key(collection, query):
+    """Return the cache key for the total of query on collection."""
+    key = f'listing_total:{collection.name}:{pagination.query_hash(query)}'
+    if collection.name == 'products':
+        key = f'{key}:v{get_catalog_version()}'
+    return key
+
+
+def get_cached_total(collection, query):
+    """Return the cached total for query, or None."""
+    try:
+        return cache.get(total_key(collection, query))
+    except Exception as e:
+        print(f"Error reading cached total: {e}")
+        return None
+
+
+def set_cached_total(collection, query, total):
+    try:
+        cache.set(total_key(collection, query), total, getattr(settings, 'LISTING_TOTAL_CACHE_TTL', 30))
+    except Exception as e:
+        print(f"Error caching total: {e}")
+
+
+def _use_estimate(estimate):
+    if estimate is None:
+        return getattr(settings, 'LISTING_ESTIMATE_UNFILTERED_TOTALS', True)
+    return estimate
+
+
+def count_total(collection, query, estimate=None, collation=None):
+    """Return the number of documents matching query, using the cache and estimates."""
+    estimate = _use_estimate(estimate)
+    total = get_cached_total(collection, query)
+    if total is not None:
+        return total
+    if not query and estimate:
+        total = collection.estimated_document_count()
+    else:
+        total = collection.count_documents(query, collation=collation)
+    set_cached_total(collection, query, total)
+    return total
+
+
+def page_with_total(collection, query, sort_field, direction, page_size, page=None, cursor=None,
+                    projection=None, estimate=None, collation=None):
+    """
+    Fetch one keyset/page-number page plus the total matching documents.
+
+    Returns (docs, next_cursor, prev_cursor, total); see pagination.fetch_page.
+    """
+    docs, next_cursor, prev_cursor = pagination.fetch_page(
+        collection, query, sort_field, direction, page_size,
+        page=page, cursor=cursor, projection=projection, collation=collation,
+    )
+    total = count_total(collection, query, estimate, collation=collation)
+    return docs, next_cursor, prev_cursor, total
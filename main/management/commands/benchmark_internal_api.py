@@ -0,0 +1,78 @@
+import statistics
+import time
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from main.api_client import InternalAPIClient
+from main.api_views import OrderAPIViewSet, ProductAPIViewSet
+from main.mongodb_utils import mongodb_manager
+
+
+_PAGE = {'items': [], 'total': 0, 'page': 1, 'page_size': 10, 'next_cursor': None, 'prev_cursor': None}
+
+
+class Command(BaseCommand):
+    help = 'Per-call overhead of the old viewset round trip vs the service layer used by InternalAPIClient'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--calls', type=int, default=2000, help='Calls per mode and listing')
+        parser.add_argument('--live', action='store_true',
+                            help='Query MongoDB too (default: fixed empty page, so only the call overhead is timed)')
+
+    def handle(self, *args, **options):
+        factory = APIRequestFactory()
+        client = InternalAPIClient()
+        params = {'page': 1, 'page_size': 10, 'fields': 'admin_row'}
+        cases = [
+            ('products', ProductAPIViewSet, '/api/products/',
+             lambda: client.get_products(search='shirt', sort_by='newest', **params)),
+            ('orders', OrderAPIViewSet, '/api/orders/',
+             lambda: client.get_orders(status='pending', **params)),
+        ]
+        legacy_params = {
+            'products': {'q': 'shirt', 'sort': 'newest', **params},
+            'orders': {'status': 'pending', **params},
+        }
+
+        patches = []
+        if not options['live']:
+            patches = [mock.patch.object(mongodb_manager, name, return_value=_PAGE)
+                       for name in ('list_products', 'list_orders')]
+        for patch in patches:
+            patch.start()
+        try:
+            self.stdout.write(f"{'listing':<10}{'mode':<20}{'mean us':>10}{'p95 us':>10}")
+            for name, viewset_class, path, direct in cases:
+                query = {key: str(value) for key, value in legacy_params[name].items()}
+
+                def legacy():
+                    drf_request = Request(factory.get(path, query))
+                    viewset = viewset_class()
+                    viewset.action = 'list'
+                    viewset.request = drf_request
+                    data = viewset.list(drf_request).data
+                    return {'items': data.get('results', []), 'total': data.get('count', 0)}
+
+                for mode, call in (('viewset round trip', legacy), ('service call', direct)):
+                    timings = self._time(call, options['calls'])
+                    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+                    self.stdout.write(f'{name:<10}{mode:<20}{statistics.fmean(timings):>10.1f}{p95:>10.1f}')
+        finally:
+            for patch in patches:
+                patch.stop()
+        scope = 'including MongoDB' if options['live'] else 'MongoDB replaced by a fixed page'
+        self.stdout.write(self.style.SUCCESS(f'Each sample is one list call ({scope}).'))
+
+    @staticmethod
+    def _time(call, calls):
+        for _ in range(min(calls, 50)):
+            call()
+        timings = []
+        for _ in range(calls):
+            started = time.perf_counter()
+            call()
+            timings.append((time.perf_counter() - started) * 1_000_000)
+        timings.sort()
+        return timings
@@ -0,0 +1,82 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import bcrypt
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from main import passwords
+from main.mongodb_utils import mongodb_manager
+
+
+class Command(BaseCommand):
+    help = 'Measure password verification throughput: inline bcrypt with a second user lookup vs the pooled password service (writes, then cleans up)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20, help='Test users to create')
+        parser.add_argument('--logins', type=int, default=200, help='Logins per mode')
+        parser.add_argument('--threads', type=int, default=32, help='Concurrent request threads')
+        parser.add_argument('--stored-rounds', type=int, default=None,
+                            help='Cost of the seeded hashes (default BCRYPT_ROUNDS); differ to watch rehash-on-login')
+
+    def handle(self, *args, **options):
+        tag = f'benchlogin{int(time.time())}'
+        stored_rounds = options['stored_rounds'] or passwords.rounds()
+        password = 'benchmark-password'
+        usernames = [f'{tag}_{i}' for i in range(options['users'])]
+        users = mongodb_manager.users_collection
+        seeded = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=stored_rounds)).decode('utf-8')
+        users.insert_many([{'username': name, 'email': f'{name}@example.com', 'password': seeded,
+                            'is_active': True, 'date_joined': datetime.utcnow(), 'last_login': None}
+                           for name in usernames])
+        self.stdout.write(f'{len(usernames)} users, stored cost {stored_rounds}, BCRYPT_ROUNDS {passwords.rounds()}, '
+                          f'{options["threads"]} threads, pool {getattr(settings, "PASSWORD_HASH_WORKERS", 0) or "cpu count"}')
+
+        try:
+            legacy = self._run(options, usernames, lambda name: self._legacy_login(name, password))
+            pooled = self._run(options, usernames, lambda name: self._service_login(name, password))
+            upgraded = users.count_documents({'username': {'$in': usernames}, 'password': {'$ne': seeded}})
+        finally:
+            users.delete_many({'username': {'$in': usernames}})
+
+        self.stdout.write(f"{'mode':<26}{'logins/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'failed':>8}")
+        for label, (wall, timings, failed) in (('inline bcrypt + refetch', legacy), ('password service', pooled)):
+            timings.sort()
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            self.stdout.write(f'{label:<26}{len(timings) / wall:>10.1f}{statistics.median(timings):>10.1f}'
+                              f'{p95:>10.1f}{failed:>8}')
+        if stored_rounds != passwords.rounds():
+            self.stdout.write(f'hashes upgraded to cost {passwords.rounds()}: {upgraded}/{len(usernames)}')
+        self.stdout.write(self.style.SUCCESS('Each sample is one successful or failed login.'))
+
+    @staticmethod
+    def _legacy_login(username, password):
+        """The previous path: load the user, load it again, checkpw on the request thread."""
+        user = mongodb_manager.get_user_by_username(username)
+        if not user:
+            return None
+        stored = mongodb_manager.get_user_by_username(username)['password']
+        return user if bcrypt.checkpw(password.encode('utf-8'), stored.encode('utf-8')) else None
+
+    @staticmethod
+    def _service_login(username, password):
+        """MongoDBBackend's path: one lookup, check (and upgrade) in the bcrypt pool."""
+        user = mongodb_manager.get_user_by_username(username)
+        return user if user and mongodb_manager.check_user_password(user, password) else None
+
+    @staticmethod
+    def _run(options, usernames, login):
+        timings, failed = [], 0
+
+        def one(i):
+            started = time.perf_counter()
+            ok = login(usernames[i % len(usernames)])
+            return (time.perf_counter() - started) * 1000, ok
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            for elapsed, ok in pool.map(one, range(options['logins'])):
+                timings.append(elapsed)
+                failed += 0 if ok else 1
+        return time.perf_counter() - started, timings, failed
@@ -0,0 +1,64 @@
+import statistics
+import time
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from main.paypal_client import PayPalClient
+from main.paypal_fake import FakePayPalServer
+
+
+class Command(BaseCommand):
+    help = 'Compare per-call token + new connection against the cached-token pooled PayPal client (fake server)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checkouts', type=int, default=50, help='create + capture cycles per mode')
+        parser.add_argument('--latency-ms', type=float, default=20.0, help='Simulated PayPal response time')
+
+    def handle(self, *args, **options):
+        server = FakePayPalServer(latency=options['latency_ms'] / 1000).start()
+        try:
+            with override_settings(PAYPAL_BASE_URL=server.url, PAYPAL_CLIENT_ID='bench', PAYPAL_CLIENT_SECRET='bench'):
+                legacy = self._run(server, options['checkouts'], self._legacy_checkout)
+                client = PayPalClient()
+                pooled = self._run(server, options['checkouts'], lambda: self._client_checkout(client))
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.stdout.write(f"{'mode':<22}{'p50 ms':>10}{'p95 ms':>10}{'token calls':>14}")
+        for label, (timings, tokens) in (('per-call token', legacy), ('cached token + pool', pooled)):
+            timings.sort()
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            self.stdout.write(f'{label:<22}{statistics.median(timings):>10.1f}{p95:>10.1f}{tokens:>14}')
+        self.stdout.write(self.style.SUCCESS('Each sample is one checkout (create order + capture).'))
+
+    @staticmethod
+    def _run(server, checkouts, checkout):
+        before = server.counts['token']
+        timings = []
+        for _ in range(checkouts):
+            started = time.perf_counter()
+            checkout()
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings, server.counts['token'] - before
+
+    @staticmethod
+    def _legacy_token(base_url):
+        resp = requests.post(f'{base_url}/v1/oauth2/token', data={'grant_type': 'client_credentials'},
+                             auth=('bench', 'bench'), timeout=20)
+        return resp.json()['access_token']
+
+    def _legacy_checkout(self):
+        """The previous flow: fresh token and a new connection for every call."""
+        base_url = settings.PAYPAL_BASE_URL
+        headers = {'Authorization': f'Bearer {self._legacy_token(base_url)}'}
+        created = requests.post(f'{base_url}/v2/checkout/orders', headers=headers, json={}, timeout=30).json()
+        headers = {'Authorization': f'Bearer {self._legacy_token(base_url)}'}
+        requests.post(f"{base_url}/v2/checkout/orders/{created['id']}/capture", headers=headers, timeout=30)
+
+    @staticmethod
+    def _client_checkout(client):
+        created = client.create_order({}).json()
+        client.capture_order(created['id'])
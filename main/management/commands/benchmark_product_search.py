@@ -0,0 +1,127 @@
+import os
+import random
+import re
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from main.mongodb_utils import mongodb_manager
+from main.mongo_indexes import MONGO_INDEXES
+from main import product_search
+
+
+WORDS = [
+    'classic', 'cotton', 'denim', 'leather', 'summer', 'winter', 'slim', 'relaxed',
+    'vintage', 'premium', 'organic', 'linen', 'wool', 'silk', 'casual', 'formal',
+    'sport', 'outdoor', 'travel', 'urban', 'striped', 'printed', 'knit', 'waterproof',
+]
+NOUNS = [
+    'shirt', 'jacket', 'dress', 'sneakers', 'boots', 'hoodie', 'scarf', 'backpack',
+    'watch', 'sunglasses', 'jeans', 'skirt', 'sweater', 'cap', 'wallet', 'belt',
+]
+COLORS = ['black', 'white', 'navy', 'olive', 'beige', 'red', 'grey', 'brown']
+
+
+class Command(BaseCommand):
+    help = 'Benchmark regex vs text-index product search (p50/p99) on a scratch collection'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[10000, 100000],
+                            help='Collection sizes to benchmark (default: 10000 100000)')
+        parser.add_argument('--queries', type=int, default=200, help='Queries per mode and size')
+        parser.add_argument('--page-size', type=int, default=12)
+        parser.add_argument('--keep', action='store_true', help='Do not drop the scratch collection')
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        collection = mongodb_manager.db[f'bench_products_{os.getpid()}']
+        collection.drop()
+        self._create_indexes(collection)
+
+        try:
+            inserted = 0
+            for size in sorted(options['sizes']):
+                if size > inserted:
+                    self.stdout.write(f'Inserting products {inserted}..{size}...')
+                    self._insert_products(collection, inserted, size, rng)
+                    inserted = size
+                self._run_size(collection, size, options['queries'], options['page_size'], rng)
+        finally:
+            if not options['keep']:
+                collection.drop()
+
+    def _create_indexes(self, collection):
+        for spec in MONGO_INDEXES:
+            if spec['collection'] == 'products_collection':
+                collection.create_index(spec['keys'], name=spec['name'], **spec.get('options', {}))
+
+    def _insert_products(self, collection, start, end, rng):
+        now = datetime.utcnow()
+        batch = []
+        for i in range(start, end):
+            words = rng.sample(WORDS, 2)
+            noun = rng.choice(NOUNS)
+            color = rng.choice(COLORS)
+            batch.append({
+                'name': f'{words[0].title()} {color.title()} {noun.title()} {i}',
+                'slug': f'{words[0]}-{color}-{noun}-{i}',
+                'description': f'A {words[1]} {noun} in {color}. ' + ' '.join(rng.sample(WORDS, 6)),
+                'tags': [words[0], words[1], color],
+                'sku': f'SKU{i:07d}',
+                'price': round(rng.uniform(5, 500), 2),
+                'quantity': rng.randint(0, 100),
+                'is_available': True,
+                'created_at': now - timedelta(minutes=i),
+            })
+            if len(batch) >= 5000:
+                collection.insert_many(batch, ordered=False)
+                batch = []
+        if batch:
+            collection.insert_many(batch, ordered=False)
+
+    def _run_size(self, collection, size, queries, page_size, rng):
+        terms = [rng.choice(WORDS + NOUNS + COLORS) for _ in range(queries)]
+        prefixes = [term[:3] for term in terms]
+
+        def regex_query(term):
+            # The previous list_products search path
+            query = {'name': {'$regex': re.escape(term), '$options': 'i'}}
+            list(collection.find(query).sort('created_at', -1).limit(page_size))
+            collection.count_documents(query)
+
+        def text_query(term):
+            query = product_search.text_search_clause(term)
+            list(collection.find(query, {'score': {'$meta': 'textScore'}})
+                 .sort([('score', {'$meta': 'textScore'}), ('created_at', -1)])
+                 .limit(page_size))
+            collection.count_documents(query)
+
+        def autocomplete_query(prefix):
+            product_search.autocomplete(collection, prefix, limit=8)
+
+        self.stdout.write(self.style.SUCCESS(f'\n{size} products, {queries} queries per mode'))
+        self.stdout.write(f"  {'mode':<14}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+        for label, fn, args in (
+            ('regex', regex_query, terms),
+            ('text', text_query, terms),
+            ('autocomplete', autocomplete_query, prefixes),
+        ):
+            timings = self._measure(fn, args)
+            self.stdout.write(
+                f'  {label:<14}{self._pct(timings, 0.50):>10.2f}{self._pct(timings, 0.99):>10.2f}{timings[-1]:>10.2f}'
+            )
+
+    @staticmethod
+    def _measure(fn, args):
+        # One warm-up call so the first timing does not include plan selection
+        fn(args[0])
+        timings = []
+        for arg in args:
+            started = time.perf_counter()
+            fn(arg)
+            timings.append((time.perf_counter() - started) * 1000)
+        return sorted(timings)
+
+    @staticmethod
+    def _pct(sorted_values, pct):
+        return sorted_values[min(int(len(sorted_values) * pct), len(sorted_values) - 1)]
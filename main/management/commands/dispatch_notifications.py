@@ -0,0 +1,43 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from main import notification_outbox
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued order/payment emails and Telegram messages (runs until stopped)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Deliver one batch per channel and exit')
+        parser.add_argument('--batch-size', type=int, default=None, help='Entries claimed per channel per batch')
+        parser.add_argument('--interval', type=float, default=None, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--stats', action='store_true', help='Print queue depth and exit')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self._write_stats()
+            return
+
+        interval = options['interval'] or getattr(settings, 'NOTIFICATION_POLL_INTERVAL', 2)
+        self.stdout.write('Dispatching notifications' + ('' if options['once'] else ' (Ctrl+C to stop)'))
+        try:
+            while True:
+                result = notification_outbox.dispatch_due(options['batch_size'])
+                if result['claimed']:
+                    style = self.style.SUCCESS if not result['failed'] else self.style.WARNING
+                    self.stdout.write(style(f"  sent {result['sent']}, failed {result['failed']}"))
+                if options['once']:
+                    break
+                if not result['claimed']:
+                    time.sleep(interval)
+        except KeyboardInterrupt:
+            self.stdout.write('Stopped.')
+
+    def _write_stats(self):
+        stats = notification_outbox.queue_stats()
+        for channel, counts in sorted(stats['by_status'].items()):
+            summary = ', '.join(f'{status}={count}' for status, count in sorted(counts.items()))
+            self.stdout.write(f'  {channel:<10}{summary}')
+        oldest = stats['oldest_pending_seconds']
+        self.stdout.write(f"  oldest due entry: {'-' if oldest is None else f'{oldest}s'}")
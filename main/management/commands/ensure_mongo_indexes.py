@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+from main.mongodb_utils import mongodb_manager
+from main.mongo_indexes import ensure_indexes, index_usage_report
+
+
+class Command(BaseCommand):
+    help = 'Create missing MongoDB indexes and fail if a required index is missing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Only verify indexes, do not create them')
+        parser.add_argument('--report', action='store_true', help='Report unused, redundant and unmanaged indexes')
+
+    def handle(self, *args, **options):
+        results = ensure_indexes(mongodb_manager, dry_run=options['check'])
+
+        failed = []
+        for spec, status, message in results:
+            label = f"{spec['collection'].replace('_collection', '')}.{spec['name']}"
+            if status == 'exists':
+                suffix = f' ({message})' if message else ''
+                self.stdout.write(f'  ok       {label}{suffix}')
+            elif status == 'created':
+                self.stdout.write(self.style.SUCCESS(f'  created  {label}'))
+            elif status == 'missing':
+                self.stdout.write(self.style.WARNING(f'  missing  {label}'))
+                if spec.get('required', True):
+                    failed.append(label)
+            else:
+                self.stdout.write(self.style.ERROR(f'  error    {label}: {message}'))
+                if spec.get('required', True):
+                    failed.append(label)
+            if status in ('missing', 'error') and spec.get('hint'):
+                self.stdout.write(self.style.WARNING(f"           {spec['hint']}"))
+
+        if options['report']:
+            self._write_report()
+
+        if failed:
+            raise CommandError(f"Required MongoDB indexes missing: {', '.join(failed)}")
+
+        absent = sum(1 for _, status, _ in results if status in ('missing', 'error'))
+        if absent:
+            self.stdout.write(self.style.WARNING(f'{absent} optional MongoDB index(es) are not present (see above).'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'All {len(results)} registered MongoDB indexes are present.'))
+
+    def _write_report(self):
+        self.stdout.write('')
+        self.stdout.write('Index usage report:')
+        for collection_name, entry in index_usage_report(mongodb_manager).items():
+            self.stdout.write(f'  {collection_name}')
+            if entry['unused'] is None:
+                self.stdout.write('    unused:    $indexStats not available')
+            else:
+                for item in entry['unused']:
+                    self.stdout.write(self.style.WARNING(f"    unused:    {item['name']} (no accesses since {item['since']})"))
+            for item in entry['redundant']:
+                self.stdout.write(self.style.WARNING(f"    redundant: {item['name']} (prefix of {item['covered_by']})"))
+            for name in entry['unmanaged']:
+                self.stdout.write(f'    unmanaged: {name}')
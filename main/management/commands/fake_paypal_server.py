@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from main.paypal_fake import FakePayPalServer
+
+
+class Command(BaseCommand):
+    help = 'Run a local fake PayPal REST API (set PAYPAL_BASE_URL to its URL to use it)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency-ms', type=float, default=0.0, help='Delay added to every response')
+
+    def handle(self, *args, **options):
+        server = FakePayPalServer(('127.0.0.1', options['port']), latency=options['latency_ms'] / 1000)
+        self.stdout.write(self.style.SUCCESS(f'Fake PayPal API listening on {server.url} (Ctrl+C to stop)'))
+        self.stdout.write(f'  PAYPAL_BASE_URL={server.url}')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            self.stdout.write(f"Stopped. Requests served: {server.counts}")
+        finally:
+            server.server_close()
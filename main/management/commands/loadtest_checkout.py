@@ -0,0 +1,126 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bson import ObjectId
+from django.core.management.base import BaseCommand
+from pymongo import monitoring
+from main import order_service
+from main.mongodb_utils import mongodb_manager
+from main.pricing import price_cart
+
+
+class _RoundTrips(monitoring.CommandListener):
+    """Counts commands sent by the current thread."""
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def reset(self):
+        self.local.count = 0
+
+    @property
+    def count(self):
+        return getattr(self.local, 'count', 0)
+
+    def started(self, event):
+        self.local.count = self.count + 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+class Command(BaseCommand):
+    help = 'Race concurrent checkouts of one SKU and verify stock is never oversold (writes, then cleans up)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stock', type=int, default=20, help='Units of the test SKU')
+        parser.add_argument('--buyers', type=int, default=100, help='Concurrent checkouts')
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--quantity', type=int, default=1, help='Units per checkout')
+        parser.add_argument('--lines', type=int, default=1, help='Extra in-stock lines per order (round trips must not grow)')
+        parser.add_argument('--keep', action='store_true', help='Keep the test product, orders and payments')
+
+    def handle(self, *args, **options):
+        # Must be registered before the process' MongoClient is created
+        round_trips = _RoundTrips()
+        monitoring.register(round_trips)
+
+        products = mongodb_manager.products_collection
+        tag = f'loadtest-{int(time.time())}'
+        sku_id = products.insert_one({
+            'name': f'Load test SKU {tag}', 'sku': tag, 'price': 1.0,
+            'quantity': options['stock'], 'is_available': True,
+        }).inserted_id
+        filler_ids = products.insert_many([
+            {'name': f'Load test filler {tag}-{i}', 'sku': f'{tag}-{i}', 'price': 1.0,
+             'quantity': options['buyers'] * options['quantity'], 'is_available': True}
+            for i in range(max(options['lines'] - 1, 0))
+        ]).inserted_ids if options['lines'] > 1 else []
+        lines = [{'id': str(pid), 'quantity': options['quantity']} for pid in [sku_id, *filler_ids]]
+        user_id = str(ObjectId())
+
+        outcomes = {'placed': 0, 'out_of_stock': 0, 'error': 0}
+        timings, trips, order_ids = [], [], []
+        lock = threading.Lock()
+
+        def checkout(_):
+            round_trips.reset()
+            started = time.perf_counter()
+            try:
+                placed = order_service.place_order(user_id, price_cart(lines), {}, 'pay_later', notes=tag)
+                outcome = 'placed'
+            except order_service.OutOfStock:
+                placed, outcome = None, 'out_of_stock'
+            except Exception as e:
+                placed, outcome = None, 'error'
+                self.stderr.write(f'checkout failed: {e}')
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                outcomes[outcome] += 1
+                timings.append(elapsed)
+                if placed:
+                    trips.append(round_trips.count)
+                    order_ids.append(ObjectId(placed['order_id']))
+
+        mode = 'transaction' if order_service.supports_transactions() else 'compensating (no transactions)'
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            list(pool.map(checkout, range(options['buyers'])))
+        wall = time.perf_counter() - started
+
+        remaining = products.find_one({'_id': sku_id}, {'quantity': 1})['quantity']
+        orders = mongodb_manager.orders_collection.count_documents({'notes': tag})
+        payments = mongodb_manager.payments_collection.count_documents({'order_id': {'$in': order_ids}})
+        sold = options['stock'] - remaining
+        timings.sort()
+
+        self.stdout.write(f'mode: {mode}')
+        self.stdout.write(f"checkouts: {options['buyers']} on {options['threads']} threads in {wall:.2f}s")
+        self.stdout.write(f"placed {outcomes['placed']}, out of stock {outcomes['out_of_stock']}, errors {outcomes['error']}")
+        self.stdout.write(f'stock: {options["stock"]} -> {remaining} ({sold} units sold), orders {orders}, payments {payments}')
+        if timings:
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            self.stdout.write(f'latency p50 {statistics.median(timings):.1f} ms, p95 {p95:.1f} ms')
+        if trips:
+            self.stdout.write(f'round trips per placed order ({len(lines)} lines, incl. pricing): '
+                              f'min {min(trips)}, max {max(trips)}')
+
+        consistent = (
+            remaining >= 0
+            and sold == outcomes['placed'] * options['quantity']
+            and orders == payments == outcomes['placed']
+        )
+        if consistent:
+            self.stdout.write(self.style.SUCCESS('No oversell: stock, orders and payments agree.'))
+        else:
+            self.stdout.write(self.style.ERROR('Inconsistent: stock, orders and payments disagree.'))
+
+        if not options['keep']:
+            mongodb_manager.payments_collection.delete_many({'order_id': {'$in': order_ids}})
+            mongodb_manager.orders_collection.delete_many({'notes': tag})
+            products.delete_many({'_id': {'$in': [sku_id, *filler_ids]}})
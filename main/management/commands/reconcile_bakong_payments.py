@@ -0,0 +1,47 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from main import bakong_reconciler, order_service
+
+
+class Command(BaseCommand):
+    help = ('Check all pending Bakong KHQR payments in bulk on one schedule and expire unpaid orders '
+            'past ORDER_RESERVATION_TTL (runs until stopped)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run one reconciliation pass and exit')
+        parser.add_argument('--interval', type=float, default=None, help='Seconds between passes')
+
+    def handle(self, *args, **options):
+        if not settings.SITE_URL:
+            # Payment emails sent from here have no request to take the host from
+            raise CommandError('SITE_URL is not set (e.g. SITE_URL=https://shop.example.com); '
+                               'it is needed for the order links in payment emails')
+        interval = options['interval'] or getattr(settings, 'BAKONG_RECONCILE_INTERVAL', 3)
+        self.stdout.write('Reconciling Bakong payments' + ('' if options['once'] else f' every {interval}s (Ctrl+C to stop)'))
+        bakong_available = True
+        try:
+            while True:
+                started = time.monotonic()
+                if bakong_available:
+                    try:
+                        result = bakong_reconciler.reconcile_pending()
+                    except (ImportError, ValueError) as e:
+                        # Unpaid orders from other payment methods still need expiring
+                        self.stdout.write(self.style.WARNING(f'  Bakong is not available ({e}); only expiring unpaid orders'))
+                        bakong_available = False
+                        result = {'checked': 0, 'paid': 0}
+                    except Exception as e:
+                        self.stdout.write(self.style.ERROR(f'  pass failed: {e}'))
+                        result = {'checked': 0, 'paid': 0}
+                    if result['paid']:
+                        self.stdout.write(self.style.SUCCESS(f"  {result['paid']} of {result['checked']} pending payment(s) paid"))
+                expired = order_service.expire_unpaid_orders()
+                if expired:
+                    self.stdout.write(f'  {expired} unpaid order(s) expired, stock released')
+                if options['once']:
+                    break
+                time.sleep(max(interval - (time.monotonic() - started), 0))
+        except KeyboardInterrupt:
+            self.stdout.write('Stopped.')
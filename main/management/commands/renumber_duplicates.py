@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from pymongo import ASCENDING, UpdateOne
+from main.mongodb_utils import mongodb_manager
+
+
+# (collection attribute, field, generator) for each number that has a unique index
+NUMBERED_FIELDS = (
+    ('orders_collection', 'order_number', 'new_order_number'),
+    ('payments_collection', 'transaction_id', 'new_transaction_id'),
+)
+
+
+class Command(BaseCommand):
+    help = ('Give fresh numbers to legacy orders/payments whose order_number or transaction_id is '
+            'duplicated or missing, so the unique indexes can be created')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only list what would be renumbered')
+
+    def handle(self, *args, **options):
+        for attr, field, generator in NUMBERED_FIELDS:
+            collection = getattr(mongodb_manager, attr)
+            ops = []
+            # Oldest document keeps a duplicated number; missing numbers are all replaced
+            groups = collection.aggregate([
+                {'$sort': {'created_at': ASCENDING, '_id': ASCENDING}},
+                {'$group': {'_id': f'${field}', 'ids': {'$push': '$_id'}, 'count': {'$sum': 1}}},
+                {'$match': {'$or': [{'count': {'$gt': 1}}, {'_id': {'$in': [None, '']}}]}},
+            ], allowDiskUse=True)
+            for group in groups:
+                ids = group['ids'] if group['_id'] in (None, '') else group['ids'][1:]
+                for doc_id in ids:
+                    # A dry run does not use up sequence numbers
+                    new_value = '(new number)' if options['dry_run'] else getattr(mongodb_manager, generator)()
+                    self.stdout.write(f"  {collection.name} {doc_id}: {group['_id'] or '(none)'} -> {new_value}")
+                    ops.append(UpdateOne({'_id': doc_id}, {'$set': {field: new_value}}))
+
+            if not ops:
+                self.stdout.write(f'  {collection.name}: every {field} is unique')
+            elif options['dry_run']:
+                self.stdout.write(self.style.WARNING(f'  {collection.name}: {len(ops)} {field}(s) would be renumbered'))
+            else:
+                collection.bulk_write(ops, ordered=False)
+                self.stdout.write(self.style.SUCCESS(f'  {collection.name}: renumbered {len(ops)} {field}(s)'))
+
+        if not options['dry_run']:
+            self.stdout.write('Run `python manage.py ensure_mongo_indexes` to create the unique indexes.')
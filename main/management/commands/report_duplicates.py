@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from main.mongo_indexes import MONGO_INDEXES
+from main.mongodb_utils import mongodb_manager
+
+
+class Command(BaseCommand):
+    help = 'List the values that stop a unique MongoDB index in the registry from being built'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=20, help='Duplicate values shown per index')
+
+    def handle(self, *args, **options):
+        found = 0
+        for spec in MONGO_INDEXES:
+            if not spec.get('options', {}).get('unique'):
+                continue
+            collection = getattr(mongodb_manager, spec['collection'])
+            fields = [field for field, _ in spec['keys']]
+            groups = list(collection.aggregate([
+                {'$group': {
+                    '_id': {field.replace('.', '_'): f'${field}' for field in fields},
+                    'ids': {'$push': '$_id'},
+                    'count': {'$sum': 1},
+                }},
+                {'$match': {'count': {'$gt': 1}}},
+                {'$sort': {'count': -1}},
+                {'$limit': options['limit']},
+            ], allowDiskUse=True))
+            if not groups:
+                self.stdout.write(f"  ok         {collection.name}.{spec['name']}")
+                continue
+            found += 1
+            self.stdout.write(self.style.WARNING(f"  duplicates {collection.name}.{spec['name']}"))
+            for group in groups:
+                value = ', '.join(f'{key}={val!r}' for key, val in group['_id'].items())
+                ids = ', '.join(str(doc_id) for doc_id in group['ids'])
+                self.stdout.write(f"             {value} x{group['count']}: {ids}")
+            # Hints that only point back here add nothing (renumber_duplicates ones do)
+            if spec.get('hint') and 'report_duplicates' not in spec['hint']:
+                self.stdout.write(f"             {spec['hint']}")
+
+        if found:
+            self.stdout.write(self.style.WARNING(f'{found} unique index(es) blocked by duplicates.'))
+        else:
+            self.stdout.write(self.style.SUCCESS('No duplicates block the unique indexes.'))
@@ -0,0 +1,64 @@
+import time
+
+import bson
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from main.mongodb_utils import mongodb_manager
+from main import projections
+
+
+class Command(BaseCommand):
+    help = 'Compare bytes and latency of full-document reads vs projected reads per endpoint (read-only)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50, help='Runs per query and mode')
+
+    def handle(self, *args, **options):
+        iterations = max(options['iterations'], 1)
+        sample_ids = [doc['_id'] for doc in mongodb_manager.products_collection.find({}, {'_id': 1}).limit(20)]
+
+        cases = [
+            ('shop grid (card)', mongodb_manager.products_collection, {},
+             [('created_at', -1), ('_id', -1)], settings.SHOP_PAGE_SIZE, projections.PRODUCT_CARD),
+            ('dashboard products (admin_row)', mongodb_manager.products_collection, {},
+             [('created_at', -1), ('_id', -1)], 10, projections.PRODUCT_ADMIN_ROW),
+            ('cart lines (cart_line)', mongodb_manager.products_collection, {'_id': {'$in': sample_ids}},
+             None, 0, projections.PRODUCT_CART_LINE),
+            ('dashboard users', mongodb_manager.users_collection, {},
+             None, 0, projections.USER_ADMIN_ROW),
+            ('dashboard orders (admin_row)', mongodb_manager.orders_collection, {},
+             [('created_at', -1), ('_id', -1)], 10, projections.ORDER_ADMIN_ROW),
+            ('dashboard payments (admin_row)', mongodb_manager.payments_collection, {},
+             [('created_at', -1), ('_id', -1)], 10, projections.PAYMENT_ADMIN_ROW),
+        ]
+
+        self.stdout.write(
+            f"{'endpoint':<34}{'full KB':>10}{'proj KB':>10}{'saved':>8}{'full p50':>11}{'proj p50':>11}"
+        )
+        for label, collection, query, sort, limit, projection in cases:
+            full_bytes, full_ms = self._measure(collection, query, sort, limit, None, iterations)
+            proj_bytes, proj_ms = self._measure(collection, query, sort, limit, projection, iterations)
+            saved = (1 - proj_bytes / full_bytes) * 100 if full_bytes else 0.0
+            self.stdout.write(
+                f'{label:<34}{full_bytes / 1024:>10.1f}{proj_bytes / 1024:>10.1f}{saved:>7.0f}%'
+                f'{full_ms:>9.2f}ms{proj_ms:>9.2f}ms'
+            )
+        self.stdout.write(self.style.SUCCESS('Bytes are per request (BSON size of the returned documents).'))
+
+    @staticmethod
+    def _measure(collection, query, sort, limit, projection, iterations):
+        """Return (bytes per request, p50 latency in ms)."""
+        timings = []
+        size = 0
+        for _ in range(iterations):
+            started = time.perf_counter()
+            cursor = collection.find(query, projection)
+            if sort:
+                cursor = cursor.sort(sort)
+            if limit:
+                cursor = cursor.limit(limit)
+            docs = list(cursor)
+            timings.append((time.perf_counter() - started) * 1000)
+            size = sum(len(bson.encode(doc)) for doc in docs)
+        timings.sort()
+        return size, timings[len(timings) // 2]
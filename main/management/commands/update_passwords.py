@@ -1,6 +1,6 @@
 from django.core.management.base import BaseCommand
 from main.mongodb_utils import mongodb_manager
-import bcrypt
+from main import passwords
 
 class Command(BaseCommand):
     help = 'Update all users passwords to "123"'
@@ -16,9 +16,7 @@ class Command(BaseCommand):
             return
 
         # Hash the password "123"
-        password = "123".encode('utf-8')
-        hashed_password = bcrypt.hashpw(password, bcrypt.gensalt())
-        hashed_password_str = hashed_password.decode('utf-8')
+        hashed_password_str = passwords.hash_password("123")
 
         # Get all users
         users = mongodb_manager.get_all_users()
@@ -0,0 +1,345 @@
+"""
+Declarative MongoDB index registry for the collections bound by MongoDBManager.
+
+Every hot lookup in mongodb_utils should be backed by an entry here. The
+`ensure_mongo_indexes` management command creates missing indexes, verifies
+that required ones exist (used by build.sh to fail the deploy) and reports
+redundant or unused indexes from $indexStats.
+"""
+from pymongo import ASCENDING, DESCENDING, TEXT
+from pymongo.errors import OperationFailure
+
+
+# Each entry describes one index:
+#   collection - attribute name of the collection on MongoDBManager
+#   name       - explicit index name (used to detect existing indexes)
+#   keys       - list of (field, direction) tuples
+#   options    - extra create_index options (unique, collation, ...)
+#   required   - deploy fails if a required index is missing
+#   hint       - optional remedy printed when the index is missing or cannot be built
+MONGO_INDEXES = [
+    {
+        # Not required (nor the other unique indexes on legacy data below):
+        # existing duplicates would otherwise fail the deploy
+        'collection': 'users_collection',
+        'name': 'users_username',
+        'keys': [('username', ASCENDING)],
+        'options': {'unique': True},
+        'required': False,
+        'hint': 'duplicate usernames; `python manage.py report_duplicates` lists them to rename or merge',
+    },
+    {
+        'collection': 'users_collection',
+        'name': 'users_email',
+        'keys': [('email', ASCENDING)],
+        'options': {},
+        'required': True,
+    },
+    {
+        # Dashboard users list, newest first (keyset on (date_joined, _id))
+        'collection': 'users_collection',
+        'name': 'users_joined_id',
+        'keys': [('date_joined', DESCENDING), ('_id', DESCENDING)],
+        'options': {},
+        'required': True,
+    },
+    {
+        # Case-insensitive prefix search in the dashboard users list
+        'collection': 'users_collection',
+        'name': 'users_username_ci',
+        'keys': [('username', ASCENDING)],
+        'options': {'collation': {'locale': 'en', 'strength': 2}},
+        'required': True,
+    },
+    {
+        'collection': 'users_collection',
+        'name': 'users_email_ci',
+        'keys': [('email', ASCENDING)],
+        'options': {'collation': {'locale': 'en', 'strength': 2}},
+        'required': True,
+    },
+    {
+        'collection': 'products_collection',
+        'name': 'products_slug',
+        'keys': [('slug', ASCENDING)],
+        'options': {},
+        'required': True,
+    },
+    {
+        'collection': 'products_collection',
+        'name': 'products_category_created',
+        'keys': [('category_id', ASCENDING), ('created_at', DESCENDING)],
+        'options': {},
+        'required': True,
+    },
+    {
+        # Keyset pagination, newest first (see main/pagination.py)
+        'collection': 'products_collection',
+        'name': 'products_created_id',
+        'keys': [('created_at', DESCENDING), ('_id', DESCENDING)],
+        'options': {},
+        'required': True,
+    },
+    {
+        # Keyset pagination by price (scanned in both directions)
+        'collection': 'products_collection',
+        'name': 'products_price_id',
+        'keys': [('price', ASCENDING), ('_id', ASCENDING)],
+        'options': {},
+        'required': True,
+    },
+    {
+        # Ranked shop/API search (see main/product_search.py)
+        'collection': 'products_collection',
+        'name': 'products_text',
+        'keys': [('name', TEXT), ('description', TEXT), ('tags', TEXT), ('sku', TEXT)],
+        'options': {
+            'weights': {'name': 10, 'sku': 8, 'tags': 5, 'description': 1},
+            'default_language': 'english',
+        },
+        'required': True,
+    },
+    {
+        # Case-insensitive prefix range scans for autocomplete
+        'collection': 'products_collection',
+        'name': 'products_name_ci',
+        'keys': [('name', ASCENDING)],
+        'options': {'collation': {'locale': 'en', 'strength': 2}},
+        'required': True,
+    },
+    {
+        'collection': 'carts_collection',
+        'name': 'carts_user',
+        'keys': [('user_id', ASCENDING)],
+        'options': {'unique': True},
+        'required': False,
+        'hint': 'several carts for one user; `python manage.py report_duplicates` lists them to merge',
+    },
+    {
+        'collection': 'wishlists_collection',
+        'name': 'wishlists_user',
+        'keys': [('user_id', ASCENDING)],
+        'options': {'unique': True},
+        'required': False,
+        'hint': 'several wishlists for one user; `python manage.py report_duplicates` lists them to merge',
+    },
+    {
+        'collection': 'orders_collection',
+        # Order history pages are keyset ranges on (created_at, _id) per user
+        'name': 'orders_user_created_id',
+        'keys': [('user_id', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)],
+        'options': {},
+        'required': True,
+    },
+    {
+        'collection': 'orders_collection',
+        'name': 'orders_created_id',
+        'keys': [('created_at', DESCENDING), ('_id', DESCENDING)],
+        'options': {},
+        'required': True,
+    },
+    {
+        # Expiry sweep (order_service.expire_unpaid_orders): only unpaid orders
+        # still holding stock are indexed (paid orders keep stock_reserved)
+        'collection': 'orders_collection',
+        'name': 'orders_unpaid_reserved_created',
+        'keys': [('created_at', ASCENDING)],
+        'options': {'partialFilterExpression': {'stock_reserved': True, 'payment_status': 'pending'}},
+        'required': True,
+    },
+    {
+        # Numbers come from main/sequences.py; the index makes a collision an error.
+        # Not required: legacy duplicates would otherwise fail the deploy
+        'collection': 'orders_collection',
+        'name': 'orders_order_number',
+        'keys': [('order_number', ASCENDING)],
+        'options': {'unique': True},
+        'required': False,
+        'hint': 'duplicate or missing order numbers; run `python manage.py renumber_duplicates`',
+    },
+    {
+        'collection': 'payments_collection',
+        'name': 'payments_order_created',
+        'keys': [('order_id', ASCENDING), ('created_at', DESCENDING)],
+        'options': {},
+        'required': True,
+    },
+    {
+        'collection': 'payments_collection',
+        'name': 'payments_created_id',
+        'keys': [('created_at', DESCENDING), ('_id', DESCENDING)],
+        'options': {},
+        'required': True,
+    },
+    {
+        # Bakong reconciler: recently updated pending payments
+        'collection': 'payments_collection',
+        'name': 'payments_status_updated',
+        'keys': [('status', ASCENDING), ('updated_at', DESCENDING)],
+        'options': {},
+        'required': True,
+    },
+    {
+        'collection': 'payments_collection',
+        'name': 'payments_transaction_id',
+        'keys': [('transaction_id', ASCENDING)],
+        'options': {'unique': True},
+        'required': False,
+        'hint': 'duplicate or missing transaction IDs; run `python manage.py renumber_duplicates`',
+    },
+    {
+        'collection': 'addresses_collection',
+        'name': 'addresses_user',
+        'keys': [('user_id', ASCENDING)],
+        'options': {},
+        'required': True,
+    },
+    {
+        # One entry per (event, order, channel) - see main/notification_outbox.py
+        'collection': 'notification_outbox_collection',
+        'name': 'outbox_dedupe',
+        'keys': [('dedupe_key', ASCENDING)],
+        'options': {'unique': True},
+        'required': True,
+    },
+    {
+        # Dispatcher claims due entries per channel, oldest first
+        'collection': 'notification_outbox_collection',
+        'name': 'outbox_channel_status_due',
+        'keys': [('channel', ASCENDING), ('status', ASCENDING), ('next_attempt_at', ASCENDING)],
+        'options': {},
+        'required': True,
+    },
+    {
+        # Delivered entries are purged after a week
+        'collection': 'notification_outbox_collection',
+        'name': 'outbox_sent_ttl',
+        'keys': [('sent_at', ASCENDING)],
+        'options': {'expireAfterSeconds': 7 * 24 * 3600},
+        'required': False,
+    },
+    {
+        'collection': 'sliders_collection',
+        'name': 'sliders_order',
+        'keys': [('order', ASCENDING)],
+        'options': {},
+        'required': True,
+    },
+]
+
+
+def _normalize_key(key):
+    """Return an index key spec as a tuple of (field, direction) pairs."""
+    if isinstance(key, dict):
+        key = key.items()
+    return tuple((field, direction) for field, direction in key)
+
+
+def _find_existing(spec, index_info):
+    """Return the name of an existing index matching spec by name or by key."""
+    if spec['name'] in index_info:
+        return spec['name']
+    wanted = _normalize_key(spec['keys'])
+    wanted_locale = (spec.get('options', {}).get('collation') or {}).get('locale')
+    for name, info in index_info.items():
+        if _normalize_key(info.get('key', [])) != wanted:
+            continue
+        # A plain index on the same key cannot serve collation-aware queries
+        if (info.get('collation') or {}).get('locale') != wanted_locale:
+            continue
+        return name
+    return None
+
+
+def ensure_indexes(manager, dry_run=False):
+    """
+    Create every registered index that does not exist yet.
+
+    Returns a list of (spec, status, message) tuples where status is one of
+    'exists', 'created', 'missing' (dry run) or 'error'.
+    """
+    results = []
+    info_cache = {}
+    for spec in MONGO_INDEXES:
+        collection = getattr(manager, spec['collection'])
+        if spec['collection'] not in info_cache:
+            try:
+                info_cache[spec['collection']] = collection.index_information()
+            except OperationFailure:
+                # Collection does not exist yet - every index is missing
+                info_cache[spec['collection']] = {}
+        index_info = info_cache[spec['collection']]
+
+        existing = _find_existing(spec, index_info)
+        if existing:
+            message = '' if existing == spec['name'] else f'present as "{existing}"'
+            results.append((spec, 'exists', message))
+            continue
+        if dry_run:
+            results.append((spec, 'missing', ''))
+            continue
+        try:
+            collection.create_index(spec['keys'], name=spec['name'], **spec.get('options', {}))
+            index_info[spec['name']] = {'key': list(spec['keys'])}
+            results.append((spec, 'created', ''))
+        except Exception as e:
+            results.append((spec, 'error', str(e)))
+    return results
+
+
+def index_usage_report(manager):
+    """
+    Inspect every registered collection and report index hygiene problems.
+
+    Returns a dict keyed by collection name with lists of:
+      unused     - indexes with zero accesses since the server started tracking
+      redundant  - indexes whose key is a prefix of another index on the collection
+      unmanaged  - indexes that are not declared in MONGO_INDEXES
+    """
+    report = {}
+    seen = set()
+    for spec in MONGO_INDEXES:
+        attr = spec['collection']
+        if attr in seen:
+            continue
+        seen.add(attr)
+        collection = getattr(manager, attr)
+        declared = {s['name'] for s in MONGO_INDEXES if s['collection'] == attr}
+        entry = {'unused': [], 'redundant': [], 'unmanaged': []}
+
+        try:
+            index_info = collection.index_information()
+        except OperationFailure:
+            index_info = {}
+
+        try:
+            for stat in collection.aggregate([{'$indexStats': {}}]):
+                name = stat.get('name')
+                if name == '_id_':
+                    continue
+                ops = (stat.get('accesses') or {}).get('ops', 0)
+                if ops == 0:
+                    since = (stat.get('accesses') or {}).get('since')
+                    entry['unused'].append({'name': name, 'since': since})
+        except OperationFailure:
+            # $indexStats is not available on every deployment (e.g. shared tiers)
+            entry['unused'] = None
+
+        keys = {name: _normalize_key(info.get('key', [])) for name, info in index_info.items()}
+        for name, key in keys.items():
+            if name == '_id_':
+                continue
+            if name not in declared:
+                entry['unmanaged'].append(name)
+            info = index_info[name]
+            if info.get('unique') or info.get('collation') or info.get('partialFilterExpression'):
+                continue
+            for other_name, other_key in keys.items():
+                if other_name == name or other_name == '_id_':
+                    continue
+                if len(other_key) > len(key) and other_key[:len(key)] == key:
+                    entry['redundant'].append({'name': name, 'covered_by': other_name})
+                    break
+
+        report[collection.name] = entry
+    return report
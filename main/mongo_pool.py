@@ -0,0 +1,154 @@
+"""
+MongoClient construction and connection-pool instrumentation.
+
+MongoDBManager builds its client lazily, once per process, from the options
+returned by `client_kwargs`. `PoolCheckoutMetrics` is registered as a pool
+listener so we can see how long requests wait for a pooled connection and size
+gunicorn workers / maxPoolSize from real numbers.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+from pymongo import monitoring
+
+
+# Wire compressors in order of preference and the module each one needs
+_COMPRESSOR_MODULES = {
+    'zstd': 'zstandard',
+    'snappy': 'snappy',
+    'zlib': 'zlib',
+}
+
+
+def available_compressors(names):
+    """Return the configured compressors whose Python module is importable."""
+    available = []
+    for name in names:
+        module = _COMPRESSOR_MODULES.get(name)
+        if not module:
+            continue
+        try:
+            __import__(module)
+        except ImportError:
+            continue
+        available.append(name)
+    return available
+
+
+def client_kwargs(mongo_config):
+    """Build MongoClient keyword arguments from settings.MONGODB_CONFIG."""
+    kwargs = {
+        'maxPoolSize': mongo_config.get('max_pool_size', 50),
+        'minPoolSize': mongo_config.get('min_pool_size', 0),
+        'maxIdleTimeMS': mongo_config.get('max_idle_time_ms', 60000),
+        'serverSelectionTimeoutMS': mongo_config.get('server_selection_timeout_ms', 5000),
+        'connectTimeoutMS': mongo_config.get('connect_timeout_ms', 5000),
+        'readPreference': mongo_config.get('read_preference', 'primary'),
+    }
+    if mongo_config.get('wait_queue_timeout_ms'):
+        kwargs['waitQueueTimeoutMS'] = mongo_config['wait_queue_timeout_ms']
+
+    compressors = mongo_config.get('compressors') or []
+    if isinstance(compressors, str):
+        compressors = [c.strip() for c in compressors.split(',') if c.strip()]
+    compressors = available_compressors(compressors)
+    if compressors:
+        kwargs['compressors'] = ','.join(compressors)
+    return kwargs
+
+
+class PoolCheckoutMetrics(monitoring.ConnectionPoolListener):
+    """Collect connection checkout wait times for the current process."""
+
+    # Number of recent checkouts kept for percentile calculation
+    SAMPLE_SIZE = 2048
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.pid = os.getpid()
+        self.started_at = time.time()
+        self.checkouts = 0
+        self.failed_checkouts = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.in_use = 0
+        self.max_in_use = 0
+        self.connections_created = 0
+        self.connections_closed = 0
+        self.pool_clears = 0
+        self._samples = deque(maxlen=self.SAMPLE_SIZE)
+
+    # Checkout happens synchronously on the requesting thread, so the start
+    # timestamp can be kept in a thread-local until the checkout completes.
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        started = getattr(self._local, 'started', None)
+        self._local.started = None
+        wait_ms = (time.perf_counter() - started) * 1000 if started else 0.0
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+            self._samples.append(wait_ms)
+            self.in_use += 1
+            self.max_in_use = max(self.max_in_use, self.in_use)
+
+    def connection_check_out_failed(self, event):
+        self._local.started = None
+        with self._lock:
+            self.failed_checkouts += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.in_use = max(self.in_use - 1, 0)
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_created += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections_closed += 1
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def snapshot(self):
+        """Return a JSON-serializable summary of the collected metrics."""
+        with self._lock:
+            samples = sorted(self._samples)
+            checkouts = self.checkouts
+            data = {
+                'pid': self.pid,
+                'uptime_seconds': round(time.time() - self.started_at, 1),
+                'checkouts': checkouts,
+                'failed_checkouts': self.failed_checkouts,
+                'avg_wait_ms': round(self.total_wait_ms / checkouts, 3) if checkouts else 0.0,
+                'max_wait_ms': round(self.max_wait_ms, 3),
+                'in_use': self.in_use,
+                'max_in_use': self.max_in_use,
+                'connections_created': self.connections_created,
+                'connections_closed': self.connections_closed,
+                'pool_clears': self.pool_clears,
+            }
+        for label, pct in (('p50_wait_ms', 0.50), ('p95_wait_ms', 0.95), ('p99_wait_ms', 0.99)):
+            data[label] = round(samples[min(int(len(samples) * pct), len(samples) - 1)], 3) if samples else 0.0
+        return data
@@ -0,0 +1,91 @@
+"""
+Request-scoped resolution of the MongoDB user behind request.user.
+
+Storefront views need the Mongo user (almost always just its _id) several
+times per request. MongoUserMiddleware attaches:
+
+  - request.mongo_user: the full user document, loaded lazily on first use
+    and memoized for the rest of the request;
+  - get_mongo_user_id(request): the user's _id as a string, served from a
+    per-process LRU keyed by the Django user id, so most requests need no
+    user lookup at all.
+
+The mapping never changes for a given Django user, so LRU entries only go
+away when evicted or when MongoDBManager.delete_user forgets them.
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+
+from .mongodb_utils import mongodb_manager
+
+
+_user_ids = OrderedDict()
+_lock = threading.Lock()
+
+
+def _remember(django_user_id, mongo_user_id):
+    with _lock:
+        _user_ids[django_user_id] = mongo_user_id
+        _user_ids.move_to_end(django_user_id)
+        while len(_user_ids) > getattr(settings, 'MONGO_USER_ID_CACHE_SIZE', 1024):
+            _user_ids.popitem(last=False)
+
+
+def _cached(django_user_id):
+    with _lock:
+        mongo_user_id = _user_ids.get(django_user_id)
+        if mongo_user_id is not None:
+            _user_ids.move_to_end(django_user_id)
+        return mongo_user_id
+
+
+def forget_mongo_user(mongo_user_id):
+    """Drop any cached mapping to a Mongo user id (e.g. after it is deleted)."""
+    mongo_user_id = str(mongo_user_id)
+    with _lock:
+        for django_user_id in [k for k, v in _user_ids.items() if v == mongo_user_id]:
+            del _user_ids[django_user_id]
+
+
+def _load_mongo_user(request):
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return None
+    doc = mongodb_manager.get_user_by_username(user.username)
+    if doc:
+        _remember(user.pk, str(doc['_id']))
+    return doc
+
+
+def get_mongo_user_id(request):
+    """Return the Mongo _id (str) of the logged-in user, or None."""
+    if hasattr(request, '_mongo_user_id'):
+        return request._mongo_user_id
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return None
+
+    mongo_user_id = _cached(user.pk)
+    if mongo_user_id is None:
+        mongo_user = getattr(request, 'mongo_user', None)
+        if mongo_user is None:
+            # Called without the middleware - look the user up directly
+            mongo_user = _load_mongo_user(request)
+        if mongo_user:
+            mongo_user_id = str(mongo_user.get('_id'))
+    request._mongo_user_id = mongo_user_id
+    return mongo_user_id
+
+
+class MongoUserMiddleware:
+    """Attach a lazy, per-request request.mongo_user (needs AuthenticationMiddleware first)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.mongo_user = SimpleLazyObject(lambda: _load_mongo_user(request))
+        return self.get_response(request)
@@ -1,50 +1,139 @@
 from pymongo import MongoClient
 from django.conf import settings
-import bcrypt
+import os
+import threading
 from datetime import datetime
 from bson import ObjectId
+from pymongo.errors import OperationFailure
+from .mongo_pool import PoolCheckoutMetrics, client_kwargs
+from . import cart_ops, listing_totals, pagination, passwords, product_search, projections
+from .catalog_cache import bump_catalog_version, forget_wishlist, get_cached_wishlist, set_cached_wishlist
+from .category_tree import CategoryTreeIndex
+from .last_login import LastLoginBuffer
+from .sequences import SequenceAllocator
+
+# Collation of the users_username_ci / users_email_ci indexes
+USER_SEARCH_COLLATION = {'locale': 'en', 'strength': 2}
 
 class MongoDBManager:
     def __init__(self):
+        # The client is created lazily on first use and re-created after a fork,
+        # so gunicorn workers never share the master's connection pool.
+        self._client = None
+        self._client_pid = None
+        self._db = None
+        self._collections = {}
+        self._client_lock = threading.Lock()
+        self.pool_metrics = PoolCheckoutMetrics()
+        self.category_tree = CategoryTreeIndex(self)
+        self.order_numbers = SequenceAllocator(self, 'order_number')
+        self.transaction_ids = SequenceAllocator(self, 'transaction_id')
+        self.last_logins = LastLoginBuffer(self)
+
+    def _connect(self):
+        """Create the MongoClient for the current process."""
+        mongo_config = settings.MONGODB_CONFIG
+        self.pool_metrics = PoolCheckoutMetrics()
+        options = client_kwargs(mongo_config)
+        options['event_listeners'] = [self.pool_metrics]
         # Use Atlas connection string if available (production), otherwise use local
-        if settings.MONGODB_CONFIG.get('atlas_uri'):
-            self.client = MongoClient(settings.MONGODB_CONFIG['atlas_uri'])
+        if mongo_config.get('atlas_uri'):
+            client = MongoClient(mongo_config['atlas_uri'], **options)
         else:
-            self.client = MongoClient(
-                host=settings.MONGODB_CONFIG['host'],
-                port=settings.MONGODB_CONFIG['port']
+            client = MongoClient(
+                host=mongo_config['host'],
+                port=mongo_config['port'],
+                **options
             )
-        self.db = self.client[settings.MONGODB_CONFIG['database']]
-        self.users_collection = self.db[settings.MONGODB_CONFIG['collection']]
-        # Products collection (assumes 'products' collection name)
-        self.products_collection = self.db.get_collection('products')
-        # Categories collection
-        self.categories_collection = self.db.get_collection('categories')
-        # Orders collection
-        self.orders_collection = self.db.get_collection('orders')
-        # Payments collection (try both 'payment' and 'payments' to support different naming)
-        try:
-            self.payments_collection = self.db.get_collection('payments')
-        except:
-            self.payments_collection = self.db.get_collection('payment')
-        # Carts collection
-        self.carts_collection = self.db.get_collection('carts')
-        # Wishlists collection
-        self.wishlists_collection = self.db.get_collection('wishlists')
-        # Addresses collection
-        self.addresses_collection = self.db.get_collection('addresses')
-        # Sliders collection
-        self.sliders_collection = self.db.get_collection('sliders')
-        # FAQs collection
-        self.faqs_collection = self.db.get_collection('faqs')
+        self._db = client[mongo_config['database']]
+        self._collections = {}
+        return client
+
+    @property
+    def client(self):
+        """Per-process MongoClient (reconnects after fork)."""
+        pid = os.getpid()
+        if self._client is None or self._client_pid != pid:
+            with self._client_lock:
+                if self._client is None or self._client_pid != pid:
+                    # Do not close an inherited client: its sockets belong to the parent
+                    self._client = self._connect()
+                    self._client_pid = pid
+        return self._client
+
+    @property
+    def db(self):
+        self.client
+        return self._db
+
+    def _collection(self, name):
+        db = self.db
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = db.get_collection(name)
+            self._collections[name] = collection
+        return collection
+
+    @property
+    def users_collection(self):
+        return self._collection(settings.MONGODB_CONFIG['collection'])
+
+    @property
+    def products_collection(self):
+        return self._collection('products')
+
+    @property
+    def categories_collection(self):
+        return self._collection('categories')
+
+    @property
+    def orders_collection(self):
+        return self._collection('orders')
+
+    @property
+    def payments_collection(self):
+        return self._collection('payments')
+
+    @property
+    def carts_collection(self):
+        return self._collection('carts')
+
+    @property
+    def wishlists_collection(self):
+        return self._collection('wishlists')
+
+    @property
+    def addresses_collection(self):
+        return self._collection('addresses')
+
+    @property
+    def counters_collection(self):
+        return self._collection('counters')
+
+    @property
+    def sliders_collection(self):
+        return self._collection('sliders')
+
+    @property
+    def faqs_collection(self):
+        return self._collection('faqs')
+
+    @property
+    def notification_outbox_collection(self):
+        return self._collection('notification_outbox')
+
+    def pool_stats(self):
+        """Connection pool checkout metrics for this process."""
+        stats = self.pool_metrics.snapshot()
+        stats['max_pool_size'] = settings.MONGODB_CONFIG.get('max_pool_size', 50)
+        stats['connected'] = self._client is not None and self._client_pid == os.getpid()
+        return stats
     
     def create_user(self, user_data):
         """Create a new user in MongoDB"""
         # Hash the password
         if 'password' in user_data:
-            password = user_data['password'].encode('utf-8')
-            hashed_password = bcrypt.hashpw(password, bcrypt.gensalt())
-            user_data['password'] = hashed_password.decode('utf-8')
+            user_data['password'] = passwords.hash_password(user_data['password'])
         
         # Add timestamps
         user_data['date_joined'] = datetime.utcnow()
@@ -79,9 +168,7 @@ class MongoDBManager:
         try:
             # Hash password if it's being updated
             if 'password' in update_data:
-                password = update_data['password'].encode('utf-8')
-                hashed_password = bcrypt.hashpw(password, bcrypt.gensalt())
-                update_data['password'] = hashed_password.decode('utf-8')
+                update_data['password'] = passwords.hash_password(update_data['password'])
             
             object_id = ObjectId(user_id)
             result = self.users_collection.update_one(
@@ -97,37 +184,93 @@ class MongoDBManager:
         try:
             object_id = ObjectId(user_id)
             result = self.users_collection.delete_one({'_id': object_id})
+            from .mongo_users import forget_mongo_user
+            forget_mongo_user(object_id)
             return result.deleted_count > 0
         except:
             return False
     
     def get_all_users(self):
-        """Get all users"""
-        return list(self.users_collection.find())
-    
-    def verify_password(self, username, password):
-        """Verify user password"""
-        user = self.get_user_by_username(username)
-        if user and 'password' in user:
-            stored_password = user['password'].encode('utf-8')
-            return bcrypt.checkpw(password.encode('utf-8'), stored_password)
-        return False
+        """Get all users (listing fields only - no password hashes)"""
+        return list(self.users_collection.find({}, projections.USER_ADMIN_ROW))
+
+    @staticmethod
+    def _format_user_admin_row(doc):
+        """Dashboard users table row (projections.USER_ADMIN_ROW)."""
+        return {
+            'id': str(doc['_id']),
+            'username': doc.get('username', ''),
+            'email': doc.get('email', ''),
+            'first_name': doc.get('first_name', ''),
+            'last_name': doc.get('last_name', ''),
+            'is_active': doc.get('is_active', True),
+            'is_staff': doc.get('is_staff', False),
+            'is_superuser': doc.get('is_superuser', False),
+            'date_joined': doc.get('date_joined'),
+            'last_login': doc.get('last_login'),
+            'phone': doc.get('phone', ''),
+        }
+
+    def search_users(self, search=None, role=None, page=1, page_size=10, cursor=None):
+        """
+        Dashboard users listing, newest first.
+
+        `search` is a case-insensitive prefix of the username or email (range
+        scans on users_username_ci / users_email_ci); `role` is 'admin' (staff
+        or superuser) or 'normal'. Returns the same shape as list_orders.
+        """
+        try:
+            clauses = []
+            collation = None
+            search = (search or '').strip()
+            if search:
+                prefix = {'$gte': search, '$lt': search + '\uffff'}
+                clauses.append({'$or': [{'username': prefix}, {'email': prefix}]})
+                # Must match the *_ci index collation for the range scans
+                collation = USER_SEARCH_COLLATION
+            if role == 'admin':
+                clauses.append({'$or': [{'is_staff': True}, {'is_superuser': True}]})
+            elif role == 'normal':
+                clauses.append({'is_staff': {'$ne': True}, 'is_superuser': {'$ne': True}})
+            query = clauses[0] if len(clauses) == 1 else ({'$and': clauses} if clauses else {})
+
+            docs, next_cursor, prev_cursor, total = listing_totals.page_with_total(
+                self.users_collection, query, 'date_joined', -1, page_size, page=page, cursor=cursor,
+                projection=projections.USER_ADMIN_ROW, collation=collation,
+            )
+            return {
+                'items': [self._format_user_admin_row(doc) for doc in docs],
+                'total': total,
+                'page': page,
+                'page_size': page_size,
+                'next_cursor': next_cursor,
+                'prev_cursor': prev_cursor,
+            }
+        except Exception as e:
+            print(f"Error searching users: {e}")
+            return {
+                'items': [],
+                'total': 0,
+                'page': page,
+                'page_size': page_size,
+                'next_cursor': None,
+                'prev_cursor': None,
+            }
+
+    def check_user_password(self, user, password):
+        """Verify password against a loaded user document, upgrading its hash cost if needed"""
+        return passwords.check_and_upgrade(self.users_collection, user, password)
     
-    def update_last_login(self, username):
-        """Update user's last login time"""
-        return self.users_collection.update_one(
-            {'username': username},
-            {'$set': {'last_login': datetime.utcnow()}}
-        )
+    def stamp_last_login(self, username):
+        """Record a login; last_login is written in batches (see main/last_login.py)"""
+        self.last_logins.stamp(username)
 
     # --------------------
     # Product helpers
     # --------------------
     @staticmethod
-    def _format_product_doc(product_doc):
-        """Map a MongoDB product document to a template-friendly dict."""
-        if not product_doc:
-            return None
+    def _product_images(product_doc):
+        """Return (images, main_image) for a product document."""
         images = [img for img in (product_doc.get('images') or []) if isinstance(img, str) and img.strip()]
         # First image is the main image
         main_image = ''
@@ -136,12 +279,22 @@ class MongoDBManager:
             # URL-encode spaces in local file paths if needed
             if not main_image.startswith('http://') and not main_image.startswith('https://'):
                 main_image = main_image.replace(' ', '%20') if ' ' in main_image else main_image
-        # Normalize category_id to string for JSON serialization
-        raw_category_id = product_doc.get('category_id')
-        if isinstance(raw_category_id, ObjectId):
-            category_id_str = str(raw_category_id)
-        else:
-            category_id_str = raw_category_id if (isinstance(raw_category_id, str) or raw_category_id is None) else str(raw_category_id)
+        return images, main_image
+
+    @staticmethod
+    def _category_id_str(raw_category_id):
+        """Normalize category_id to string for JSON serialization."""
+        if raw_category_id is None or isinstance(raw_category_id, str):
+            return raw_category_id
+        return str(raw_category_id)
+
+    @classmethod
+    def _format_product_doc(cls, product_doc):
+        """Map a MongoDB product document to a template-friendly dict."""
+        if not product_doc:
+            return None
+        images, main_image = cls._product_images(product_doc)
+        category_id_str = cls._category_id_str(product_doc.get('category_id'))
         return {
             'id': str(product_doc.get('_id')),
             'name': product_doc.get('name', ''),
@@ -160,8 +313,71 @@ class MongoDBManager:
             'updated_at': product_doc.get('updated_at'),
         }
 
-    def list_products(self, *, category: str | None = None, search: str | None = None, max_price: str | None = None, sort_by: str | None = None, date_from: str | None = None, date_to: str | None = None, page: int | None = None, page_size: int = 12):
-        """Return a list of products with optional filtering and basic pagination."""
+    @classmethod
+    def _format_product_card(cls, doc):
+        """Shop/home grid card (projections.PRODUCT_CARD)."""
+        _, main_image = cls._product_images(doc)
+        return {
+            'id': str(doc['_id']),
+            'name': doc.get('name', ''),
+            'slug': doc.get('slug', ''),
+            'price': doc.get('price', 0),
+            'compare_price': doc.get('compare_price'),
+            'main_image': main_image,
+            'is_available': doc.get('is_available', True),
+        }
+
+    @classmethod
+    def _format_product_admin_row(cls, doc):
+        """Dashboard products table row (projections.PRODUCT_ADMIN_ROW)."""
+        images, main_image = cls._product_images(doc)
+        return {
+            'id': str(doc['_id']),
+            'name': doc.get('name', ''),
+            'slug': doc.get('slug', ''),
+            'sku': doc.get('sku', ''),
+            'price': doc.get('price', 0),
+            'quantity': doc.get('quantity', 0),
+            'is_available': doc.get('is_available', True),
+            'category_id': cls._category_id_str(doc.get('category_id')),
+            'images': images,
+            'main_image': main_image,
+            'created_at': doc.get('created_at'),
+            'updated_at': doc.get('updated_at'),
+        }
+
+    @classmethod
+    def _format_product_cart_line(cls, doc):
+        """Cart/wishlist line (projections.PRODUCT_CART_LINE)."""
+        _, main_image = cls._product_images(doc)
+        return {
+            'id': str(doc['_id']),
+            'name': doc.get('name', ''),
+            'sku': doc.get('sku', ''),
+            'price': doc.get('price', 0),
+            'quantity': doc.get('quantity', 0),
+            'is_available': doc.get('is_available', True),
+            'main_image': main_image,
+        }
+
+    def _product_formatter(self, fields):
+        return {
+            'card': self._format_product_card,
+            'admin_row': self._format_product_admin_row,
+            'cart_line': self._format_product_cart_line,
+        }.get(fields, self._format_product_doc)
+
+    def list_products(self, *, category: str | None = None, search: str | None = None, max_price: str | None = None, sort_by: str | None = None, date_from: str | None = None, date_to: str | None = None, page: int | None = None, page_size: int = 12, cursor: str | None = None, fields: str = 'detail'):
+        """
+        Return a list of products with optional filtering and basic pagination.
+
+        Searches use the products text index and default to relevance order
+        (sort_by='relevance'); other sort options still apply to search results.
+        Pass `cursor` (next_cursor/prev_cursor of a previous call) for keyset
+        paging; relevance-ordered searches only support page numbers.
+        `fields` picks a projection from projections.PRODUCT_PROJECTIONS
+        ('card', 'admin_row', 'cart_line' or the full 'detail').
+        """
         from datetime import datetime
         
         query = {}
@@ -178,37 +394,17 @@ class MongoDBManager:
             
             if category_str:
                 try:
-                    category_id_obj = ObjectId(category_str)
-                    # Get all child categories (recursively) for hierarchical filtering
-                    all_category_ids = [category_id_obj]
-                
-                    # Recursive function to get all child categories
-                    def get_child_categories(parent_obj_id):
-                        child_categories = self.categories_collection.find({'parent_id': parent_obj_id})
-                        child_ids = []
-                        for child in child_categories:
-                            child_id = child.get('_id')
-                            if child_id:
-                                child_ids.append(child_id)
-                                # Recursively get grandchildren
-                                child_ids.extend(get_child_categories(child_id))
-                        return child_ids
-                
-                    # Get all child categories
-                    child_ids = get_child_categories(category_id_obj)
-                    if child_ids:
-                        all_category_ids.extend(child_ids)
-                    
-                    # Store category IDs for later use in query building
-                    category_ids_list = all_category_ids
+                    # The category plus all of its descendants, from the in-process tree index
+                    category_ids_list = self.category_tree.descendant_ids(category_str)
                 except Exception:
                     # If ObjectId conversion fails, skip category filter
                     pass
         
         # Search filter (only if search is provided and not empty)
-        search_pattern = None
+        search_clause = None
+        uses_text = False
         if search and search.strip():
-            search_pattern = search.strip()
+            search_clause, uses_text = product_search.search_clause(self.products_collection, search.strip())
             
         # Price filter (only if max_price is provided and not empty)
         max_price_val = None
@@ -251,8 +447,8 @@ class MongoDBManager:
             # Combine with other filters using $and if we have multiple conditions
             and_conditions = [category_filter]
             
-            if search_pattern:
-                and_conditions.append({'name': {'$regex': search_pattern, '$options': 'i'}})
+            if search_clause:
+                and_conditions.append(search_clause)
             
             if max_price_val is not None:
                 and_conditions.append({'price': {'$lte': max_price_val}})
@@ -266,8 +462,8 @@ class MongoDBManager:
                 query = and_conditions[0]
         else:
             # No category filter, build simple query
-            if search_pattern:
-                query['name'] = {'$regex': search_pattern, '$options': 'i'}
+            if search_clause:
+                query.update(search_clause)
             
             if max_price_val is not None:
                 query['price'] = {'$lte': max_price_val}
@@ -275,30 +471,57 @@ class MongoDBManager:
             if date_query:
                 query['created_at'] = date_query
 
-        cursor = self.products_collection.find(query)
-        
-        # Sorting
+        projection = projections.PRODUCT_PROJECTIONS.get(fields)
+        if uses_text:
+            projection = projections.with_text_score(projection)
+        format_product = self._product_formatter(fields)
+
+        # Sorting - (field, direction) doubles as the keyset for cursor paging
         if sort_by == 'price_low':
-            cursor = cursor.sort('price', 1)
+            sort_key = ('price', 1)
         elif sort_by == 'price_high':
-            cursor = cursor.sort('price', -1)
-        elif sort_by == 'newest':
-            cursor = cursor.sort('created_at', -1)
+            sort_key = ('price', -1)
+        elif sort_by == 'newest' or not uses_text:
+            sort_key = ('created_at', -1)  # Default: newest first
         else:
-            cursor = cursor.sort('created_at', -1)  # Default: newest first
-            
-        total = cursor.count() if hasattr(cursor, 'count') else self.products_collection.count_documents(query)
+            sort_key = None  # Searches default to relevance order
 
-        if page:
-            skip = max(page - 1, 0) * page_size
-            cursor = cursor.skip(skip).limit(page_size)
-
-        products = [self._format_product_doc(doc) for doc in cursor]
+        next_cursor = prev_cursor = None
+        try:
+            if sort_key and (page or cursor):
+                docs, next_cursor, prev_cursor, total = listing_totals.page_with_total(
+                    self.products_collection, query, sort_key[0], sort_key[1], page_size,
+                    page=page, cursor=cursor, projection=projection,
+                )
+            else:
+                total = listing_totals.count_total(self.products_collection, query)
+                find_cursor = self.products_collection.find(query, projection)
+                if sort_key:
+                    find_cursor = find_cursor.sort([sort_key, ('_id', sort_key[1])])
+                else:
+                    # Best match first, newest among equal scores
+                    find_cursor = find_cursor.sort([('score', {'$meta': 'textScore'}), ('created_at', -1)])
+                if page:
+                    skip = max(page - 1, 0) * page_size
+                    find_cursor = find_cursor.skip(skip).limit(page_size)
+                docs = list(find_cursor)
+            products = [format_product(doc) for doc in docs]
+        except OperationFailure as e:
+            if not uses_text:
+                raise
+            # Text index was dropped since we last checked - retry with the regex path
+            print(f"Text search failed, retrying without text index: {e}")
+            product_search.mark_text_index_missing(self.products_collection)
+            return self.list_products(category=category, search=search, max_price=max_price,
+                                      sort_by=sort_by, date_from=date_from, date_to=date_to,
+                                      page=page, page_size=page_size, cursor=cursor, fields=fields)
         return {
             'items': products,
             'total': total,
             'page': page or 1,
             'page_size': page_size,
+            'next_cursor': next_cursor,
+            'prev_cursor': prev_cursor,
         }
 
     def get_product_by_id(self, product_id: str):
@@ -311,6 +534,40 @@ class MongoDBManager:
     def get_product_by_slug(self, slug: str):
         doc = self.products_collection.find_one({'slug': slug})
         return self._format_product_doc(doc)
+
+    def get_products_by_ids(self, product_ids, fields: str = 'cart_line'):
+        """Return products for a list of ids in the same order, skipping unknown ids."""
+        object_ids = []
+        for product_id in product_ids:
+            try:
+                object_ids.append(ObjectId(str(product_id)))
+            except Exception:
+                continue
+        if not object_ids:
+            return []
+        format_product = self._product_formatter(fields)
+        docs = self.products_collection.find({'_id': {'$in': object_ids}}, projections.PRODUCT_PROJECTIONS.get(fields))
+        by_id = {doc['_id']: doc for doc in docs}
+        return [format_product(by_id[oid]) for oid in object_ids if oid in by_id]
+
+    def autocomplete_products(self, prefix: str, limit: int = 8):
+        """Return lightweight name suggestions for a search prefix."""
+        try:
+            docs = product_search.autocomplete(self.products_collection, prefix, limit=limit)
+        except Exception as e:
+            print(f"Error fetching product suggestions from MongoDB: {e}")
+            return []
+        suggestions = []
+        for doc in docs:
+            images = doc.get('images') or []
+            suggestions.append({
+                'id': str(doc.get('_id')),
+                'name': doc.get('name', ''),
+                'slug': doc.get('slug', ''),
+                'price': doc.get('price', 0),
+                'main_image': images[0] if images else '',
+            })
+        return suggestions
     
     # --------------------
     # Product Management (CRUD)
@@ -340,6 +597,7 @@ class MongoDBManager:
         product_data.setdefault('images', [])
         
         result = self.products_collection.insert_one(product_data)
+        bump_catalog_version()
         return str(result.inserted_id)
     
     def update_product(self, product_id: str, update_data):
@@ -362,6 +620,8 @@ class MongoDBManager:
                 {'_id': object_id},
                 {'$set': update_data}
             )
+            if result.modified_count > 0:
+                bump_catalog_version()
             return result.modified_count > 0
         except Exception:
             return False
@@ -371,6 +631,8 @@ class MongoDBManager:
         try:
             object_id = ObjectId(product_id)
             result = self.products_collection.delete_one({'_id': object_id})
+            if result.deleted_count > 0:
+                bump_catalog_version()
             return result.deleted_count > 0
         except Exception:
             return False
@@ -454,6 +716,8 @@ class MongoDBManager:
         category_data.setdefault('description', '')
         
         result = self.categories_collection.insert_one(category_data)
+        bump_catalog_version()
+        self.category_tree.invalidate()
         return str(result.inserted_id)
     
     def update_category(self, category_id: str, update_data):
@@ -476,6 +740,9 @@ class MongoDBManager:
                 {'_id': object_id},
                 {'$set': update_data}
             )
+            if result.modified_count > 0:
+                bump_catalog_version()
+                self.category_tree.invalidate()
             return result.modified_count > 0
         except Exception:
             return False
@@ -485,6 +752,9 @@ class MongoDBManager:
         try:
             object_id = ObjectId(category_id)
             result = self.categories_collection.delete_one({'_id': object_id})
+            if result.deleted_count > 0:
+                bump_catalog_version()
+                self.category_tree.invalidate()
             return result.deleted_count > 0
         except Exception:
             return False
@@ -528,7 +798,8 @@ class MongoDBManager:
                     else:
                         return False
             
-            # Upsert cart (update if exists, create if not)
+            # Upsert cart (update if exists, create if not); the version bump
+            # tells clients using apply_cart_ops that their copy is stale
             result = self.carts_collection.update_one(
                 {'user_id': user_id},
                 {
@@ -536,6 +807,7 @@ class MongoDBManager:
                         'cart_data': cart_data,
                         'updated_at': datetime.utcnow()
                     },
+                    '$inc': {'version': 1},
                     '$setOnInsert': {
                         'created_at': datetime.utcnow()
                     }
@@ -547,6 +819,18 @@ class MongoDBManager:
             print(f"Error saving user cart: {e}")
             return False
     
+    def apply_cart_ops(self, user_id: str, ops, version=None):
+        """
+        Apply add/update/remove/clear operations to the user's cart (see cart_ops).
+
+        Returns cart_ops.apply_ops()'s result, or None if the user is unknown.
+        Raises cart_ops.CartOpError for malformed operations.
+        """
+        owner_id = self._owner_id(user_id)
+        if owner_id is None:
+            return None
+        return cart_ops.apply_ops(self.carts_collection, owner_id, ops, version)
+
     def clear_user_cart(self, user_id: str):
         """Clear user's cart in MongoDB"""
         try:
@@ -568,7 +852,8 @@ class MongoDBManager:
                     '$set': {
                         'cart_data': [],
                         'updated_at': datetime.utcnow()
-                    }
+                    },
+                    '$inc': {'version': 1}
                 }
             )
             return result.modified_count > 0 or result.matched_count > 0
@@ -582,19 +867,10 @@ class MongoDBManager:
     def get_user_wishlist(self, user_id: str):
         """Get user's wishlist from MongoDB"""
         try:
-            # Convert user_id to ObjectId if it's a string
-            if isinstance(user_id, str):
-                try:
-                    user_id = ObjectId(user_id)
-                except:
-                    # If it's not a valid ObjectId, try to find by username
-                    user = self.get_user_by_username(user_id)
-                    if user:
-                        user_id = user.get('_id')
-                    else:
-                        return []
-            
-            wishlist = self.wishlists_collection.find_one({'user_id': user_id})
+            user_id = self._owner_id(user_id)
+            if user_id is None:
+                return []
+            wishlist = self.wishlists_collection.find_one({'user_id': user_id}, {'items': 1})
             if wishlist and wishlist.get('items'):
                 return wishlist.get('items', [])
             return []
@@ -602,96 +878,90 @@ class MongoDBManager:
             print(f"Error getting user wishlist: {e}")
             return []
     
+    def get_wishlist_products(self, user_id: str):
+        """
+        Return the user's wishlist as product cards, in wishlist order.
+
+        One $in query with the card projection; products deleted since they
+        were saved are dropped. Cached per user until the wishlist or the
+        catalog changes.
+        """
+        try:
+            user_id = self._owner_id(user_id)
+        except Exception:
+            user_id = None
+        if user_id is None:
+            return []
+        items = get_cached_wishlist(user_id)
+        if items is None:
+            try:
+                items = self.get_products_by_ids(self.get_user_wishlist(user_id), fields='card')
+            except Exception as e:
+                print(f"Error loading wishlist products: {e}")
+                return []
+            set_cached_wishlist(user_id, items)
+        return items
+
+    def _owner_id(self, user_id):
+        """Return the owner ObjectId for a user id string (or username), or None."""
+        if not isinstance(user_id, str):
+            return user_id
+        try:
+            return ObjectId(user_id)
+        except Exception:
+            user = self.get_user_by_username(user_id)
+            return user.get('_id') if user else None
+
     def add_to_wishlist(self, user_id: str, product_id: str):
-        """Add product to user's wishlist"""
+        """Add product to user's wishlist (one atomic upsert). Returns True if it was added."""
         try:
-            # Convert user_id to ObjectId
-            if isinstance(user_id, str):
-                try:
-                    user_id = ObjectId(user_id)
-                except:
-                    user = self.get_user_by_username(user_id)
-                    if user:
-                        user_id = user.get('_id')
-                    else:
-                        return False
-            
-            # Convert product_id to ObjectId
-            if isinstance(product_id, str):
-                try:
-                    product_id = ObjectId(product_id)
-                except:
-                    return False
-            
-            # Get current wishlist
-            wishlist = self.wishlists_collection.find_one({'user_id': user_id})
-            
-            if wishlist:
-                items = wishlist.get('items', [])
-                # Check if product already in wishlist
-                if product_id not in items:
-                    items.append(product_id)
-                    self.wishlists_collection.update_one(
-                        {'user_id': user_id},
-                        {
-                            '$set': {
-                                'items': items,
-                                'updated_at': datetime.utcnow()
-                            }
-                        }
-                    )
-                    return True
-                return False  # Already in wishlist
-            else:
-                # Create new wishlist
-                self.wishlists_collection.insert_one({
-                    'user_id': user_id,
-                    'items': [product_id],
-                    'created_at': datetime.utcnow(),
-                    'updated_at': datetime.utcnow()
-                })
-                return True
+            user_id = self._owner_id(user_id)
+            if user_id is None:
+                return False
+            product_id = ObjectId(product_id)
+        except Exception:
+            return False
+        try:
+            now = datetime.utcnow()
+            # $addToSet keeps concurrent adds from different tabs and never duplicates
+            result = self.wishlists_collection.update_one(
+                {'user_id': user_id},
+                {
+                    '$addToSet': {'items': product_id},
+                    '$set': {'updated_at': now},
+                    '$setOnInsert': {'created_at': now},
+                },
+                upsert=True,
+            )
+            added = result.upserted_id is not None or result.modified_count > 0
+            if added:
+                forget_wishlist(user_id)
+            return added
         except Exception as e:
             print(f"Error adding to wishlist: {e}")
             return False
     
     def remove_from_wishlist(self, user_id: str, product_id: str):
-        """Remove product from user's wishlist"""
+        """Remove product from user's wishlist (one atomic update). Returns True if it was removed."""
         try:
-            # Convert user_id to ObjectId
-            if isinstance(user_id, str):
-                try:
-                    user_id = ObjectId(user_id)
-                except:
-                    user = self.get_user_by_username(user_id)
-                    if user:
-                        user_id = user.get('_id')
-                    else:
-                        return False
-            
-            # Convert product_id to ObjectId
-            if isinstance(product_id, str):
-                try:
-                    product_id = ObjectId(product_id)
-                except:
-                    return False
-            
-            wishlist = self.wishlists_collection.find_one({'user_id': user_id})
-            if wishlist:
-                items = wishlist.get('items', [])
-                if product_id in items:
-                    items.remove(product_id)
-                    self.wishlists_collection.update_one(
-                        {'user_id': user_id},
-                        {
-                            '$set': {
-                                'items': items,
-                                'updated_at': datetime.utcnow()
-                            }
-                        }
-                    )
-                    return True
+            user_id = self._owner_id(user_id)
+            if user_id is None:
+                return False
+            product_id = ObjectId(product_id)
+        except Exception:
             return False
+        try:
+            # Only matches (and bumps updated_at) when the product is present
+            result = self.wishlists_collection.update_one(
+                {'user_id': user_id, 'items': product_id},
+                {
+                    '$pull': {'items': product_id},
+                    '$set': {'updated_at': datetime.utcnow()},
+                },
+            )
+            if result.modified_count:
+                forget_wishlist(user_id)
+            return result.modified_count > 0
         except Exception as e:
             print(f"Error removing from wishlist: {e}")
             return False
@@ -699,36 +969,64 @@ class MongoDBManager:
     def is_in_wishlist(self, user_id: str, product_id: str):
         """Check if product is in user's wishlist"""
         try:
-            # Convert user_id to ObjectId
-            if isinstance(user_id, str):
-                try:
-                    user_id = ObjectId(user_id)
-                except:
-                    user = self.get_user_by_username(user_id)
-                    if user:
-                        user_id = user.get('_id')
-                    else:
-                        return False
-            
-            # Convert product_id to ObjectId
-            if isinstance(product_id, str):
-                try:
-                    product_id = ObjectId(product_id)
-                except:
-                    return False
-            
-            wishlist = self.wishlists_collection.find_one({'user_id': user_id})
-            if wishlist:
-                items = wishlist.get('items', [])
-                return product_id in items
+            user_id = self._owner_id(user_id)
+            if user_id is None:
+                return False
+            product_id = ObjectId(product_id)
+        except Exception:
             return False
+        try:
+            # Served by the user_id index; the array is never shipped back
+            return self.wishlists_collection.find_one(
+                {'user_id': user_id, 'items': product_id}, {'_id': 1},
+            ) is not None
         except Exception as e:
             print(f"Error checking wishlist: {e}")
             return False
 
+    def is_in_wishlist_many(self, user_id: str, product_ids):
+        """
+        Return the subset of product_ids (as given) that are in the user's wishlist.
+
+        One query for a whole product grid: the wishlist array is filtered
+        server-side so only the matching ids come back.
+        """
+        wanted = {}
+        for product_id in product_ids or []:
+            try:
+                wanted[ObjectId(product_id)] = product_id
+            except Exception:
+                continue
+        if not wanted:
+            return set()
+        try:
+            user_id = self._owner_id(user_id)
+            if user_id is None:
+                return set()
+            docs = self.wishlists_collection.aggregate([
+                {'$match': {'user_id': user_id}},
+                {'$project': {'_id': 0, 'items': {
+                    '$filter': {'input': '$items', 'cond': {'$in': ['$$this', list(wanted)]}},
+                }}},
+            ])
+            for doc in docs:
+                return {wanted[item] for item in doc.get('items') or [] if item in wanted}
+            return set()
+        except Exception as e:
+            print(f"Error checking wishlist: {e}")
+            return set()
+
     # --------------------
     # Order helpers
     # --------------------
+    def new_order_number(self):
+        """Unique, increasing order number (e.g., ORD-YYYYMMDD-00001234) - see sequences.py."""
+        return f"ORD-{datetime.utcnow().strftime('%Y%m%d')}-{self.order_numbers.next():08d}"
+
+    def new_transaction_id(self):
+        """Unique, increasing payment transaction ID (e.g., TXN-YYYYMMDD-00001234)."""
+        return f"TXN-{datetime.utcnow().strftime('%Y%m%d')}-{self.transaction_ids.next():08d}"
+
     def create_order(self, order_data):
         """Create a new order in MongoDB"""
         try:
@@ -746,9 +1044,7 @@ class MongoDBManager:
             
             # Generate order number if not provided
             if 'order_number' not in order_data or not order_data.get('order_number'):
-                # Generate unique order number (e.g., ORD-YYYYMMDD-HHMMSS-XXXX)
-                timestamp = datetime.utcnow()
-                order_data['order_number'] = f"ORD-{timestamp.strftime('%Y%m%d')}-{timestamp.strftime('%H%M%S')}-{str(timestamp.microsecond)[:4]}"
+                order_data['order_number'] = self.new_order_number()
             
             # Set default values
             order_data.setdefault('status', 'pending')
@@ -807,8 +1103,74 @@ class MongoDBManager:
         except Exception as e:
             print(f"Error getting user orders: {e}")
             return []
-    
-    def list_orders(self, page=1, page_size=10, status=None, date_from=None, date_to=None, user_id=None):
+
+    @staticmethod
+    def _format_order_history_row(doc):
+        """Customer order history row (projections.ORDER_HISTORY_ROW)."""
+        return {
+            'id': str(doc['_id']),
+            'order_number': doc.get('order_number', ''),
+            'total_amount': float(doc.get('total_amount', 0)),
+            'status': doc.get('status', 'pending'),
+            'payment_status': doc.get('payment_status', 'pending'),
+            'item_count': doc.get('item_count', 0),
+            'created_at': doc.get('created_at'),
+        }
+
+    def get_user_order_history(self, user_id: str, page_size: int = 10, cursor: str = None):
+        """
+        One page of a user's orders, newest first, as summary rows.
+
+        Keyset-paginated on (created_at, _id) under the orders_user_created_id
+        index; items and addresses are not loaded. Returns {'items', 'next_cursor'}.
+        """
+        try:
+            docs, next_cursor, _ = pagination.fetch_page(
+                self.orders_collection,
+                {'user_id': ObjectId(str(user_id))},
+                'created_at', -1, page_size,
+                cursor=cursor,
+                projection=projections.ORDER_HISTORY_ROW,
+            )
+            return {
+                'items': [self._format_order_history_row(doc) for doc in docs],
+                'next_cursor': next_cursor,
+            }
+        except Exception as e:
+            print(f"Error getting order history: {e}")
+            return {'items': [], 'next_cursor': None}
+
+    @staticmethod
+    def _format_order_admin_row(doc):
+        """Dashboard orders table row (projections.ORDER_ADMIN_ROW)."""
+        return {
+            'id': str(doc['_id']),
+            'order_number': doc.get('order_number', ''),
+            'user_id': str(doc['user_id']) if doc.get('user_id') else None,
+            'total_amount': float(doc.get('total_amount', 0)),
+            'status': doc.get('status', 'pending'),
+            'payment_status': doc.get('payment_status', 'pending'),
+            'payment_method': doc.get('payment_method', ''),
+            'item_count': doc.get('item_count', 0),
+            'created_at': doc.get('created_at'),
+        }
+
+    @staticmethod
+    def _format_payment_admin_row(doc):
+        """Dashboard payments table row (projections.PAYMENT_ADMIN_ROW)."""
+        return {
+            'id': str(doc['_id']),
+            'transaction_id': doc.get('transaction_id', ''),
+            'order_id': str(doc['order_id']) if doc.get('order_id') else None,
+            'user_id': str(doc['user_id']) if doc.get('user_id') else None,
+            'amount': float(doc.get('amount', 0)),
+            'currency': doc.get('currency', 'USD'),
+            'payment_method': doc.get('payment_method', ''),
+            'status': doc.get('status', 'pending'),
+            'created_at': doc.get('created_at'),
+        }
+
+    def list_orders(self, page=1, page_size=10, status=None, date_from=None, date_to=None, user_id=None, cursor=None, fields='detail'):
         """List all orders with pagination and filters"""
         try:
             query = {}
@@ -844,20 +1206,25 @@ class MongoDBManager:
                 if date_query:
                     query['created_at'] = date_query
             
-            # Get total count
-            total = self.orders_collection.count_documents(query)
-            
-            # Apply pagination
-            skip = (page - 1) * page_size
-            cursor = self.orders_collection.find(query).sort('created_at', -1).skip(skip).limit(page_size)
+            # Keyset pagination when a cursor is given, page number otherwise;
+            # the total comes from the cache, an estimate or a count_documents()
+            admin_row = fields == 'admin_row'
+            docs, next_cursor, prev_cursor, total = listing_totals.page_with_total(
+                self.orders_collection, query, 'created_at', -1, page_size, page=page, cursor=cursor,
+                projection=projections.ORDER_ADMIN_ROW if admin_row else None,
+            )
             
             orders = []
-            for doc in cursor:
+            for doc in docs:
+                if admin_row:
+                    orders.append(self._format_order_admin_row(doc))
+                    continue
                 order = {
                     'id': str(doc.get('_id')),
                     'order_number': doc.get('order_number', ''),
                     'user_id': str(doc.get('user_id')) if doc.get('user_id') else None,
                     'items': doc.get('items', []),
+                    'item_count': len(doc.get('items') or []),
                     'subtotal': float(doc.get('subtotal', 0)),
                     'shipping_cost': float(doc.get('shipping_cost', 0)),
                     'tax_amount': float(doc.get('tax_amount', 0)),
@@ -876,7 +1243,9 @@ class MongoDBManager:
                 'items': orders,
                 'total': total,
                 'page': page,
-                'page_size': page_size
+                'page_size': page_size,
+                'next_cursor': next_cursor,
+                'prev_cursor': prev_cursor,
             }
         except Exception as e:
             print(f"Error listing orders: {e}")
@@ -886,10 +1255,12 @@ class MongoDBManager:
                 'items': [],
                 'total': 0,
                 'page': page,
-                'page_size': page_size
+                'page_size': page_size,
+                'next_cursor': None,
+                'prev_cursor': None,
             }
     
-    def list_payments(self, page=1, page_size=10, status=None, date_from=None, date_to=None, order_id=None, user_id=None):
+    def list_payments(self, page=1, page_size=10, status=None, date_from=None, date_to=None, order_id=None, user_id=None, cursor=None, fields='detail'):
         """List all payments with pagination and filters"""
         try:
             query = {}
@@ -927,15 +1298,19 @@ class MongoDBManager:
                 if date_query:
                     query['created_at'] = date_query
             
-            # Get total count
-            total = self.payments_collection.count_documents(query)
-            
-            # Apply pagination
-            skip = (page - 1) * page_size
-            cursor = self.payments_collection.find(query).sort('created_at', -1).skip(skip).limit(page_size)
+            # Keyset pagination when a cursor is given, page number otherwise;
+            # the total comes from the cache, an estimate or a count_documents()
+            admin_row = fields == 'admin_row'
+            docs, next_cursor, prev_cursor, total = listing_totals.page_with_total(
+                self.payments_collection, query, 'created_at', -1, page_size, page=page, cursor=cursor,
+                projection=projections.PAYMENT_ADMIN_ROW if admin_row else None,
+            )
             
             payments = []
-            for doc in cursor:
+            for doc in docs:
+                if admin_row:
+                    payments.append(self._format_payment_admin_row(doc))
+                    continue
                 payment = {
                     'id': str(doc.get('_id')),
                     'transaction_id': doc.get('transaction_id', ''),
@@ -955,7 +1330,9 @@ class MongoDBManager:
                 'items': payments,
                 'total': total,
                 'page': page,
-                'page_size': page_size
+                'page_size': page_size,
+                'next_cursor': next_cursor,
+                'prev_cursor': prev_cursor,
             }
         except Exception as e:
             print(f"Error listing payments: {e}")
@@ -965,7 +1342,9 @@ class MongoDBManager:
                 'items': [],
                 'total': 0,
                 'page': page,
-                'page_size': page_size
+                'page_size': page_size,
+                'next_cursor': None,
+                'prev_cursor': None,
             }
     
     # --------------------
@@ -995,8 +1374,7 @@ class MongoDBManager:
             
             # Generate transaction ID if not provided
             if 'transaction_id' not in payment_data or not payment_data.get('transaction_id'):
-                timestamp = datetime.utcnow()
-                payment_data['transaction_id'] = f"TXN-{timestamp.strftime('%Y%m%d%H%M%S')}-{str(timestamp.microsecond)[:4]}"
+                payment_data['transaction_id'] = self.new_transaction_id()
             
             # Set default values
             payment_data.setdefault('status', 'pending')
@@ -0,0 +1,264 @@
+"""
+Durable outbox for order/payment emails and Telegram messages.
+
+Request handlers only enqueue (one small Mongo write); the
+`dispatch_notifications` management command delivers the queue in the
+background. Every entry is keyed by (event, order, channel) with a unique
+index, so retried or duplicated requests never send the same email twice.
+
+Entries move pending -> processing (leased for NOTIFICATION_LEASE_SECONDS)
+-> sent. A failed delivery goes back to pending with exponential backoff, or
+to failed after NOTIFICATION_MAX_ATTEMPTS. A worker that dies mid-batch
+leaves its entries in processing; they become claimable again when the lease
+runs out.
+"""
+import os
+import random
+import socket
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.template.loader import render_to_string
+from django.utils.html import strip_tags
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from .mongodb_utils import mongodb_manager
+from .telegram_utils import format_order_notification, format_payment_notification, send_telegram_message
+
+
+TELEGRAM_FORMATTERS = {
+    'order': format_order_notification,
+    'payment': format_payment_notification,
+}
+
+# Telegram rejects messages longer than 4096 characters
+TELEGRAM_MAX_MESSAGE = 4096
+TELEGRAM_SEPARATOR = '\n\n──────────\n\n'
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def enqueue(event, order_id, channel, payload):
+    """
+    Queue a notification unless one already exists for (event, order, channel).
+
+    Returns True if a new entry was queued.
+    """
+    now = datetime.utcnow()
+    order_id = str(order_id)
+    try:
+        result = mongodb_manager.notification_outbox_collection.update_one(
+            {'dedupe_key': f'{event}:{order_id}:{channel}'},
+            {'$setOnInsert': {
+                'event': event,
+                'order_id': order_id,
+                'channel': channel,
+                'payload': payload,
+                'status': 'pending',
+                'attempts': 0,
+                'next_attempt_at': now,
+                'created_at': now,
+            }},
+            upsert=True,
+        )
+        return result.upserted_id is not None
+    except DuplicateKeyError:
+        # A concurrent request queued it first
+        return False
+    except Exception as e:
+        print(f"Error queueing {channel} notification {event} for order {order_id}: {e}")
+        return False
+
+
+def enqueue_email(event, order_id, to_email, subject, template_name, context):
+    """Queue an HTML email rendered from template_name by the dispatcher."""
+    return enqueue(event, order_id, 'email', {
+        'to': to_email,
+        'subject': subject,
+        'template': template_name,
+        'context': context,
+    })
+
+
+def enqueue_telegram(event, order_id, kind, order_data):
+    """Queue an owner Telegram message; kind is 'order' or 'payment'."""
+    return enqueue(event, order_id, 'telegram', {'kind': kind, 'order_data': order_data})
+
+
+# --------------------
+# Dispatcher
+# --------------------
+def _claim(channel, limit, worker_id):
+    """Lease up to limit due entries of one channel, oldest first."""
+    collection = mongodb_manager.notification_outbox_collection
+    lease = timedelta(seconds=_setting('NOTIFICATION_LEASE_SECONDS', 120))
+    claimed = []
+    while len(claimed) < limit:
+        now = datetime.utcnow()
+        doc = collection.find_one_and_update(
+            {
+                'channel': channel,
+                '$or': [
+                    {'status': 'pending', 'next_attempt_at': {'$lte': now}},
+                    {'status': 'processing', 'locked_until': {'$lt': now}},
+                ],
+            },
+            {'$set': {'status': 'processing', 'locked_until': now + lease, 'worker': worker_id}},
+            sort=[('next_attempt_at', 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+        if doc is None:
+            break
+        claimed.append(doc)
+    return claimed
+
+
+def _mark_sent(doc):
+    mongodb_manager.notification_outbox_collection.update_one(
+        {'_id': doc['_id']},
+        {'$set': {'status': 'sent', 'sent_at': datetime.utcnow()},
+         '$inc': {'attempts': 1},
+         '$unset': {'locked_until': '', 'last_error': ''}},
+    )
+
+
+def _mark_failed(doc, error):
+    """Schedule a retry with exponential backoff, or give up after the last attempt."""
+    attempts = doc.get('attempts', 0) + 1
+    update = {'attempts': attempts, 'last_error': str(error)[:500]}
+    if attempts >= _setting('NOTIFICATION_MAX_ATTEMPTS', 8):
+        update['status'] = 'failed'
+    else:
+        base = _setting('NOTIFICATION_RETRY_BASE_SECONDS', 30)
+        delay = min(base * 2 ** (attempts - 1), 3600)
+        update['status'] = 'pending'
+        update['next_attempt_at'] = datetime.utcnow() + timedelta(seconds=delay * random.uniform(0.8, 1.2))
+    mongodb_manager.notification_outbox_collection.update_one(
+        {'_id': doc['_id']},
+        {'$set': update, '$unset': {'locked_until': ''}},
+    )
+
+
+def _send_emails(docs):
+    """Send a batch of emails over one SMTP connection."""
+    sent = failed = 0
+    if not docs:
+        return sent, failed
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+        for doc in docs:
+            payload = doc.get('payload') or {}
+            try:
+                html_content = render_to_string(payload['template'], payload.get('context') or {})
+                message = EmailMultiAlternatives(
+                    payload.get('subject', ''),
+                    strip_tags(html_content),
+                    _setting('DEFAULT_FROM_EMAIL', None),
+                    [payload['to']],
+                    connection=connection,
+                )
+                message.attach_alternative(html_content, 'text/html')
+                message.send()
+                _mark_sent(doc)
+                sent += 1
+            except Exception as e:
+                print(f"Email notification {doc.get('dedupe_key')} failed: {e}")
+                _mark_failed(doc, e)
+                failed += 1
+    except Exception as e:
+        # Could not reach the SMTP server - retry the whole batch later
+        print(f"SMTP connection failed: {e}")
+        for doc in docs[sent + failed:]:
+            _mark_failed(doc, e)
+            failed += 1
+    finally:
+        try:
+            connection.close()
+        except Exception:
+            pass
+    return sent, failed
+
+
+def _telegram_chunks(docs):
+    """Group formatted messages into as few Telegram messages as fit the size limit."""
+    chunks = []
+    unformatted = 0
+    for doc in docs:
+        payload = doc.get('payload') or {}
+        formatter = TELEGRAM_FORMATTERS.get(payload.get('kind'))
+        try:
+            text = formatter(payload.get('order_data') or {})[:TELEGRAM_MAX_MESSAGE]
+        except Exception as e:
+            print(f"Telegram notification {doc.get('dedupe_key')} could not be formatted: {e}")
+            _mark_failed(doc, e)
+            unformatted += 1
+            continue
+        if chunks and len(chunks[-1][0]) + len(TELEGRAM_SEPARATOR) + len(text) <= TELEGRAM_MAX_MESSAGE:
+            chunks[-1][0] += TELEGRAM_SEPARATOR + text
+            chunks[-1][1].append(doc)
+        else:
+            chunks.append([text, [doc]])
+    return chunks, unformatted
+
+
+def _send_telegram(docs):
+    """Send a batch of Telegram notifications, several per API call."""
+    chunks, failed = _telegram_chunks(docs)
+    sent = 0
+    for text, chunk_docs in chunks:
+        if send_telegram_message(text):
+            for doc in chunk_docs:
+                _mark_sent(doc)
+            sent += len(chunk_docs)
+        else:
+            for doc in chunk_docs:
+                _mark_failed(doc, 'Telegram send failed')
+            failed += len(chunk_docs)
+    return sent, failed
+
+
+def dispatch_due(batch_size=None):
+    """
+    Deliver one batch of due notifications per channel.
+
+    Returns {'claimed', 'sent', 'failed'} counts.
+    """
+    batch_size = batch_size or _setting('NOTIFICATION_BATCH_SIZE', 20)
+    worker_id = f'{socket.gethostname()}:{os.getpid()}'
+    emails = _claim('email', batch_size, worker_id)
+    telegrams = _claim('telegram', batch_size, worker_id)
+
+    email_sent, email_failed = _send_emails(emails)
+    telegram_sent, telegram_failed = _send_telegram(telegrams)
+    return {
+        'claimed': len(emails) + len(telegrams),
+        'sent': email_sent + telegram_sent,
+        'failed': email_failed + telegram_failed,
+    }
+
+
+def queue_stats():
+    """Queue depth per channel and status, plus the age of the oldest due entry."""
+    collection = mongodb_manager.notification_outbox_collection
+    stats = {'by_status': {}, 'oldest_pending_seconds': None}
+    try:
+        for row in collection.aggregate([
+            {'$group': {'_id': {'channel': '$channel', 'status': '$status'}, 'count': {'$sum': 1}}},
+        ]):
+            key = row['_id']
+            stats['by_status'].setdefault(key.get('channel'), {})[key.get('status')] = row['count']
+        oldest = collection.find_one(
+            {'status': 'pending', 'next_attempt_at': {'$lte': datetime.utcnow()}},
+            {'created_at': 1},
+            sort=[('next_attempt_at', 1)],
+        )
+        if oldest and oldest.get('created_at'):
+            stats['oldest_pending_seconds'] = round((datetime.utcnow() - oldest['created_at']).total_seconds(), 1)
+    except Exception as e:
+        print(f"Error reading notification queue stats: {e}")
+    return stats
@@ -0,0 +1,248 @@
+"""
+Order placement with stock reservation.
+
+place_order() reserves stock and writes the order and its payment record
+together. On a replica set / Atlas it is one transaction:
+
+  1. bulk_write: {_id, quantity >= n} -> $inc quantity -n, one op per product
+  2. insert the order (order_number generated up front, never re-read)
+  3. insert the payment
+  4. commit
+
+so a checkout costs the same four round trips however many lines it has,
+and an order never exists without its stock. If any product cannot cover
+its quantity the transaction aborts and OutOfStock names the products.
+
+A standalone mongod has no transactions (or set ORDER_USE_TRANSACTIONS=False);
+there each reservation is its own conditional update and everything already
+taken is given back if a later step fails.
+
+release_stock() returns an order's reservation exactly once. It runs on
+every way an order ends unpaid: the customer cancelling it, a cancelled
+PayPal approval (cancel_unpaid_order) and expire_unpaid_orders(), which the
+reconcile_bakong_payments worker runs to cancel orders still unpaid after
+ORDER_RESERVATION_TTL seconds (abandoned pay-later, Bakong QR and
+re-submitted checkouts).
+`python manage.py loadtest_checkout` races concurrent checkouts of one SKU.
+"""
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from django.conf import settings
+from pymongo import UpdateOne
+
+from .mongodb_utils import mongodb_manager
+
+
+class OrderPlacementError(Exception):
+    """The order could not be written."""
+
+
+class OutOfStock(OrderPlacementError):
+    def __init__(self, product_names):
+        super().__init__('Not enough stock for: ' + ', '.join(product_names))
+        self.product_names = product_names
+
+
+class _ShortStock(Exception):
+    """Raised inside the transaction to abort it."""
+
+
+def _reservations(items):
+    """{product ObjectId: quantity} summed over lines (sizes and colors share stock)."""
+    reservations = {}
+    for item in items:
+        product_id = ObjectId(str(item['id']))
+        reservations[product_id] = reservations.get(product_id, 0) + int(item['quantity'])
+    return reservations
+
+
+def _reserve_ops(reservations, sign=-1):
+    if sign < 0:
+        return [
+            UpdateOne({'_id': pid, 'quantity': {'$gte': qty}}, {'$inc': {'quantity': -qty}})
+            for pid, qty in reservations.items()
+        ]
+    return [UpdateOne({'_id': pid}, {'$inc': {'quantity': qty}}) for pid, qty in reservations.items()]
+
+
+def _short_products(reservations):
+    """Names of the products that cannot cover their reservation."""
+    docs = mongodb_manager.products_collection.find(
+        {'_id': {'$in': list(reservations)}}, {'name': 1, 'quantity': 1},
+    )
+    found = {doc['_id']: doc for doc in docs}
+    names = []
+    for pid, qty in reservations.items():
+        doc = found.get(pid)
+        if doc is None or (doc.get('quantity') or 0) < qty:
+            names.append(doc.get('name', str(pid)) if doc else str(pid))
+    return names or ['one or more products']
+
+
+def supports_transactions():
+    if not getattr(settings, 'ORDER_USE_TRANSACTIONS', True):
+        return False
+    description = getattr(mongodb_manager.client, 'topology_description', None)
+    return description is not None and description.topology_type_name in (
+        'ReplicaSetWithPrimary', 'Sharded', 'LoadBalanced',
+    )
+
+
+def _place_in_transaction(reservations, order, payment):
+    products = mongodb_manager.products_collection
+    orders = mongodb_manager.orders_collection
+    payments = mongodb_manager.payments_collection
+
+    def callback(session):
+        result = products.bulk_write(_reserve_ops(reservations), ordered=False, session=session)
+        if result.modified_count != len(reservations):
+            raise _ShortStock()
+        orders.insert_one(order, session=session)
+        payments.insert_one(payment, session=session)
+
+    with mongodb_manager.client.start_session() as session:
+        # Retries transient errors (write conflicts between concurrent checkouts)
+        session.with_transaction(callback)
+
+
+def _place_without_transaction(reservations, order, payment):
+    products = mongodb_manager.products_collection
+    taken = {}
+    try:
+        for pid, qty in reservations.items():
+            result = products.update_one({'_id': pid, 'quantity': {'$gte': qty}}, {'$inc': {'quantity': -qty}})
+            if not result.modified_count:
+                raise _ShortStock()
+            taken[pid] = qty
+        mongodb_manager.orders_collection.insert_one(order)
+        try:
+            mongodb_manager.payments_collection.insert_one(payment)
+        except Exception:
+            mongodb_manager.orders_collection.delete_one({'_id': order['_id']})
+            raise
+    except Exception:
+        if taken:
+            products.bulk_write(_reserve_ops(taken, sign=1), ordered=False)
+        raise
+
+
+def place_order(user_id, priced, shipping_address, payment_method, notes=''):
+    """
+    Reserve stock and create the order and its pending payment.
+
+    `priced` is pricing.price_cart()'s result. Returns
+    {'order_id', 'order_number', 'payment_id'}; raises OutOfStock or
+    OrderPlacementError.
+    """
+    user_oid = ObjectId(str(user_id))
+    now = datetime.utcnow()
+    order = {
+        '_id': ObjectId(),
+        'order_number': mongodb_manager.new_order_number(),
+        'user_id': user_oid,
+        'items': priced['items'],
+        'subtotal': priced['subtotal'],
+        'shipping_cost': priced['shipping_cost'],
+        'tax_amount': priced['tax_amount'],
+        'total_amount': priced['total_amount'],
+        'status': 'pending',
+        'payment_status': 'pending',
+        'shipping_address': shipping_address,
+        'payment_method': payment_method,
+        'shipping_method': 'standard',
+        'notes': notes,
+        'stock_reserved': True,
+        'created_at': now,
+        'updated_at': now,
+    }
+    payment = {
+        '_id': ObjectId(),
+        'order_id': order['_id'],
+        'user_id': user_oid,
+        'amount': priced['total_amount'],
+        'payment_method': payment_method,
+        'status': 'pending',
+        'currency': 'USD',
+        'payment_details': {},
+        'transaction_id': mongodb_manager.new_transaction_id(),
+        'created_at': now,
+        'updated_at': now,
+    }
+    reservations = _reservations(priced['items'])
+    try:
+        if supports_transactions():
+            _place_in_transaction(reservations, order, payment)
+        else:
+            _place_without_transaction(reservations, order, payment)
+    except _ShortStock:
+        raise OutOfStock(_short_products(reservations))
+    except Exception as e:
+        raise OrderPlacementError(str(e)) from e
+    return {
+        'order_id': str(order['_id']),
+        'order_number': order['order_number'],
+        'payment_id': str(payment['_id']),
+    }
+
+
+def release_stock(order_id):
+    """Give an order's reserved stock back (idempotent). Returns True if released."""
+    try:
+        order = mongodb_manager.orders_collection.find_one_and_update(
+            {'_id': ObjectId(str(order_id)), 'stock_reserved': True},
+            {'$set': {'stock_reserved': False, 'updated_at': datetime.utcnow()}},
+            projection={'items': 1},
+        )
+        if not order:
+            return False
+        reservations = _reservations(order.get('items') or [])
+        if reservations:
+            mongodb_manager.products_collection.bulk_write(_reserve_ops(reservations, sign=1), ordered=False)
+        return True
+    except Exception as e:
+        print(f"Error releasing stock for order {order_id}: {e}")
+        return False
+
+
+def cancel_unpaid_order(order_id):
+    """
+    Cancel an order that was never paid and give its stock back.
+
+    Pending payments are cancelled first; if one of the order's payments has
+    completed in the meantime (reconciler, PayPal capture) the order is left
+    alone. Returns True if this call cancelled the order.
+    """
+    order_oid = ObjectId(str(order_id))
+    now = datetime.utcnow()
+    mongodb_manager.payments_collection.update_many(
+        {'order_id': order_oid, 'status': 'pending'},
+        {'$set': {'status': 'cancelled', 'updated_at': now}},
+    )
+    if mongodb_manager.payments_collection.find_one({'order_id': order_oid, 'status': 'completed'}, {'_id': 1}):
+        return False
+    result = mongodb_manager.orders_collection.update_one(
+        {'_id': order_oid, 'payment_status': 'pending', 'status': {'$ne': 'cancelled'}},
+        {'$set': {'status': 'cancelled', 'payment_status': 'cancelled', 'updated_at': now}},
+    )
+    if result.modified_count == 0:
+        return False
+    release_stock(order_id)
+    return True
+
+
+def expire_unpaid_orders(limit=200):
+    """Cancel orders still unpaid ORDER_RESERVATION_TTL seconds after checkout. Returns the count."""
+    ttl = timedelta(seconds=getattr(settings, 'ORDER_RESERVATION_TTL', 86400))
+    stale = mongodb_manager.orders_collection.find(
+        {'stock_reserved': True, 'payment_status': 'pending', 'created_at': {'$lt': datetime.utcnow() - ttl}},
+        {'_id': 1},
+    ).limit(limit)
+    expired = 0
+    for order in list(stale):
+        try:
+            if cancel_unpaid_order(order['_id']):
+                expired += 1
+        except Exception as e:
+            print(f"Error expiring order {order['_id']}: {e}")
+    return expired
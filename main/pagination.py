@@ -0,0 +1,143 @@
+"""
+Keyset (cursor) pagination for MongoDB list helpers.
+
+Page-number pagination uses skip((page-1)*page_size), which makes the server
+walk every skipped document. A cursor instead remembers the sort value and _id
+of the last (or first) row shown, and the next page becomes a range query on
+an index such as (created_at, _id) or (price, _id).
+
+Cursors are opaque, URL-safe strings. They also record the sort key and a hash
+of the filter, so a cursor taken from one listing is ignored by another.
+"""
+import base64
+import hashlib
+
+from bson import ObjectId, json_util
+
+
+def query_hash(query):
+    """Return a short, stable fingerprint of a MongoDB filter."""
+    raw = json_util.dumps(query, sort_keys=True)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:12]
+
+
+def encode_cursor(doc, sort_field, direction, query, reverse=False):
+    """Return an opaque cursor pointing at doc for the given sort."""
+    payload = {
+        'f': sort_field,
+        'd': direction,
+        'v': doc.get(sort_field),
+        'id': doc.get('_id'),
+        'q': query_hash(query),
+    }
+    if reverse:
+        payload['r'] = 1
+    raw = json_util.dumps(payload, json_options=json_util.CANONICAL_JSON_OPTIONS)
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """Decode a cursor produced by encode_cursor, returning None if it is invalid."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json_util.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+    except Exception:
+        return None
+    if not isinstance(payload, dict) or not isinstance(payload.get('id'), ObjectId):
+        return None
+    return payload
+
+
+def _after(sort_field, direction, value, last_id):
+    """Return the filter for rows strictly after (value, last_id) in the given direction."""
+    op = '$gt' if direction == 1 else '$lt'
+    if value is None:
+        # Nulls sort before every other value, and type bracketing means
+        # {$gt: null} matches nothing - compare explicitly instead.
+        if direction == 1:
+            return {'$or': [
+                {sort_field: {'$ne': None}},
+                {sort_field: None, '_id': {op: last_id}},
+            ]}
+        return {sort_field: None, '_id': {op: last_id}}
+    conditions = [
+        {sort_field: {op: value}},
+        {sort_field: value, '_id': {op: last_id}},
+    ]
+    if direction == -1:
+        # Descending order ends with the rows that have no value
+        conditions.append({sort_field: None})
+    return {'$or': conditions}
+
+
+def _find_projection(projection, sort_field):
+    """Return the projection to use, making sure an inclusion projection keeps the sort field."""
+    # The cursor is built from the sort field, so an inclusion projection must return it
+    # ({'score': {'$meta': ...}} alone still returns every field)
+    if projection and sort_field not in projection and any(
+        v == 1 or (isinstance(v, dict) and '$meta' not in v) for v in projection.values()
+    ):
+        projection = {**projection, sort_field: 1}
+    return projection
+
+
+def _plan(query, sort_field, direction, page_size, page, cursor):
+    """Work out the filter, sort direction and skip for one page request."""
+    token = decode_cursor(cursor)
+    if token and (token.get('f') != sort_field or token.get('d') != direction
+                  or token.get('q') != query_hash(query)):
+        token = None
+
+    reverse = bool(token and token.get('r'))
+    scan_direction = -direction if reverse else direction
+    keyset = None
+    skip = 0
+    if token:
+        keyset = _after(sort_field, scan_direction, token.get('v'), token['id'])
+    elif page:
+        skip = max(page - 1, 0) * page_size
+    return token, reverse, scan_direction, keyset, skip
+
+
+def _finish(docs, query, sort_field, direction, page_size, token, reverse, skip):
+    """Trim the look-ahead row and build the next/previous cursors."""
+    has_more = len(docs) > page_size
+    docs = docs[:page_size]
+    if reverse:
+        docs.reverse()
+    if not docs:
+        return docs, None, None
+
+    if reverse:
+        has_next, has_prev = True, has_more
+    else:
+        has_next, has_prev = has_more, bool(token) or skip > 0
+    next_cursor = encode_cursor(docs[-1], sort_field, direction, query) if has_next else None
+    prev_cursor = encode_cursor(docs[0], sort_field, direction, query, reverse=True) if has_prev else None
+    return docs, next_cursor, prev_cursor
+
+
+def fetch_page(collection, query, sort_field, direction, page_size, page=None, cursor=None, projection=None,
+               collation=None):
+    """
+    Fetch one page sorted by (sort_field, _id).
+
+    Uses the cursor when it is valid for this query and sort, otherwise falls
+    back to page-number mode. Returns (docs, next_cursor, prev_cursor); the
+    cursors are None when there is no next/previous page. `collation` must
+    match the index the filter is meant to use.
+    """
+    token, reverse, scan_direction, keyset, skip = _plan(query, sort_field, direction, page_size, page, cursor)
+    find_query = query
+    if keyset:
+        find_query = {'$and': [query, keyset]} if query else keyset
+
+    docs = list(
+        collection.find(find_query, _find_projection(projection, sort_field), collation=collation)
+        .sort([(sort_field, scan_direction), ('_id', scan_direction)])
+        .skip(skip)
+        .limit(page_size + 1)
+    )
+    return _finish(docs, query, sort_field, direction, page_size, token, reverse, skip)
@@ -0,0 +1,96 @@
+"""
+bcrypt hashing for MongoDB user passwords.
+
+bcrypt is deliberately slow (about 2**BCRYPT_ROUNDS key-schedule rounds) and
+releases the GIL while it runs. Every hash and check goes through one bounded
+thread pool per process (PASSWORD_HASH_WORKERS threads), so a burst of logins
+queues for a fixed number of cores instead of every request thread burning
+CPU at once and starving the rest of the worker.
+
+The cost is read from each stored hash, so raising or lowering BCRYPT_ROUNDS
+never breaks existing logins: check_and_upgrade() re-hashes a password at
+the configured cost the next time its owner logs in.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+from django.conf import settings
+
+
+_lock = threading.Lock()
+_executor = None
+_executor_pid = None
+
+
+def _pool():
+    """The process' hashing pool (recreated after a fork)."""
+    global _executor, _executor_pid
+    pid = os.getpid()
+    if _executor is None or _executor_pid != pid:
+        with _lock:
+            if _executor is None or _executor_pid != pid:
+                workers = getattr(settings, 'PASSWORD_HASH_WORKERS', 0) or os.cpu_count() or 1
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+                _executor_pid = pid
+    return _executor
+
+
+def _run(fn, *args):
+    return _pool().submit(fn, *args).result()
+
+
+def rounds():
+    """Configured bcrypt cost (log2 rounds), clamped to what bcrypt accepts."""
+    return max(4, min(int(getattr(settings, 'BCRYPT_ROUNDS', 12)), 31))
+
+
+def hash_password(password, cost=None):
+    """Return the bcrypt hash of password as a str."""
+    salt = bcrypt.gensalt(rounds=cost or rounds())
+    return _run(bcrypt.hashpw, password.encode('utf-8'), salt).decode('utf-8')
+
+
+def check_password(password, hashed):
+    """True if password matches the stored bcrypt hash (False for missing or malformed hashes)."""
+    if not password or not hashed:
+        return False
+    try:
+        return _run(bcrypt.checkpw, password.encode('utf-8'), hashed.encode('utf-8'))
+    except ValueError:
+        return False
+
+
+def hash_cost(hashed):
+    """The cost a stored hash was made with ($2b$<cost>$...), or None."""
+    try:
+        return int(hashed.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def needs_rehash(hashed):
+    return hash_cost(hashed) != rounds()
+
+
+def check_and_upgrade(collection, user_doc, password):
+    """
+    Check password against an already-loaded user document.
+
+    On success, if the stored hash was made with a different cost, it is
+    replaced by one at BCRYPT_ROUNDS (only if the hash has not changed in the
+    meantime). Returns True if the password matches.
+    """
+    hashed = user_doc.get('password')
+    if not check_password(password, hashed):
+        return False
+    if needs_rehash(hashed):
+        try:
+            collection.update_one(
+                {'_id': user_doc['_id'], 'password': hashed},
+                {'$set': {'password': hash_password(password)}},
+            )
+        except Exception as e:
+            print(f"Error upgrading password hash for {user_doc.get('username')}: {e}")
+    return True
@@ -0,0 +1,164 @@
+"""
+Push order payment_status changes to waiting payment pages.
+
+payment_status_stream (SSE) and the long-poll endpoint park on
+PaymentStatusHub.wait_for_change() instead of the browser polling. The hub
+learns about changes from:
+
+  - publish(), called in this process (e.g. by the Bakong reconciler), and
+  - one watcher thread per process, which follows a change stream on orders
+    (replica set / Atlas) or, on a standalone mongod, checks all watched
+    orders with a single query every PAYMENT_STREAM_POLL_INTERVAL seconds.
+
+Waiters live on the ASGI event loop; the watcher thread wakes them with
+call_soon_threadsafe.
+"""
+import asyncio
+import os
+import threading
+import time
+
+from bson import ObjectId
+from django.conf import settings
+
+from .mongodb_utils import mongodb_manager
+
+
+def read_payment_status(order_id):
+    """Return the order's payment_status, or None if the order does not exist."""
+    try:
+        doc = mongodb_manager.orders_collection.find_one({'_id': ObjectId(order_id)}, {'payment_status': 1})
+    except Exception:
+        return None
+    return doc.get('payment_status', 'pending') if doc else None
+
+
+class PaymentStatusHub:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # order_id -> {waiter_key: (loop, asyncio.Event)}
+        self._waiters = {}
+        # order_id -> last payment_status seen for watched orders
+        self._known = {}
+        self._watcher_pid = None
+        self._stop = threading.Event()
+
+    # --------------------
+    # Publishing
+    # --------------------
+    def publish(self, order_id, payment_status):
+        """Record a new status and wake everyone waiting on the order."""
+        order_id = str(order_id)
+        with self._lock:
+            if order_id not in self._waiters:
+                return
+            self._known[order_id] = payment_status
+            waiters = list(self._waiters[order_id].values())
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # Loop already closed (client went away)
+                pass
+
+    # --------------------
+    # Waiting
+    # --------------------
+    async def wait_for_change(self, order_id, known_status, timeout):
+        """
+        Wait until the order's payment_status differs from known_status.
+
+        Returns the new status, or None on timeout.
+        """
+        from asgiref.sync import sync_to_async
+
+        order_id = str(order_id)
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        key = object()
+        with self._lock:
+            self._waiters.setdefault(order_id, {})[key] = (loop, event)
+            self._known.setdefault(order_id, known_status)
+        self.ensure_watcher()
+        try:
+            # Re-read after registering so a change just before we parked is not lost
+            current = await sync_to_async(read_payment_status)(order_id)
+            if current is not None and current != known_status:
+                return current
+            try:
+                await asyncio.wait_for(event.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+            with self._lock:
+                status = self._known.get(order_id)
+            return status if status != known_status else None
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(order_id, {})
+                waiters.pop(key, None)
+                if not waiters:
+                    self._waiters.pop(order_id, None)
+                    self._known.pop(order_id, None)
+
+    # --------------------
+    # Watcher thread
+    # --------------------
+    def ensure_watcher(self):
+        """Start the watcher thread once per process."""
+        pid = os.getpid()
+        if self._watcher_pid == pid:
+            return
+        with self._lock:
+            if self._watcher_pid == pid:
+                return
+            self._watcher_pid = pid
+            self._stop.clear()
+        thread = threading.Thread(target=self._watch, name='payment-status-watch', daemon=True)
+        thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._watcher_pid = None
+
+    def _watch(self):
+        if getattr(settings, 'PAYMENT_STREAM_CHANGE_STREAM', True):
+            try:
+                self._follow_change_stream()
+                return
+            except Exception as e:
+                # Standalone servers do not support change streams
+                print(f"Orders change stream unavailable, polling watched orders instead: {e}")
+        self._poll()
+
+    def _follow_change_stream(self):
+        pipeline = [{'$match': {
+            'operationType': 'update',
+            'updateDescription.updatedFields.payment_status': {'$exists': True},
+        }}]
+        with mongodb_manager.orders_collection.watch(pipeline) as stream:
+            while not self._stop.is_set():
+                change = stream.try_next()
+                if change is None:
+                    continue
+                fields = change['updateDescription']['updatedFields']
+                self.publish(change['documentKey']['_id'], fields['payment_status'])
+
+    def _poll(self):
+        interval = getattr(settings, 'PAYMENT_STREAM_POLL_INTERVAL', 2)
+        while not self._stop.is_set():
+            time.sleep(interval)
+            with self._lock:
+                known = dict(self._known)
+            if not known:
+                continue
+            try:
+                ids = [ObjectId(order_id) for order_id in known]
+                for doc in mongodb_manager.orders_collection.find({'_id': {'$in': ids}}, {'payment_status': 1}):
+                    status = doc.get('payment_status', 'pending')
+                    if status != known.get(str(doc['_id'])):
+                        self.publish(doc['_id'], status)
+            except Exception as e:
+                print(f"Error polling watched orders: {e}")
+
+
+payment_hub = PaymentStatusHub()
@@ -0,0 +1,138 @@
+"""
+PayPal REST client with a cached OAuth token and a pooled HTTP session.
+
+Every PayPal call needs a bearer token. The token returned by
+/v1/oauth2/token is valid for `expires_in` seconds (usually ~9 hours), so it
+is cached per process and refreshed PAYPAL_TOKEN_REFRESH_MARGIN seconds
+before it expires; a lock makes concurrent threads share one refresh. Calls
+go through a keep-alive requests.Session (one per process, re-created after
+fork) that retries connection errors and 429/5xx responses with backoff.
+POSTs carry a PayPal-Request-Id so a retried create/capture is idempotent.
+
+PAYPAL_BASE_URL overrides the sandbox/live endpoint, e.g. to point at the
+local fake server in main/paypal_fake.py.
+"""
+import os
+import threading
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+SANDBOX_URL = 'https://api-m.sandbox.paypal.com'
+LIVE_URL = 'https://api-m.paypal.com'
+
+
+class PayPalClient:
+    def __init__(self):
+        self._session_lock = threading.Lock()
+        self._token_lock = threading.Lock()
+        self._session = None
+        self._session_pid = None
+        self._token = None
+        self._token_expires_at = 0.0
+        self.token_requests = 0
+
+    @property
+    def base_url(self):
+        override = getattr(settings, 'PAYPAL_BASE_URL', '')
+        if override:
+            return override.rstrip('/')
+        return LIVE_URL if getattr(settings, 'PAYPAL_ENV', 'sandbox') == 'live' else SANDBOX_URL
+
+    @property
+    def session(self):
+        """Per-process keep-alive session with retry/backoff."""
+        pid = os.getpid()
+        if self._session is None or self._session_pid != pid:
+            with self._session_lock:
+                if self._session is None or self._session_pid != pid:
+                    retry = Retry(
+                        total=getattr(settings, 'PAYPAL_HTTP_RETRIES', 3),
+                        backoff_factor=0.3,
+                        status_forcelist=(429, 500, 502, 503, 504),
+                        # POSTs are safe to retry: each carries a PayPal-Request-Id
+                        allowed_methods=frozenset({'GET', 'POST'}),
+                        raise_on_status=False,
+                    )
+                    pool_size = getattr(settings, 'PAYPAL_POOL_SIZE', 10)
+                    adapter = HTTPAdapter(max_retries=retry, pool_connections=pool_size, pool_maxsize=pool_size)
+                    session = requests.Session()
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._session = session
+                    self._session_pid = pid
+        return self._session
+
+    # --------------------
+    # OAuth token
+    # --------------------
+    def access_token(self):
+        """Return a valid bearer token, fetching a new one only when needed."""
+        margin = getattr(settings, 'PAYPAL_TOKEN_REFRESH_MARGIN', 300)
+        if self._token and time.monotonic() < self._token_expires_at - margin:
+            return self._token
+        with self._token_lock:
+            if self._token and time.monotonic() < self._token_expires_at - margin:
+                return self._token
+            return self._fetch_token()
+
+    def _fetch_token(self):
+        client_id = getattr(settings, 'PAYPAL_CLIENT_ID', '')
+        client_secret = getattr(settings, 'PAYPAL_CLIENT_SECRET', '')
+        if not client_id or not client_secret:
+            raise ValueError('PayPal client credentials are not configured')
+        self.token_requests += 1
+        resp = self.session.post(
+            f"{self.base_url}/v1/oauth2/token",
+            headers={'Accept': 'application/json', 'Accept-Language': 'en_US'},
+            data={'grant_type': 'client_credentials'},
+            auth=(client_id, client_secret),
+            timeout=20,
+        )
+        resp.raise_for_status()
+        data = resp.json()
+        self._token = data.get('access_token')
+        self._token_expires_at = time.monotonic() + int(data.get('expires_in', 0) or 0)
+        return self._token
+
+    def invalidate_token(self):
+        with self._token_lock:
+            self._token = None
+            self._token_expires_at = 0.0
+
+    # --------------------
+    # API calls
+    # --------------------
+    def _post(self, path, payload=None, request_id=None):
+        """POST to the API, refreshing the token once if PayPal rejects it."""
+        for attempt in range(2):
+            headers = {
+                'Content-Type': 'application/json',
+                'Authorization': f'Bearer {self.access_token()}',
+            }
+            if request_id:
+                headers['PayPal-Request-Id'] = request_id
+            resp = self.session.post(f"{self.base_url}{path}", headers=headers, json=payload, timeout=30)
+            if resp.status_code != 401 or attempt:
+                return resp
+            # Token revoked or expired early
+            self.invalidate_token()
+        return resp
+
+    def create_order(self, payload, request_id=None):
+        """Create a checkout order; returns the requests.Response."""
+        return self._post('/v2/checkout/orders', payload, request_id=request_id)
+
+    def capture_order(self, paypal_order_id):
+        """Capture an approved order; returns the requests.Response."""
+        return self._post(
+            f'/v2/checkout/orders/{paypal_order_id}/capture',
+            request_id=f'capture-{paypal_order_id}',
+        )
+
+
+paypal_client = PayPalClient()
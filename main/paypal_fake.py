@@ -0,0 +1,112 @@
+"""
+Minimal local stand-in for the PayPal REST API.
+
+Implements just what PayPalClient uses:
+  POST /v1/oauth2/token                      -> bearer token with expires_in
+  POST /v2/checkout/orders                   -> CREATED order
+  POST /v2/checkout/orders/<id>/capture      -> COMPLETED capture
+
+`latency` (seconds) is added to every response to mimic the network, and the
+server counts token and API requests so benchmarks can show how many OAuth
+round trips were saved. Repeated PayPal-Request-Id values return the first
+response, like the real API.
+"""
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakePayPalServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), latency=0.0, token_ttl=32400):
+        super().__init__(address, _Handler)
+        self.latency = latency
+        self.token_ttl = token_ttl
+        self.lock = threading.Lock()
+        self.tokens = set()
+        self.orders = {}
+        self.idempotent = {}
+        self.counts = {'token': 0, 'create': 0, 'capture': 0}
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        """Serve in a daemon thread; returns self."""
+        thread = threading.Thread(target=self.serve_forever, name='fake-paypal', daemon=True)
+        thread.start()
+        return self
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+    # Headers and body are separate writes; without TCP_NODELAY delayed ACKs
+    # add ~40ms to every response on a reused connection
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body):
+        raw = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get('Content-Length') or 0)
+        raw_body = self.rfile.read(length) if length else b''
+        if server.latency:
+            time.sleep(server.latency)
+
+        if self.path == '/v1/oauth2/token':
+            if not self.headers.get('Authorization', '').startswith('Basic '):
+                return self._send(401, {'error': 'invalid_client'})
+            token = uuid.uuid4().hex
+            with server.lock:
+                server.counts['token'] += 1
+                server.tokens.add(token)
+            return self._send(200, {'access_token': token, 'token_type': 'Bearer', 'expires_in': server.token_ttl})
+
+        auth = self.headers.get('Authorization', '')
+        if not auth.startswith('Bearer ') or auth[7:] not in server.tokens:
+            return self._send(401, {'name': 'AUTHENTICATION_FAILURE'})
+
+        request_id = self.headers.get('PayPal-Request-Id')
+        with server.lock:
+            if request_id and request_id in server.idempotent:
+                return self._send(*server.idempotent[request_id])
+
+        parts = self.path.strip('/').split('/')
+        if parts == ['v2', 'checkout', 'orders']:
+            payload = json.loads(raw_body or b'{}')
+            order_id = uuid.uuid4().hex[:17].upper()
+            response = (201, {'id': order_id, 'status': 'CREATED', 'purchase_units': payload.get('purchase_units', [])})
+            with server.lock:
+                server.counts['create'] += 1
+                server.orders[order_id] = 'CREATED'
+        elif len(parts) == 5 and parts[:3] == ['v2', 'checkout', 'orders'] and parts[4] == 'capture':
+            with server.lock:
+                server.counts['capture'] += 1
+                known = parts[3] in server.orders
+                if known:
+                    server.orders[parts[3]] = 'COMPLETED'
+            if known:
+                response = (201, {'id': parts[3], 'status': 'COMPLETED'})
+            else:
+                response = (404, {'name': 'RESOURCE_NOT_FOUND'})
+        else:
+            response = (404, {'name': 'NOT_FOUND'})
+
+        if request_id:
+            with server.lock:
+                server.idempotent[request_id] = response
+        return self._send(*response)
@@ -0,0 +1,152 @@
+"""
+Server-side cart pricing.
+
+Orders are priced from the catalog, not from the price the browser stored
+with each cart line. price_cart() revalidates every line in one pass: all
+products are loaded with a single $in query (PRODUCT_PRICING projection), and
+the per-product snapshot is kept in the Django cache for
+PRICING_SNAPSHOT_TTL seconds under the current catalog version, so a product
+write re-prices immediately and repeated checkouts of the same products skip
+MongoDB entirely.
+
+Totals follow the checkout page: subtotal + ORDER_SHIPPING_COST +
+ORDER_TAX_RATE * subtotal, rounded half-up to cents.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+from bson import ObjectId
+from django.conf import settings
+from django.core.cache import cache
+
+from .catalog_cache import get_catalog_version
+from .mongodb_utils import mongodb_manager
+from .projections import PRODUCT_PRICING
+
+
+CENTS = Decimal('0.01')
+# Cached for ids that do not exist so repeated bad lines do not hit MongoDB
+_MISSING = {'missing': True}
+
+
+class PricingError(ValueError):
+    """The cart cannot be priced (unknown, unavailable or invalid lines)."""
+
+    def __init__(self, errors):
+        super().__init__('; '.join(errors))
+        self.errors = errors
+
+
+def _money(value):
+    return Decimal(str(value or 0)).quantize(CENTS, rounding=ROUND_HALF_UP)
+
+
+def _snapshot_key(product_id, version):
+    return f'pricing:v{version}:{product_id}'
+
+
+def load_snapshots(product_ids):
+    """
+    Return {product_id: snapshot} for the given id strings.
+
+    Cache hits come from one get_many; all misses are loaded with one $in query.
+    """
+    product_ids = list(dict.fromkeys(product_ids))
+    version = get_catalog_version()
+    cached = cache.get_many([_snapshot_key(pid, version) for pid in product_ids])
+    snapshots = {}
+    missing = []
+    for pid in product_ids:
+        snapshot = cached.get(_snapshot_key(pid, version))
+        if snapshot is None:
+            missing.append(pid)
+        else:
+            snapshots[pid] = snapshot
+
+    if missing:
+        object_ids = []
+        for pid in missing:
+            try:
+                object_ids.append(ObjectId(pid))
+            except Exception:
+                snapshots[pid] = _MISSING
+        loaded = {}
+        if object_ids:
+            for doc in mongodb_manager.products_collection.find({'_id': {'$in': object_ids}}, PRODUCT_PRICING):
+                loaded[str(doc['_id'])] = {
+                    'name': doc.get('name', ''),
+                    'price': float(doc.get('price') or 0),
+                    'stock': doc.get('quantity'),
+                    'is_available': doc.get('is_available', True),
+                }
+        fresh = {}
+        for pid in missing:
+            if pid in snapshots:
+                continue
+            snapshots[pid] = fresh[_snapshot_key(pid, version)] = loaded.get(pid, _MISSING)
+        if fresh:
+            cache.set_many(fresh, getattr(settings, 'PRICING_SNAPSHOT_TTL', 30))
+    return snapshots
+
+
+def _line_quantity(line):
+    try:
+        quantity = int(line.get('quantity', 1))
+    except (TypeError, ValueError):
+        return None
+    return quantity if quantity > 0 else None
+
+
+def price_cart(lines):
+    """
+    Price cart lines against the catalog.
+
+    Returns {'items', 'subtotal', 'shipping_cost', 'tax_amount', 'total_amount'}
+    with every item carrying the server `price` and `line_total`. Raises
+    PricingError listing every line that cannot be ordered.
+    """
+    if not lines:
+        raise PricingError(['Cart is empty'])
+    errors = []
+    snapshots = load_snapshots(str(line.get('id', '')) for line in lines if isinstance(line, dict))
+
+    items = []
+    subtotal = Decimal('0')
+    for line in lines:
+        if not isinstance(line, dict):
+            errors.append('Invalid cart line')
+            continue
+        snapshot = snapshots.get(str(line.get('id', '')), _MISSING)
+        label = snapshot.get('name') or line.get('name') or line.get('id')
+        quantity = _line_quantity(line)
+        if snapshot.get('missing'):
+            errors.append(f'{label} is no longer available')
+            continue
+        if not snapshot.get('is_available', True):
+            errors.append(f'{label} is currently unavailable')
+            continue
+        if quantity is None:
+            errors.append(f'Invalid quantity for {label}')
+            continue
+        price = _money(snapshot['price'])
+        line_total = price * quantity
+        subtotal += line_total
+        items.append(dict(
+            line,
+            id=str(line['id']),
+            name=snapshot.get('name') or line.get('name', ''),
+            price=float(price),
+            quantity=quantity,
+            line_total=float(line_total),
+        ))
+    if errors:
+        raise PricingError(errors)
+
+    shipping_cost = _money(getattr(settings, 'ORDER_SHIPPING_COST', 0))
+    tax_amount = _money(subtotal * Decimal(str(getattr(settings, 'ORDER_TAX_RATE', 0.1))))
+    return {
+        'items': items,
+        'subtotal': float(subtotal),
+        'shipping_cost': float(shipping_cost),
+        'tax_amount': float(tax_amount),
+        'total_amount': float(subtotal + shipping_cost + tax_amount),
+    }
@@ -0,0 +1,110 @@
+"""
+Product search helpers.
+
+Shop and API searches go through the `products_text` $text index (name,
+description, tags and sku, weighted towards name/sku) and are ranked by
+textScore. Autocomplete uses a range scan on the case-insensitive
+`products_name_ci` index. The escaped regex path is only used when the text
+index has not been created yet (e.g. before `ensure_mongo_indexes` ran).
+"""
+import re
+import threading
+import time
+
+from pymongo.errors import OperationFailure
+
+
+TEXT_INDEX_NAME = 'products_text'
+NAME_CI_INDEX_NAME = 'products_name_ci'
+
+# Must match the collation of the products_name_ci index, otherwise the
+# autocomplete range query cannot use it.
+NAME_COLLATION = {'locale': 'en', 'strength': 2}
+
+# How long a "text index missing" answer is trusted before checking again
+TEXT_INDEX_RECHECK_SECONDS = 60
+
+
+_state_lock = threading.Lock()
+_text_index_state = {}
+
+
+def has_text_index(collection):
+    """Return True if the collection has the product text index (cached per collection)."""
+    key = collection.full_name
+    with _state_lock:
+        state = _text_index_state.get(key)
+    if state is not None:
+        available, checked_at = state
+        if available or time.monotonic() - checked_at < TEXT_INDEX_RECHECK_SECONDS:
+            return available
+
+    try:
+        index_info = collection.index_information()
+    except OperationFailure:
+        index_info = {}
+    available = any(
+        any(direction == 'text' for _, direction in info.get('key', []))
+        for info in index_info.values()
+    )
+    with _state_lock:
+        _text_index_state[key] = (available, time.monotonic())
+    return available
+
+
+def mark_text_index_missing(collection):
+    """Use the regex path until the next recheck, e.g. after a $text query failed."""
+    with _state_lock:
+        _text_index_state[collection.full_name] = (False, time.monotonic())
+
+
+def text_search_clause(term):
+    """Return the $text filter for a search term."""
+    return {'$text': {'$search': term}}
+
+
+def regex_search_clause(term):
+    """Return the fallback filter: an escaped, case-insensitive match on name."""
+    return {'name': {'$regex': re.escape(term), '$options': 'i'}}
+
+
+def search_clause(collection, term):
+    """
+    Return (filter, uses_text) for a search term.
+
+    Uses the text index when it exists and falls back to the regex scan otherwise.
+    """
+    if has_text_index(collection):
+        return text_search_clause(term), True
+    return regex_search_clause(term), False
+
+
+def prefix_range(prefix):
+    """Return a name range filter matching every name starting with prefix."""
+    return {'name': {'$gte': prefix, '$lt': prefix + '\uffff'}}
+
+
+def autocomplete(collection, prefix, limit=8, projection=None):
+    """
+    Return up to `limit` product docs whose name starts with prefix (case-insensitive).
+
+    The query and sort use the products_name_ci collation so MongoDB answers it
+    with an index range scan instead of a collection scan.
+    """
+    prefix = (prefix or '').strip()
+    if not prefix:
+        return []
+    if projection is None:
+        projection = {'name': 1, 'slug': 1, 'price': 1, 'images': {'$slice': 1}}
+    query = prefix_range(prefix)
+    query['is_available'] = {'$ne': False}
+    try:
+        cursor = (collection.find(query, projection)
+                  .collation(NAME_COLLATION)
+                  .sort('name', 1)
+                  .limit(limit))
+        return list(cursor)
+    except OperationFailure as e:
+        print(f"Autocomplete query failed, falling back to regex: {e}")
+        query = {'name': {'$regex': '^' + re.escape(prefix), '$options': 'i'}, 'is_available': {'$ne': False}}
+        return list(collection.find(query, projection).sort('name', 1).limit(limit))
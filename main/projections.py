@@ -0,0 +1,114 @@
+"""
+Field projections for MongoDBManager read paths.
+
+Each listing asks MongoDB only for the fields it renders. The matching lean
+formatters live on MongoDBManager (_format_product_card, ...). `detail` is
+None, meaning the full document; it backs product pages and the default API
+output.
+
+`report_projection_savings` measures bytes and latency saved per use case.
+"""
+
+# Products
+PRODUCT_CARD = {
+    'name': 1,
+    'slug': 1,
+    'price': 1,
+    'compare_price': 1,
+    'images': {'$slice': 1},
+    'is_available': 1,
+    'created_at': 1,
+}
+
+PRODUCT_ADMIN_ROW = {
+    'name': 1,
+    'slug': 1,
+    'sku': 1,
+    'price': 1,
+    'quantity': 1,
+    'is_available': 1,
+    'category_id': 1,
+    'images': {'$slice': 1},
+    'created_at': 1,
+    'updated_at': 1,
+}
+
+PRODUCT_CART_LINE = {
+    'name': 1,
+    'sku': 1,
+    'price': 1,
+    'quantity': 1,
+    'is_available': 1,
+    'images': {'$slice': 1},
+}
+
+# Server-side order pricing (main/pricing.py)
+PRODUCT_PRICING = {
+    'name': 1,
+    'price': 1,
+    'quantity': 1,
+    'is_available': 1,
+}
+
+PRODUCT_PROJECTIONS = {
+    'card': PRODUCT_CARD,
+    'admin_row': PRODUCT_ADMIN_ROW,
+    'cart_line': PRODUCT_CART_LINE,
+    'detail': None,
+}
+
+# Users - never load password hashes into listings
+USER_ADMIN_ROW = {
+    'username': 1,
+    'email': 1,
+    'first_name': 1,
+    'last_name': 1,
+    'phone': 1,
+    'is_active': 1,
+    'is_staff': 1,
+    'is_superuser': 1,
+    'date_joined': 1,
+    'last_login': 1,
+}
+
+# Orders - the dashboard table shows an item count, not the line items
+ORDER_ADMIN_ROW = {
+    'order_number': 1,
+    'user_id': 1,
+    'total_amount': 1,
+    'status': 1,
+    'payment_status': 1,
+    'payment_method': 1,
+    'created_at': 1,
+    'item_count': {'$size': {'$ifNull': ['$items', []]}},
+}
+
+# Customer order history rows - details are loaded per order via order_detail
+ORDER_HISTORY_ROW = {
+    'order_number': 1,
+    'total_amount': 1,
+    'status': 1,
+    'payment_status': 1,
+    'created_at': 1,
+    'item_count': {'$size': {'$ifNull': ['$items', []]}},
+}
+
+# Payments - payment_details holds full gateway responses
+PAYMENT_ADMIN_ROW = {
+    'transaction_id': 1,
+    'order_id': 1,
+    'user_id': 1,
+    'amount': 1,
+    'currency': 1,
+    'payment_method': 1,
+    'status': 1,
+    'created_at': 1,
+}
+
+
+def with_text_score(projection):
+    """Add the $text relevance score to a projection (None means all fields)."""
+    score = {'score': {'$meta': 'textScore'}}
+    if projection is None:
+        return score
+    return {**projection, **score}
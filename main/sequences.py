@@ -0,0 +1,55 @@
+"""
+Collision-free order and transaction numbers.
+
+Numbers come from named counters in the `counters` collection. Instead of
+one find_one_and_update per order, each process reserves a block of
+SEQUENCE_BLOCK_SIZE values with a single $inc and hands them out from memory,
+so only one order in SEQUENCE_BLOCK_SIZE pays the extra round trip. Blocks
+never overlap, so numbers are unique across gunicorn workers and hosts; they
+increase within a process and across blocks, so they sort by allocation
+order up to one block of interleaving between workers. Unused values of a
+block are skipped when a worker restarts.
+
+Unique indexes on orders.order_number and payments.transaction_id (see
+mongo_indexes.py) back the guarantee.
+"""
+import os
+import threading
+
+from django.conf import settings
+from pymongo import ReturnDocument
+
+
+class SequenceAllocator:
+    """Hands out values of one named counter, a block at a time (owned by MongoDBManager)."""
+
+    def __init__(self, manager, name):
+        self.manager = manager
+        self.name = name
+        self._lock = threading.Lock()
+        self._next = 0
+        self._end = 0  # exclusive
+        self._pid = None
+
+    def _reserve_block(self, size):
+        doc = self.manager.counters_collection.find_one_and_update(
+            {'_id': self.name},
+            {'$inc': {'value': size}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        self._end = doc['value'] + 1
+        self._next = self._end - size
+
+    def next(self):
+        """Return the next value of the sequence (starts at 1)."""
+        with self._lock:
+            pid = os.getpid()
+            if self._pid != pid or self._next >= self._end:
+                # A forked worker must not reuse its parent's block
+                self._reserve_block(max(int(getattr(settings, 'SEQUENCE_BLOCK_SIZE', 50)), 1))
+                self._pid = pid
+            value = self._next
+            self._next += 1
+            return value
+
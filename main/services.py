@@ -0,0 +1,133 @@
+"""
+Read-side service layer for the MongoDB catalog, orders and payments.
+
+The DRF viewsets in api_views.py and the server-rendered views (through
+api_client.InternalAPIClient) both call these functions, so the HTML pages
+get the same results as /api/... without building a fake HTTP request,
+parsing a QueryDict and unwrapping a DRF Response on every call.
+
+Arguments are already-parsed Python values; turning query strings into them
+is the viewsets' job.
+"""
+from typing import Dict, List, Optional, TypedDict
+
+from .mongodb_utils import mongodb_manager
+
+
+class Page(TypedDict):
+    """One page of a listing (the shape of MongoDBManager.list_* results)."""
+    items: List[Dict]
+    total: int
+    page: int
+    page_size: int
+    next_cursor: Optional[str]
+    prev_cursor: Optional[str]
+
+
+# --------------------
+# Products
+# --------------------
+def list_products(category: Optional[str] = None, search: Optional[str] = None,
+                  max_price: Optional[str] = None, sort_by: Optional[str] = None,
+                  date_from: Optional[str] = None, date_to: Optional[str] = None,
+                  page: int = 1, page_size: int = 20, cursor: Optional[str] = None,
+                  fields: str = 'detail') -> Page:
+    return mongodb_manager.list_products(
+        category=category,
+        search=search,
+        max_price=max_price,
+        sort_by=sort_by,
+        date_from=date_from,
+        date_to=date_to,
+        page=page,
+        page_size=page_size,
+        cursor=cursor,
+        fields=fields,
+    )
+
+
+def get_product(product_id: str) -> Optional[Dict]:
+    return mongodb_manager.get_product_by_id(str(product_id))
+
+
+def new_arrivals(limit: int = 4) -> List[Dict]:
+    """Newest products as cards."""
+    return mongodb_manager.list_products(sort_by='newest', page=1, page_size=limit, fields='card')['items']
+
+
+def related_products(product_id: str, limit: int = 4) -> Optional[List[Dict]]:
+    """Cards from the product's category, or None if the product does not exist."""
+    product = get_product(product_id)
+    if not product:
+        return None
+    if not product.get('category_id'):
+        return []
+    result = mongodb_manager.list_products(
+        category=str(product['category_id']), page=1, page_size=limit + 1, fields='card',
+    )
+    return [p for p in result['items'] if p['id'] != product['id']][:limit]
+
+
+# --------------------
+# Categories
+# --------------------
+def list_categories(parent_id: Optional[str] = None, is_active: Optional[bool] = None,
+                    top_level_only: bool = False) -> List[Dict]:
+    return mongodb_manager.list_categories(
+        parent_id=parent_id or None,
+        is_active=is_active,
+        top_level_only=top_level_only,
+    )
+
+
+def get_category(category_id: str) -> Optional[Dict]:
+    return mongodb_manager.get_category_by_id(str(category_id))
+
+
+def category_tree() -> List[Dict]:
+    """Active categories as nested dicts with 'children'."""
+    return mongodb_manager.category_tree.tree(active_only=True)
+
+
+# --------------------
+# Orders and payments
+# --------------------
+def list_orders(user_id: Optional[str] = None, status: Optional[str] = None,
+                date_from: Optional[str] = None, date_to: Optional[str] = None,
+                page: int = 1, page_size: int = 20, cursor: Optional[str] = None,
+                fields: str = 'detail') -> Page:
+    return mongodb_manager.list_orders(
+        user_id=user_id,
+        status=status,
+        date_from=date_from,
+        date_to=date_to,
+        page=page,
+        page_size=page_size,
+        cursor=cursor,
+        fields=fields,
+    )
+
+
+def get_order(order_id: str) -> Optional[Dict]:
+    return mongodb_manager.get_order_by_id(str(order_id))
+
+
+def list_payments(order_id: Optional[str] = None, user_id: Optional[str] = None,
+                  status: Optional[str] = None, date_from: Optional[str] = None,
+                  date_to: Optional[str] = None, page: int = 1, page_size: int = 20,
+                  cursor: Optional[str] = None, fields: str = 'detail') -> Page:
+    return mongodb_manager.list_payments(
+        order_id=order_id,
+        user_id=user_id,
+        status=status,
+        date_from=date_from,
+        date_to=date_to,
+        page=page,
+        page_size=page_size,
+        cursor=cursor,
+        fields=fields,
+    )
+
+
+def get_payment(payment_id: str) -> Optional[Dict]:
+    return mongodb_manager.get_payment_by_id(str(payment_id))
@@ -72,9 +72,9 @@ def send_telegram_message(message: str, parse_mode: str = 'HTML') -> bool:
         return False
 
 
-def send_order_notification(order_data: dict) -> bool:
+def format_order_notification(order_data: dict) -> str:
     """
-    Send notification when a new order is placed
+    Build the message sent when a new order is placed
     
     Args:
         order_data: Dictionary containing order information
@@ -87,46 +87,45 @@ def send_order_notification(order_data: dict) -> bool:
             - shipping_address: Shipping address dict
     
     Returns:
-        bool: True if notification sent successfully
+        str: HTML message text
     """
-    try:
-        order_number = order_data.get('order_number', 'N/A')
-        total_amount = order_data.get('total_amount', 0)
-        payment_method = order_data.get('payment_method', 'Unknown')
-        customer_name = order_data.get('customer_name', 'Unknown')
-        customer_email = order_data.get('customer_email', 'N/A')
-        items = order_data.get('items', [])
-        shipping_address = order_data.get('shipping_address', {})
-        
-        # Format items list
-        items_text = ""
-        for item in items[:5]:  # Show first 5 items
-            item_name = item.get('name', 'Unknown Product')
-            item_qty = item.get('quantity', 1)
-            item_price = item.get('price', 0)
-            items_text += f"  • {item_name} (Qty: {item_qty}) - ${item_price:.2f}\n"
-        
-        if len(items) > 5:
-            items_text += f"  ... and {len(items) - 5} more item(s)\n"
-        
-        # Format shipping address
-        address_parts = []
-        if shipping_address.get('first_name') or shipping_address.get('last_name'):
-            address_parts.append(f"{shipping_address.get('first_name', '')} {shipping_address.get('last_name', '')}".strip())
-        if shipping_address.get('address'):
-            address_parts.append(shipping_address.get('address'))
-        if shipping_address.get('city'):
-            address_parts.append(shipping_address.get('city'))
-        if shipping_address.get('province'):
-            address_parts.append(shipping_address.get('province'))
-        if shipping_address.get('postal_code'):
-            address_parts.append(shipping_address.get('postal_code'))
-        if shipping_address.get('country'):
-            address_parts.append(shipping_address.get('country'))
-        address_text = "\n".join(address_parts) if address_parts else "N/A"
-        
-        # Build message
-        message = f"""
+    order_number = order_data.get('order_number', 'N/A')
+    total_amount = order_data.get('total_amount', 0)
+    payment_method = order_data.get('payment_method', 'Unknown')
+    customer_name = order_data.get('customer_name', 'Unknown')
+    customer_email = order_data.get('customer_email', 'N/A')
+    items = order_data.get('items', [])
+    shipping_address = order_data.get('shipping_address', {})
+    
+    # Format items list
+    items_text = ""
+    for item in items[:5]:  # Show first 5 items
+        item_name = item.get('name', 'Unknown Product')
+        item_qty = item.get('quantity', 1)
+        item_price = item.get('price', 0)
+        items_text += f"  • {item_name} (Qty: {item_qty}) - ${item_price:.2f}\n"
+    
+    if len(items) > 5:
+        items_text += f"  ... and {len(items) - 5} more item(s)\n"
+    
+    # Format shipping address
+    address_parts = []
+    if shipping_address.get('first_name') or shipping_address.get('last_name'):
+        address_parts.append(f"{shipping_address.get('first_name', '')} {shipping_address.get('last_name', '')}".strip())
+    if shipping_address.get('address'):
+        address_parts.append(shipping_address.get('address'))
+    if shipping_address.get('city'):
+        address_parts.append(shipping_address.get('city'))
+    if shipping_address.get('province'):
+        address_parts.append(shipping_address.get('province'))
+    if shipping_address.get('postal_code'):
+        address_parts.append(shipping_address.get('postal_code'))
+    if shipping_address.get('country'):
+        address_parts.append(shipping_address.get('country'))
+    address_text = "\n".join(address_parts) if address_parts else "N/A"
+    
+    # Build message
+    message = f"""
 🛒 <b>New Order Placed!</b>
 
 📦 Order Number: <code>{order_number}</code>
@@ -145,18 +144,37 @@ def send_order_notification(order_data: dict) -> bool:
 {address_text}
 
 ⚠️ <i>Payment is pending. Order will be processed after payment confirmation.</i>
-        """.strip()
-        
-        return send_telegram_message(message)
-        
+    """.strip()
+    return message
+
+
+def send_order_notification(order_data: dict) -> bool:
+    """
+    Send notification when a new order is placed
+    
+    Args:
+        order_data: Dictionary containing order information
+            - order_number: Order number
+            - total_amount: Total order amount
+            - payment_method: Payment method used
+            - customer_name: Customer name
+            - customer_email: Customer email
+            - items: List of order items
+            - shipping_address: Shipping address dict
+    
+    Returns:
+        bool: True if notification sent successfully
+    """
+    try:
+        return send_telegram_message(format_order_notification(order_data))
     except Exception as e:
         logger.exception(f"Error formatting order notification: {e}")
         return False
 
 
-def send_payment_notification(order_data: dict) -> bool:
+def format_payment_notification(order_data: dict) -> str:
     """
-    Send notification when payment is completed
+    Build the message sent when payment is completed
     
     Args:
         order_data: Dictionary containing order information
@@ -168,29 +186,28 @@ def send_payment_notification(order_data: dict) -> bool:
             - items: List of order items
     
     Returns:
-        bool: True if notification sent successfully
+        str: HTML message text
     """
-    try:
-        order_number = order_data.get('order_number', 'N/A')
-        total_amount = order_data.get('total_amount', 0)
-        payment_method = order_data.get('payment_method', 'Unknown')
-        customer_name = order_data.get('customer_name', 'Unknown')
-        customer_email = order_data.get('customer_email', 'N/A')
-        items = order_data.get('items', [])
-        
-        # Format items list
-        items_text = ""
-        for item in items[:5]:  # Show first 5 items
-            item_name = item.get('name', 'Unknown Product')
-            item_qty = item.get('quantity', 1)
-            item_price = item.get('price', 0)
-            items_text += f"  • {item_name} (Qty: {item_qty}) - ${item_price:.2f}\n"
-        
-        if len(items) > 5:
-            items_text += f"  ... and {len(items) - 5} more item(s)\n"
-        
-        # Build message
-        message = f"""
+    order_number = order_data.get('order_number', 'N/A')
+    total_amount = order_data.get('total_amount', 0)
+    payment_method = order_data.get('payment_method', 'Unknown')
+    customer_name = order_data.get('customer_name', 'Unknown')
+    customer_email = order_data.get('customer_email', 'N/A')
+    items = order_data.get('items', [])
+    
+    # Format items list
+    items_text = ""
+    for item in items[:5]:  # Show first 5 items
+        item_name = item.get('name', 'Unknown Product')
+        item_qty = item.get('quantity', 1)
+        item_price = item.get('price', 0)
+        items_text += f"  • {item_name} (Qty: {item_qty}) - ${item_price:.2f}\n"
+    
+    if len(items) > 5:
+        items_text += f"  ... and {len(items) - 5} more item(s)\n"
+    
+    # Build message
+    message = f"""
 ✅ <b>Payment Received!</b>
 
 📦 Order Number: <code>{order_number}</code>
@@ -206,10 +223,28 @@ def send_payment_notification(order_data: dict) -> bool:
 {items_text}
 
 🎉 <b>Order is ready to be processed!</b>
-        """.strip()
-        
-        return send_telegram_message(message)
-        
+    """.strip()
+    return message
+
+
+def send_payment_notification(order_data: dict) -> bool:
+    """
+    Send notification when payment is completed
+    
+    Args:
+        order_data: Dictionary containing order information
+            - order_number: Order number
+            - total_amount: Total order amount
+            - payment_method: Payment method used
+            - customer_name: Customer name
+            - customer_email: Customer email
+            - items: List of order items
+    
+    Returns:
+        bool: True if notification sent successfully
+    """
+    try:
+        return send_telegram_message(format_payment_notification(order_data))
     except Exception as e:
         logger.exception(f"Error formatting payment notification: {e}")
         return False
@@ -1,4 +1,90 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
-# This file will be populated when you create tests for your e-commerce application
+from django.test import SimpleTestCase, override_settings
+
+from .pricing import PricingError, price_cart
+
+
+SHIRT = '650000000000000000000001'
+HAT = '650000000000000000000002'
+GONE = '650000000000000000000003'
+HIDDEN = '650000000000000000000004'
+
+SNAPSHOTS = {
+    SHIRT: {'name': 'Shirt', 'price': 10.005, 'stock': 5, 'is_available': True},
+    HAT: {'name': 'Hat', 'price': 3.3, 'stock': 5, 'is_available': True},
+    GONE: {'missing': True},
+    HIDDEN: {'name': 'Hidden', 'price': 1.0, 'stock': 5, 'is_available': False},
+}
+
+
+def fake_snapshots(product_ids):
+    return {pid: SNAPSHOTS[pid] for pid in product_ids if pid in SNAPSHOTS}
+
+
+@override_settings(ORDER_TAX_RATE=0.1, ORDER_SHIPPING_COST=2.5)
+@mock.patch('main.pricing.load_snapshots', side_effect=fake_snapshots)
+class PriceCartTests(SimpleTestCase):
+    """price_cart() prices lines from catalog snapshots, never from the client."""
+
+    def test_rounds_prices_half_up_and_taxes_the_subtotal(self, load_snapshots):
+        priced = price_cart([{'id': SHIRT, 'quantity': 3}, {'id': HAT, 'quantity': 1}])
+
+        # 10.005 rounds up to 10.01 before the quantity is applied
+        self.assertEqual([item['price'] for item in priced['items']], [10.01, 3.3])
+        self.assertEqual(priced['items'][0]['line_total'], 30.03)
+        self.assertEqual(priced['subtotal'], 33.33)
+        self.assertEqual(priced['shipping_cost'], 2.5)
+        # 10% of 33.33 is 3.333 -> 3.33; shipping is not taxed
+        self.assertEqual(priced['tax_amount'], 3.33)
+        self.assertEqual(priced['total_amount'], 39.16)
+
+    def test_tax_rounds_half_up_on_the_cent(self, load_snapshots):
+        with override_settings(ORDER_TAX_RATE=0.05):
+            priced = price_cart([{'id': HAT, 'quantity': 1}])
+        # 5% of 3.30 is 0.165 -> 0.17
+        self.assertEqual(priced['tax_amount'], 0.17)
+
+    def test_lines_for_the_same_product_are_priced_separately(self, load_snapshots):
+        priced = price_cart([
+            {'id': SHIRT, 'quantity': 1, 'size': 'M'},
+            {'id': SHIRT, 'quantity': 2, 'size': 'L'},
+        ])
+
+        self.assertEqual([(item['size'], item['line_total']) for item in priced['items']],
+                         [('M', 10.01), ('L', 20.02)])
+        self.assertEqual(priced['subtotal'], 30.03)
+
+    def test_reports_every_bad_line_together(self, load_snapshots):
+        with self.assertRaises(PricingError) as raised:
+            price_cart([
+                {'id': GONE, 'name': 'Old mug', 'quantity': 1},
+                {'id': HIDDEN, 'quantity': 1},
+                {'id': SHIRT, 'quantity': 0},
+                {'id': HAT, 'quantity': 'two'},
+                'not a line',
+            ])
+
+        self.assertEqual(raised.exception.errors, [
+            'Old mug is no longer available',
+            'Hidden is currently unavailable',
+            'Invalid quantity for Shirt',
+            'Invalid quantity for Hat',
+            'Invalid cart line',
+        ])
+
+    def test_empty_cart_is_an_error(self, load_snapshots):
+        with self.assertRaises(PricingError) as raised:
+            price_cart([])
+        self.assertEqual(raised.exception.errors, ['Cart is empty'])
+
+    def test_ignores_client_prices_and_totals(self, load_snapshots):
+        priced = price_cart([{
+            'id': HAT, 'name': 'Cheap hat', 'quantity': 2,
+            'price': 0.01, 'line_total': 0.02, 'total_amount': 0.02,
+        }])
+
+        item = priced['items'][0]
+        self.assertEqual((item['name'], item['price'], item['line_total']), ('Hat', 3.3, 6.6))
+        self.assertEqual(priced['subtotal'], 6.6)
+        self.assertEqual(priced['total_amount'], 9.76)
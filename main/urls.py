@@ -14,6 +14,7 @@ urlpatterns = [
     
     # Store pages
     path('shop/', views.shop, name='shop'),
+    path('shop/products/', views.shop_products, name='shop_products'),
     path('product/<str:product_id>/', views.product_detail, name='product_detail'),
     path('cart/', views.cart, name='cart'),
     path('checkout/', views.checkout, name='checkout'),
@@ -32,6 +33,7 @@ urlpatterns = [
     # Cart and Address API endpoints
     path('api/save-cart/', views.save_cart, name='save_cart'),
     path('api/load-cart/', views.load_cart, name='load_cart'),
+    path('api/cart/ops/', views.cart_ops, name='cart_ops'),
     path('api/save-address/', views.save_address, name='save_address'),
     path('api/get-addresses/', views.get_addresses, name='get_addresses'),
     path('api/get-address/<str:address_id>/', views.get_address, name='get_address'),
@@ -41,10 +43,13 @@ urlpatterns = [
     path('api/add-wishlist/', views.add_wishlist, name='add_wishlist'),
     path('api/remove-wishlist/', views.remove_wishlist, name='remove_wishlist'),
     path('api/load-wishlist/', views.load_wishlist, name='load_wishlist'),
+    path('api/wishlist-status/', views.wishlist_status, name='wishlist_status'),
     # Order API endpoints
     path('api/create-order/', views.create_order, name='create_order'),
+    path('api/order-history/', views.order_history, name='order_history'),
     path('api/generate-bakong-qr/', views.generate_bakong_qr, name='generate_bakong_qr'),
     path('api/check-payment-status/', views.check_payment_status, name='check_payment_status'),
+    path('api/payment-status/stream/', views.payment_status_stream, name='payment_status_stream'),
     # PayPal API endpoints
     path('api/paypal/create/', views.paypal_create_order, name='paypal_create_order'),
     path('api/paypal/capture/', views.paypal_capture_order, name='paypal_capture_order'),
@@ -0,0 +1,62 @@
+"""
+Mirror MongoDB users into Django's auth table.
+
+Sessions, admin and permissions need a Django User row for every Mongo user
+who logs in. sync_django_user() copies the synced fields on each login but
+only writes what differs: an unchanged user costs a single SELECT, a changed
+one an UPDATE of just the changed columns (save(update_fields=...)).
+
+last_login is not synced; django.contrib.auth.login() stamps the Django row
+itself and MongoDB's copy goes through the write-behind buffer in
+main/last_login.py.
+"""
+from datetime import timezone as dt_timezone
+
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+
+# Django field -> default when the Mongo document does not have it
+SYNCED_FIELDS = {
+    'email': '',
+    'first_name': '',
+    'last_name': '',
+    'is_active': True,
+    'is_staff': False,
+    'is_superuser': False,
+}
+
+
+def synced_values(mongo_user):
+    return {field: mongo_user.get(field, default) for field, default in SYNCED_FIELDS.items()}
+
+
+def changed_fields(django_user, values):
+    """Names of the fields whose value differs from the Django row."""
+    return [field for field, value in values.items() if getattr(django_user, field) != value]
+
+
+def _aware(value):
+    # MongoDB returns naive UTC datetimes
+    if value is not None and timezone.is_naive(value):
+        return value.replace(tzinfo=dt_timezone.utc)
+    return value
+
+
+def sync_django_user(mongo_user):
+    """Return the Django user for a Mongo user document, writing only changed fields."""
+    values = synced_values(mongo_user)
+    defaults = dict(values)
+    if mongo_user.get('date_joined'):
+        defaults['date_joined'] = _aware(mongo_user['date_joined'])
+    django_user, created = get_user_model().objects.get_or_create(
+        username=mongo_user['username'], defaults=defaults,
+    )
+    if created:
+        return django_user
+    changed = changed_fields(django_user, values)
+    if changed:
+        for field in changed:
+            setattr(django_user, field, values[field])
+        django_user.save(update_fields=changed)
+    return django_user
@@ -4,36 +4,28 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.conf import settings
 import time
-from django.core.mail import send_mail
 from django.template.loader import render_to_string
-from django.utils.html import strip_tags
 from django.urls import reverse
 import logging
 logger = logging.getLogger(__name__)
 
-# Import Telegram notification utilities
-from .telegram_utils import send_order_notification, send_payment_notification
-
-
-def send_html_email(subject, template_name, context, to_email):
-    """Render an HTML email and send with a plain-text fallback."""
-    html_content = render_to_string(template_name, context)
-    text_content = strip_tags(html_content)
-    send_mail(
-        subject,
-        text_content,
-        getattr(settings, 'DEFAULT_FROM_EMAIL', None),
-        [to_email],
-        html_message=html_content,
-        fail_silently=False,
-    )
+# Emails and Telegram messages are queued here and delivered by the
+# dispatch_notifications worker, so SMTP/Telegram latency stays off requests
+from . import bakong_reconciler, notification_outbox, order_service, passwords
+from .cart_ops import CartOpError
+from .pricing import PricingError, price_cart
+from .payment_events import payment_hub
 
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from asgiref.sync import sync_to_async
 from django.views.decorators.csrf import csrf_exempt
 from .mongodb_utils import mongodb_manager
+from .mongo_users import get_mongo_user_id
+from .catalog_cache import get_or_build
 import json
 import os
 
@@ -77,7 +69,8 @@ def home(request):
         new_arrivals = mongodb_manager.list_products(
             sort_by='newest',
             page=1,
-            page_size=4
+            page_size=4,
+            fields='card'
         )['items']
     
     context = {
@@ -159,60 +152,72 @@ def elements(request):
     }
     return render(request, 'Home/elements.html', context)
 
+def _shop_filters(request):
+    """Normalized shop filter parameters - also the fragment cache key."""
+    return {
+        'category': (request.GET.get('category') or '').strip(),
+        'q': (request.GET.get('q') or '').strip(),
+        'max_price': (request.GET.get('max_price') or '').strip(),
+        'sort': (request.GET.get('sort') or '').strip(),
+    }
+
+
+def _shop_page(filters, page):
+    """Return one rendered page of shop product cards, cached per (filters, page)."""
+    page_size = settings.SHOP_PAGE_SIZE
+
+    def build():
+        result = mongodb_manager.list_products(
+            category=filters['category'] or None,
+            search=filters['q'] or None,
+            max_price=filters['max_price'] or None,
+            sort_by=filters['sort'] or None,
+            page=page,
+            page_size=page_size,
+            fields='card',
+        )
+        html = render_to_string('store/includes/product_cards.html', {'products': result['items']})
+        return {
+            'html': html.strip(),
+            'count': len(result['items']),
+            'total': result['total'],
+            'has_next': page * page_size < result['total'],
+        }
+
+    return get_or_build('shop:grid', dict(filters, page=page), build)
+
+
+def _get_page_number(request):
+    try:
+        return max(int(request.GET.get('page', 1)), 1)
+    except (ValueError, TypeError):
+        return 1
+
+
 def shop(request):
     """Shop/Product listing page view (MongoDB)"""
-    category = request.GET.get('category')
-    search = request.GET.get('q')
-    max_price = request.GET.get('max_price')
-    sort_by = request.GET.get('sort')
+    filters = _shop_filters(request)
+    page = _get_page_number(request)
+    category = filters['category']
+    search = filters['q']
     
-    # Get initial 21 products for infinite scroll
-    result = mongodb_manager.list_products(
-        category=category, 
-        search=search, 
-        max_price=max_price,
-        sort_by=sort_by,
-        page=1, 
-        page_size=1000  # Load all products at once
-    )
+    # First page only - further pages are loaded via shop_products
+    grid = _shop_page(filters, page)
 
-    # Fetch all active categories from MongoDB
+    # Active category hierarchy from the shared in-process tree index
     try:
-        all_categories = mongodb_manager.list_categories(is_active=True)
-        # Build hierarchical category structure
-        categories_tree = []
-        category_map = {}
-        
-        # First pass: create map of all categories
-        for cat in all_categories:
-            category_map[cat['id']] = cat
-            cat['children'] = []
-        
-        # Second pass: build tree structure
-        for cat in all_categories:
-            if cat.get('parent_id') and cat['parent_id'] in category_map:
-                # This is a child category
-                category_map[cat['parent_id']]['children'].append(cat)
-            else:
-                # This is a top-level category
-                categories_tree.append(cat)
-        
-        # Sort categories by sort_order
-        def sort_categories(cats):
-            cats.sort(key=lambda x: x.get('sort_order', 0))
-            for cat in cats:
-                if cat['children']:
-                    sort_categories(cat['children'])
-        
-        sort_categories(categories_tree)
+        categories_tree = mongodb_manager.category_tree.tree(active_only=True, orphans_as_roots=True)
     except Exception as e:
         logger.exception(f"Error fetching categories: {e}")
         categories_tree = []
 
     context = {
         'page_title': 'Shop',
-        'products': result['items'],
-        'total_products': result['total'],
+        'products_html': grid['html'],
+        'shown_count': grid['count'],
+        'total_products': grid['total'],
+        'has_next': grid['has_next'],
+        'next_page': page + 1,
         'categories': categories_tree,
         'current_category': category or '',
         'search_query': search or '',
@@ -220,6 +225,21 @@ def shop(request):
     return render(request, 'store/product_list.html', context)
 
 
+def shop_products(request):
+    """Return a page of shop product cards as an HTML fragment (infinite scroll)."""
+    filters = _shop_filters(request)
+    page = _get_page_number(request)
+    grid = _shop_page(filters, page)
+    return JsonResponse({
+        'success': True,
+        'html': grid['html'],
+        'page': page,
+        'has_next': grid['has_next'],
+        'next_page': page + 1 if grid['has_next'] else None,
+        'total': grid['total'],
+    })
+
+
 
 
 
@@ -241,16 +261,15 @@ def product_detail(request, product_id):
         category_id = product['category_id']
         if not isinstance(category_id, str):
             category_id = str(category_id)
-        rel_result = mongodb_manager.list_products(category=category_id, page=1, page_size=4)
+        rel_result = mongodb_manager.list_products(category=category_id, page=1, page_size=5, fields='card')
         related = [p for p in rel_result['items'] if p['id'] != product['id']][:4]
 
     # Check if product is in user's wishlist
     is_in_wishlist = False
     if request.user.is_authenticated:
         try:
-            mongo_user = mongodb_manager.get_user_by_username(request.user.username)
-            if mongo_user:
-                user_id = str(mongo_user.get('_id'))
+            user_id = get_mongo_user_id(request)
+            if user_id:
                 is_in_wishlist = mongodb_manager.is_in_wishlist(user_id, product_id)
         except:
             pass
@@ -451,9 +470,9 @@ def profile_view(request):
                 profile.save()
                 
                 # Update MongoDB user
-                mongo_user = mongodb_manager.get_user_by_username(user.username)
-                if mongo_user:
-                    mongodb_manager.update_user(str(mongo_user.get('_id')), {
+                user_id = get_mongo_user_id(request)
+                if user_id:
+                    mongodb_manager.update_user(user_id, {
                         'first_name': user.first_name,
                         'last_name': user.last_name,
                         'email': user.email,
@@ -490,9 +509,9 @@ def profile_view(request):
                 user = request.user
                 if not user.check_password(old_password):
                     # Try MongoDB authentication
-                    mongo_user = mongodb_manager.get_user_by_username(user.username)
+                    mongo_user = request.mongo_user
                     if mongo_user:
-                        if not mongodb_manager.verify_password(old_password, mongo_user.get('password', '')):
+                        if not passwords.check_password(old_password, mongo_user.get('password', '')):
                             messages.error(request, 'Current password is incorrect')
                             return redirect('main:profile')
                     else:
@@ -504,12 +523,10 @@ def profile_view(request):
                 user.save()
                 
                 # Update password in MongoDB
-                mongo_user = mongodb_manager.get_user_by_username(user.username)
-                if mongo_user:
-                    import bcrypt
-                    hashed_password = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-                    mongodb_manager.update_user(str(mongo_user.get('_id')), {
-                        'password': hashed_password
+                user_id = get_mongo_user_id(request)
+                if user_id:
+                    mongodb_manager.update_user(user_id, {
+                        'password': new_password
                     })
                 
                 # Re-authenticate user after password change
@@ -528,13 +545,11 @@ def profile_view(request):
             # Keeping this for backward compatibility but it should use MongoDB via AJAX
             try:
                 address_id = request.POST.get('address_id')
-                mongo_user = mongodb_manager.get_user_by_username(request.user.username)
-                if not mongo_user:
+                user_id = get_mongo_user_id(request)
+                if not user_id:
                     messages.error(request, 'User not found in MongoDB')
                     return redirect('main:profile')
                 
-                user_id = str(mongo_user.get('_id'))
-                
                 # Prepare address data for MongoDB
                 address_data = {
                     'user_id': user_id,
@@ -576,13 +591,11 @@ def profile_view(request):
         elif action == 'delete_address':
             try:
                 address_id = request.POST.get('address_id')
-                mongo_user = mongodb_manager.get_user_by_username(request.user.username)
-                if not mongo_user:
+                user_id = get_mongo_user_id(request)
+                if not user_id:
                     messages.error(request, 'User not found')
                     return redirect('main:profile')
                 
-                user_id = str(mongo_user.get('_id'))
-                
                 # Verify address belongs to user before deleting
                 address = mongodb_manager.get_address_by_id(address_id)
                 if not address or address.get('user_id') != user_id:
@@ -611,23 +624,22 @@ def profile_view(request):
     
     # Get user addresses from MongoDB
     addresses = []
-    mongo_user = mongodb_manager.get_user_by_username(request.user.username)
-    if mongo_user:
-        user_id = str(mongo_user.get('_id'))
+    user_id = get_mongo_user_id(request)
+    if user_id:
         addresses = mongodb_manager.get_user_addresses(user_id)
     
-    # Get user orders from MongoDB
-    mongo_user = mongodb_manager.get_user_by_username(request.user.username)
+    # First page of order history (summary rows); more via order_history
     orders = []
-    if mongo_user:
-        user_id = str(mongo_user.get('_id'))
-        orders = mongodb_manager.get_user_orders(user_id)
+    orders_next_cursor = None
+    if user_id:
+        history = mongodb_manager.get_user_order_history(user_id, settings.ORDER_HISTORY_PAGE_SIZE)
+        orders = history['items']
+        orders_next_cursor = history['next_cursor']
     
-    # Get user wishlist from MongoDB
+    # Get user wishlist from MongoDB (product cards)
     wishlist_items = []
-    if mongo_user:
-        user_id = str(mongo_user.get('_id'))
-        wishlist_items = mongodb_manager.get_user_wishlist(user_id)
+    if user_id:
+        wishlist_items = mongodb_manager.get_wishlist_products(user_id)
     
     # Cambodia provinces list
     cambodia_provinces = [
@@ -642,6 +654,7 @@ def profile_view(request):
         'page_title': 'Profile',
         'profile': profile,
         'orders': orders,
+        'orders_next_cursor': orders_next_cursor,
         'wishlist_items': wishlist_items,
         'addresses': addresses,
         'cambodia_provinces': cambodia_provinces,
@@ -653,9 +666,8 @@ def logout_view(request):
     # Save cart to MongoDB before logout (if user is authenticated)
     if request.user.is_authenticated:
         try:
-            mongo_user = mongodb_manager.get_user_by_username(request.user.username)
-            if mongo_user:
-                user_id = str(mongo_user.get('_id'))
+            user_id = get_mongo_user_id(request)
+            if user_id:
                 # Get cart from session or request if available
                 # The cart should already be saved via JavaScript before logout
                 pass
@@ -737,9 +749,8 @@ def checkout(request):
     
     if request.user.is_authenticated:
         # Load cart from MongoDB
-        mongo_user = mongodb_manager.get_user_by_username(request.user.username)
-        if mongo_user:
-            user_id = str(mongo_user.get('_id'))
+        user_id = get_mongo_user_id(request)
+        if user_id:
             cart_doc = mongodb_manager.get_user_cart(user_id)
             # Extract cart_data from the cart document
             if cart_doc and isinstance(cart_doc, dict):
@@ -752,9 +763,8 @@ def checkout(request):
     
     # Load saved addresses for authenticated users from MongoDB
     if request.user.is_authenticated:
-        mongo_user = mongodb_manager.get_user_by_username(request.user.username)
-        if mongo_user:
-            user_id = str(mongo_user.get('_id'))
+        user_id = get_mongo_user_id(request)
+        if user_id:
             saved_addresses = mongodb_manager.get_user_addresses(user_id)
         else:
             saved_addresses = []
@@ -778,11 +788,10 @@ def save_cart(request):
             data = json.loads(request.body)
             cart_data = data.get('cart', [])
             
-            mongo_user = mongodb_manager.get_user_by_username(request.user.username)
-            if not mongo_user:
+            user_id = get_mongo_user_id(request)
+            if not user_id:
                 return JsonResponse({'success': False, 'message': 'User not found'})
             
-            user_id = str(mongo_user.get('_id'))
             mongodb_manager.save_user_cart(user_id, cart_data)
             
             return JsonResponse({'success': True, 'message': 'Cart saved successfully'})
@@ -792,17 +801,54 @@ def save_cart(request):
     return JsonResponse({'success': False, 'message': 'Invalid request method'})
 
 
+@login_required
+@csrf_exempt
+def cart_ops(request):
+    """
+    Apply a batch of cart edits: {"version": n, "ops": [{"op": "add"|"update"|"remove"|"clear", ...}]}
+
+    See main/cart_ops.py for the operations. Returns the new version; on a
+    version conflict nothing after `processed` was applied and the current
+    cart is returned for the client to rebase on.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'message': 'Invalid request method'})
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'message': 'Invalid data'}, status=400)
+    ops = data.get('ops')
+    version = data.get('version')
+    if not isinstance(ops, list) or (version is not None and not isinstance(version, int)):
+        return JsonResponse({'success': False, 'message': 'ops must be a list and version an integer'}, status=400)
+
+    user_id = get_mongo_user_id(request)
+    if not user_id:
+        return JsonResponse({'success': False, 'message': 'User not found'})
+    try:
+        result = mongodb_manager.apply_cart_ops(user_id, ops, version)
+    except CartOpError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({'success': False, 'message': f'Error updating cart: {str(e)}'})
+    if result is None:
+        return JsonResponse({'success': False, 'message': 'User not found'})
+
+    response = {'success': True, 'version': result['version'], 'processed': result['processed'], 'conflict': result['conflict']}
+    if result['conflict']:
+        response['cart'] = result['cart']
+    return JsonResponse(response, status=409 if result['conflict'] else 200)
+
 @login_required
 @csrf_exempt
 def load_cart(request):
     """Load user cart from MongoDB"""
     if request.method == 'GET':
         try:
-            mongo_user = mongodb_manager.get_user_by_username(request.user.username)
-            if not mongo_user:
+            user_id = get_mongo_user_id(request)
+            if not user_id:
                 return JsonResponse({'success': False, 'cart': []})
             
-            user_id = str(mongo_user.get('_id'))
             cart_doc = mongodb_manager.get_user_cart(user_id)
             
             # Extract cart_data from the cart document
@@ -813,8 +859,9 @@ def load_cart(request):
             
             if not cart_data:
                 cart_data = []
+            version = cart_doc.get('version', 0) if isinstance(cart_doc, dict) else 0
             
-            return JsonResponse({'success': True, 'cart': cart_data})
+            return JsonResponse({'success': True, 'cart': cart_data, 'version': version})
         except Exception as e:
             import traceback
             print(f"Error loading cart: {traceback.format_exc()}")
@@ -832,12 +879,10 @@ def save_address(request):
             data = json.loads(request.body)
             
             # Get MongoDB user ID
-            mongo_user = mongodb_manager.get_user_by_username(request.user.username)
-            if not mongo_user:
+            user_id = get_mongo_user_id(request)
+            if not user_id:
                 return JsonResponse({'success': False, 'message': 'User not found in MongoDB'})
             
-            user_id = str(mongo_user.get('_id'))
-            
             # Prepare address data for MongoDB
             address_data = {
                 'user_id': user_id,
@@ -875,11 +920,10 @@ def get_addresses(request):
     """Get all addresses for current user from MongoDB"""
     if request.method == 'GET':
         try:
-            mongo_user = mongodb_manager.get_user_by_username(request.user.username)
-            if not mongo_user:
+            user_id = get_mongo_user_id(request)
+            if not user_id:
                 return JsonResponse({'success': False, 'addresses': [], 'message': 'User not found in MongoDB'})
             
-            user_id = str(mongo_user.get('_id'))
             addresses = mongodb_manager.get_user_addresses(user_id)
             
             # Debug logging
@@ -902,11 +946,10 @@ def get_address(request, address_id):
     """Get a specific address by ID from MongoDB"""
     if request.method == 'GET':
         try:
-            mongo_user = mongodb_manager.get_user_by_username(request.user.username)
-            if not mongo_user:
+            user_id = get_mongo_user_id(request)
+            if not user_id:
                 return JsonResponse({'success': False, 'address': None, 'message': 'User not found in MongoDB'})
             
-            user_id = str(mongo_user.get('_id'))
             address = mongodb_manager.get_address_by_id(address_id)
             
             # Verify address belongs to user
@@ -935,12 +978,10 @@ def update_address_mongo(request):
                 return JsonResponse({'success': False, 'message': 'Address ID is required'})
             
             # Get MongoDB user ID
-            mongo_user = mongodb_manager.get_user_by_username(request.user.username)
-            if not mongo_user:
+            user_id = get_mongo_user_id(request)
+            if not user_id:
                 return JsonResponse({'success': False, 'message': 'User not found'})
             
-            user_id = str(mongo_user.get('_id'))
-            
             # Verify address belongs to user
             address = mongodb_manager.get_address_by_id(address_id)
             if not address or address.get('user_id') != user_id:
@@ -998,12 +1039,10 @@ def delete_address_mongo(request):
                 return JsonResponse({'success': False, 'message': 'Address ID is required'})
             
             # Get MongoDB user ID
-            mongo_user = mongodb_manager.get_user_by_username(request.user.username)
-            if not mongo_user:
+            user_id = get_mongo_user_id(request)
+            if not user_id:
                 return JsonResponse({'success': False, 'message': 'User not found'})
             
-            user_id = str(mongo_user.get('_id'))
-            
             # Verify address belongs to user
             address = mongodb_manager.get_address_by_id(address_id)
             if not address or address.get('user_id') != user_id:
@@ -1035,11 +1074,10 @@ def add_wishlist(request):
             if not product_id:
                 return JsonResponse({'success': False, 'message': 'Product ID is required'})
             
-            mongo_user = mongodb_manager.get_user_by_username(request.user.username)
-            if not mongo_user:
+            user_id = get_mongo_user_id(request)
+            if not user_id:
                 return JsonResponse({'success': False, 'message': 'User not found'})
             
-            user_id = str(mongo_user.get('_id'))
             mongodb_manager.add_to_wishlist(user_id, product_id)
             
             return JsonResponse({'success': True, 'message': 'Product added to wishlist'})
@@ -1061,11 +1099,10 @@ def remove_wishlist(request):
             if not product_id:
                 return JsonResponse({'success': False, 'message': 'Product ID is required'})
             
-            mongo_user = mongodb_manager.get_user_by_username(request.user.username)
-            if not mongo_user:
+            user_id = get_mongo_user_id(request)
+            if not user_id:
                 return JsonResponse({'success': False, 'message': 'User not found'})
             
-            user_id = str(mongo_user.get('_id'))
             mongodb_manager.remove_from_wishlist(user_id, product_id)
             
             return JsonResponse({'success': True, 'message': 'Product removed from wishlist'})
@@ -1075,18 +1112,49 @@ def remove_wishlist(request):
     return JsonResponse({'success': False, 'message': 'Invalid request method'})
 
 
+@login_required
+def wishlist_status(request):
+    """Which of ?ids=<id,id,...> are in the user's wishlist (marks hearts on the shop grid)."""
+    # A grid page is SHOP_PAGE_SIZE cards; cap what a single request can ask about
+    product_ids = [pid for pid in (request.GET.get('ids') or '').split(',') if pid][:100]
+    user_id = get_mongo_user_id(request)
+    if not user_id or not product_ids:
+        return JsonResponse({'success': True, 'ids': []})
+    in_wishlist = mongodb_manager.is_in_wishlist_many(user_id, product_ids)
+    return JsonResponse({'success': True, 'ids': [pid for pid in product_ids if pid in in_wishlist]})
+
+@login_required
+def order_history(request):
+    """Next page of the user's order history (?cursor=) as summary rows and rendered HTML."""
+    user_id = get_mongo_user_id(request)
+    if not user_id:
+        return JsonResponse({'success': True, 'orders': [], 'html': '', 'next_cursor': None})
+    history = mongodb_manager.get_user_order_history(
+        user_id, settings.ORDER_HISTORY_PAGE_SIZE, cursor=request.GET.get('cursor') or None,
+    )
+    html = render_to_string('auth/includes/order_rows.html', {'orders': history['items']})
+    return JsonResponse({
+        'success': True,
+        'orders': [
+            dict(order, created_at=order['created_at'].isoformat() if order['created_at'] else None,
+                 detail_url=reverse('main:order_detail', args=[order['id']]))
+            for order in history['items']
+        ],
+        'html': html.strip(),
+        'next_cursor': history['next_cursor'],
+    })
+
 @login_required
 @csrf_exempt
 def load_wishlist(request):
     """Load user wishlist"""
     if request.method == 'GET':
         try:
-            mongo_user = mongodb_manager.get_user_by_username(request.user.username)
-            if not mongo_user:
+            user_id = get_mongo_user_id(request)
+            if not user_id:
                 return JsonResponse({'success': False, 'wishlist': []})
             
-            user_id = str(mongo_user.get('_id'))
-            wishlist_items = mongodb_manager.get_user_wishlist(user_id)
+            wishlist_items = mongodb_manager.get_wishlist_products(user_id)
             
             return JsonResponse({'success': True, 'wishlist': wishlist_items})
         except Exception as e:
@@ -1104,22 +1172,22 @@ def create_order(request):
             data = json.loads(request.body)
             
             # Get MongoDB user ID
-            mongo_user = mongodb_manager.get_user_by_username(request.user.username)
-            if not mongo_user:
+            user_id = get_mongo_user_id(request)
+            if not user_id:
                 return JsonResponse({'success': False, 'message': 'User not found in MongoDB'})
             
-            user_id = str(mongo_user.get('_id'))
-            
             # Validate cart items
             cart_items = data.get('cart_items', [])
             if not cart_items or len(cart_items) == 0:
                 return JsonResponse({'success': False, 'message': 'Cart is empty'})
             
-            # Calculate totals
-            subtotal = float(data.get('subtotal', 0))
-            shipping_cost = float(data.get('shipping_cost', 0))
-            tax_amount = float(data.get('tax_amount', 0))
-            total_amount = float(data.get('total_amount', 0))
+            # Price the lines from the catalog - client prices and totals are ignored
+            try:
+                priced = price_cart(cart_items)
+            except PricingError as e:
+                return JsonResponse({'success': False, 'message': str(e), 'errors': e.errors})
+            cart_items = priced['items']
+            total_amount = priced['total_amount']
             
             # Prepare shipping address
             shipping_address = {
@@ -1134,69 +1202,28 @@ def create_order(request):
                 'country': data.get('country', 'Cambodia'),
             }
             
-            # Determine payment method
+            # Payment status stays pending until the payment completes
             payment_method = data.get('payment', 'pay_later')
-            if payment_method == 'pay_later':
-                payment_status = 'pending'
-            else:
-                payment_status = 'pending'  # Will be updated after payment
-            
-            # Create order in MongoDB
-            order_data = {
-                'user_id': user_id,
-                'items': cart_items,
-                'subtotal': subtotal,
-                'shipping_cost': shipping_cost or 0,
-                'tax_amount': tax_amount,
-                'total_amount': total_amount,
-                'status': 'pending',
-                'payment_status': payment_status,
-                'shipping_address': shipping_address,
-                'payment_method': payment_method,
-                'shipping_method': 'standard',
-                'notes': data.get('order_notes', ''),
-            }
-            
-            order_id = mongodb_manager.create_order(order_data)
-            
-            if not order_id:
-                return JsonResponse({'success': False, 'message': 'Failed to create order'})
             
-            # Get order number from created order
-            order = mongodb_manager.get_order_by_id(order_id)
-            order_number = order.get('order_number', '') if order else ''
-            
-            # Create payment record for all orders (including pay_later)
-            # Convert order_id and user_id to ObjectId for MongoDB
-            from bson import ObjectId
+            # Reserve stock and write the order + pending payment together
             try:
-                payment_data = {
-                    'order_id': ObjectId(order_id) if isinstance(order_id, str) else order_id,  # Convert to ObjectId
-                    'user_id': ObjectId(user_id) if isinstance(user_id, str) else user_id,    # Convert to ObjectId
-                    'amount': total_amount,
-                    'payment_method': payment_method,
-                    'status': 'pending',
-                    'currency': 'USD',
-                    'payment_details': {}
-                }
-                
-                payment_id = mongodb_manager.create_payment(payment_data)
-                
-                if not payment_id:
-                    print(f"Warning: Order {order_id} created but payment record failed")
-                    import traceback
-                    print(traceback.format_exc())
-            except Exception as e:
-                print(f"Error creating payment record: {e}")
-                import traceback
-                print(traceback.format_exc())
-                payment_id = None
+                placed = order_service.place_order(
+                    user_id, priced, shipping_address, payment_method, notes=data.get('order_notes', ''),
+                )
+            except order_service.OutOfStock as e:
+                return JsonResponse({'success': False, 'message': str(e), 'out_of_stock': e.product_names})
+            except order_service.OrderPlacementError as e:
+                print(f"Error placing order: {e}")
+                return JsonResponse({'success': False, 'message': 'Failed to create order'})
+            order_id = placed['order_id']
+            order_number = placed['order_number']
+            payment_id = placed['payment_id']
             
             # IMPORTANT: Do NOT remove cart items here
             # Cart items will only be removed after successful payment completion
             # This allows users to keep items in cart if they choose "pay_later" or if payment fails
             
-            # Send email notification (order placed)
+            # Queue email notification (order placed)
             try:
                 recipient = request.user.email
                 if recipient:
@@ -1212,11 +1239,11 @@ def create_order(request):
                         'headline': 'Thanks for your order!',
                         'subtext': 'We are preparing your items.'
                     }
-                    send_html_email(subject, 'emails/order_placed.html', context_email, recipient)
+                    notification_outbox.enqueue_email('order_placed', order_id, recipient, subject, 'emails/order_placed.html', context_email)
             except Exception as e:
-                logger.exception(f"Email send failed (order placed). To={getattr(request.user, 'email', None)} Host={getattr(settings, 'EMAIL_HOST', None)} User={getattr(settings, 'EMAIL_HOST_USER', None)} Port={getattr(settings, 'EMAIL_PORT', None)} TLS={getattr(settings, 'EMAIL_USE_TLS', None)}: {e}")
+                logger.exception(f"Queueing email failed (order placed): {e}")
             
-            # Send Telegram notification to owner (new order placed)
+            # Queue Telegram notification to owner (new order placed)
             try:
                 order_notification_data = {
                     'order_number': order_number or order_id,
@@ -1227,9 +1254,9 @@ def create_order(request):
                     'items': cart_items,
                     'shipping_address': shipping_address,
                 }
-                send_order_notification(order_notification_data)
+                notification_outbox.enqueue_telegram('order_placed', order_id, 'order', order_notification_data)
             except Exception as e:
-                logger.exception(f"Telegram notification failed (order placed): {e}")
+                logger.exception(f"Queueing Telegram notification failed (order placed): {e}")
 
             return JsonResponse({
                 'success': True,
@@ -1237,6 +1264,7 @@ def create_order(request):
                 'order_id': str(order_id),
                 'order_number': order_number,
                 'payment_id': str(payment_id) if payment_id else None,
+                'total_amount': total_amount,
             })
             
         except Exception as e:
@@ -1265,9 +1293,8 @@ def payment(request):
     
     # Check if order belongs to user (if authenticated)
     if request.user.is_authenticated:
-        mongo_user = mongodb_manager.get_user_by_username(request.user.username)
-        if mongo_user:
-            user_id = str(mongo_user.get('_id'))
+        user_id = get_mongo_user_id(request)
+        if user_id:
             if order.get('user_id') != user_id:
                 messages.error(request, 'You do not have permission to view this order')
                 return redirect('main:home')
@@ -1299,27 +1326,9 @@ def payment(request):
     return render(request, 'store/payment.html', context)
 
 # --- PayPal Integration ---
-import requests
-
-def _paypal_base_url():
-    env = getattr(settings, 'PAYPAL_ENV', 'sandbox')
-    return 'https://api-m.sandbox.paypal.com' if env != 'live' else 'https://api-m.paypal.com'
-
-def _paypal_access_token():
-    client_id = getattr(settings, 'PAYPAL_CLIENT_ID', '')
-    client_secret = getattr(settings, 'PAYPAL_CLIENT_SECRET', '')
-    if not client_id or not client_secret:
-        raise ValueError('PayPal client credentials are not configured')
-    resp = requests.post(
-        f"{_paypal_base_url()}/v1/oauth2/token",
-        headers={'Accept': 'application/json', 'Accept-Language': 'en_US'},
-        data={'grant_type': 'client_credentials'},
-        auth=(client_id, client_secret),
-        timeout=20,
-    )
-    resp.raise_for_status()
-    return resp.json().get('access_token')
-
+# Token caching, keep-alive and retries live in main/paypal_client.py
+import uuid
+from .paypal_client import paypal_client
 
 @login_required
 @csrf_exempt
@@ -1347,7 +1356,6 @@ def paypal_create_order(request):
         amount = 0.01
     currency = 'USD'
     try:
-        access_token = _paypal_access_token()
         # Build return/cancel URLs for redirect flow
         return_url = request.build_absolute_uri(reverse('main:paypal_return')) + f"?order_id={order_id}"
         cancel_url = request.build_absolute_uri(reverse('main:paypal_cancel')) + f"?order_id={order_id}"
@@ -1366,15 +1374,7 @@ def paypal_create_order(request):
                 'cancel_url': cancel_url
             }
         }
-        resp = requests.post(
-            f"{_paypal_base_url()}/v2/checkout/orders",
-            headers={
-                'Content-Type': 'application/json',
-                'Authorization': f'Bearer {access_token}'
-            },
-            json=payload,
-            timeout=30,
-        )
+        resp = paypal_client.create_order(payload, request_id=f"create-{order_id}-{uuid.uuid4().hex}")
         data = resp.json()
         if resp.status_code not in (200, 201):
             logger.error(f"PayPal create error: status={resp.status_code} data={data}")
@@ -1416,15 +1416,7 @@ def paypal_capture_order(request):
         return JsonResponse({'success': False, 'message': 'Order not found'}, status=404)
 
     try:
-        access_token = _paypal_access_token()
-        resp = requests.post(
-            f"{_paypal_base_url()}/v2/checkout/orders/{paypal_order_id}/capture",
-            headers={
-                'Content-Type': 'application/json',
-                'Authorization': f'Bearer {access_token}'
-            },
-            timeout=30,
-        )
+        resp = paypal_client.capture_order(paypal_order_id)
         data = resp.json()
         if resp.status_code not in (200, 201):
             logger.error(f"PayPal capture error: status={resp.status_code} data={data}")
@@ -1442,7 +1434,7 @@ def paypal_capture_order(request):
             except Exception:
                 pass
 
-            # Send email: payment received
+            # Queue email: payment received
             try:
                 recipient = request.user.email
                 if recipient:
@@ -1458,11 +1450,11 @@ def paypal_capture_order(request):
                         'headline': 'Payment received ✔',
                         'subtext': 'Your order is now being processed.'
                     }
-                    send_html_email(subject, 'emails/payment_received.html', context_email, recipient)
+                    notification_outbox.enqueue_email('payment_received', order_id, recipient, subject, 'emails/payment_received.html', context_email)
             except Exception as e:
-                logger.exception(f"Email send failed (PayPal payment). {e}")
+                logger.exception(f"Queueing email failed (PayPal payment): {e}")
             
-            # Send Telegram notification to owner (payment received)
+            # Queue Telegram notification to owner (payment received)
             try:
                 payment_notification_data = {
                     'order_number': order.get('order_number', order_id),
@@ -1472,9 +1464,9 @@ def paypal_capture_order(request):
                     'customer_email': request.user.email or '',
                     'items': order.get('items', []),
                 }
-                send_payment_notification(payment_notification_data)
+                notification_outbox.enqueue_telegram('payment_received', order_id, 'payment', payment_notification_data)
             except Exception as e:
-                logger.exception(f"Telegram notification failed (PayPal payment): {e}")
+                logger.exception(f"Queueing Telegram notification failed (PayPal payment): {e}")
 
             return JsonResponse({'success': True, 'order_id': order_id, 'order_number': order.get('order_number', '')})
 
@@ -1494,15 +1486,7 @@ def paypal_return(request):
         return redirect('main:payment')
     # Reuse capture logic
     try:
-        access_token = _paypal_access_token()
-        resp = requests.post(
-            f"{_paypal_base_url()}/v2/checkout/orders/{paypal_order_id}/capture",
-            headers={
-                'Content-Type': 'application/json',
-                'Authorization': f'Bearer {access_token}'
-            },
-            timeout=30,
-        )
+        resp = paypal_client.capture_order(paypal_order_id)
         data = resp.json()
         if resp.status_code in (200, 201) and data.get('status') == 'COMPLETED':
             # Update order
@@ -1514,7 +1498,7 @@ def paypal_return(request):
                 )
             except Exception:
                 pass
-            # Email
+            # Queue email
             try:
                 recipient = request.user.email
                 order = mongodb_manager.get_order_by_id(order_id) or {}
@@ -1531,11 +1515,11 @@ def paypal_return(request):
                         'headline': 'Payment received ✔',
                         'subtext': 'Your order is now being processed.'
                     }
-                    send_html_email(subject, 'emails/payment_received.html', context_email, recipient)
+                    notification_outbox.enqueue_email('payment_received', order_id, recipient, subject, 'emails/payment_received.html', context_email)
             except Exception as e:
-                logger.exception(f"Email send failed (PayPal return). {e}")
+                logger.exception(f"Queueing email failed (PayPal return): {e}")
             
-            # Send Telegram notification to owner (payment received via redirect)
+            # Queue Telegram notification to owner (payment received via redirect)
             try:
                 order = mongodb_manager.get_order_by_id(order_id) or {}
                 payment_notification_data = {
@@ -1546,9 +1530,9 @@ def paypal_return(request):
                     'customer_email': request.user.email or '',
                     'items': order.get('items', []),
                 }
-                send_payment_notification(payment_notification_data)
+                notification_outbox.enqueue_telegram('payment_received', order_id, 'payment', payment_notification_data)
             except Exception as e:
-                logger.exception(f"Telegram notification failed (PayPal return): {e}")
+                logger.exception(f"Queueing Telegram notification failed (PayPal return): {e}")
             
             # Redirect to thanks
             order = mongodb_manager.get_order_by_id(order_id) or {}
@@ -1565,12 +1549,17 @@ def paypal_return(request):
 
 @login_required
 def paypal_cancel(request):
-    """Handle PayPal redirect cancel."""
+    """Handle PayPal redirect cancel: the order is cancelled and its stock released."""
     order_id = request.GET.get('order_id')
-    messages.info(request, 'PayPal payment was cancelled.')
     if order_id:
         order = mongodb_manager.get_order_by_id(order_id) or {}
-        return redirect(f"{reverse('main:payment')}?order_id={order_id}&order_number={order.get('order_number','')}&payment_method=paypal")
+        if order and order.get('user_id') == get_mongo_user_id(request):
+            if order_service.cancel_unpaid_order(order_id):
+                # Items stay in the cart, so the customer can check out again
+                messages.info(request, 'PayPal payment was cancelled. Your order was cancelled and your cart kept.')
+                return redirect('main:checkout')
+            return redirect('main:order_detail', order_id=order_id)
+    messages.info(request, 'PayPal payment was cancelled.')
     return redirect('main:checkout')
 
 
@@ -1697,7 +1686,7 @@ def generate_bakong_qr(request):
 @login_required
 @csrf_exempt
 def check_payment_status(request):
-    """Check if Bakong payment has been completed"""
+    """Report whether a Bakong payment has completed (reads the reconciler's state)"""
     if request.method == 'GET':
         try:
             order_id = request.GET.get('order_id')
@@ -1708,111 +1697,50 @@ def check_payment_status(request):
             order = mongodb_manager.get_order_by_id(order_id)
             if not order:
                 return JsonResponse({'success': False, 'paid': False, 'message': 'Order not found'})
+            if order.get('payment_status') == 'completed':
+                return JsonResponse({'paid': True, 'message': 'Payment completed successfully!'})
+            if order.get('payment_status') in PAYMENT_FINAL_STATUSES:
+                return JsonResponse({
+                    'paid': False,
+                    'payment_status': order['payment_status'],
+                    'message': f"Payment {order['payment_status']}",
+                })
             
             # Get payment record
-            from bson import ObjectId
-            from pymongo import DESCENDING
-            
-            payment_doc = mongodb_manager.payments_collection.find_one({
-                'order_id': ObjectId(order_id)
-            }, sort=[('created_at', DESCENDING)])
-            
+            payment_doc = bakong_reconciler.latest_payment(order_id, {
+                'order_id': 1, 'user_id': 1, 'status': 1, 'updated_at': 1,
+                'bakong_checked_at': 1, 'payment_details.md5_hash': 1,
+            })
             if not payment_doc:
                 return JsonResponse({'paid': False, 'message': 'Payment record not found'})
-            
-            md5_hash = payment_doc.get('payment_details', {}).get('md5_hash')
-            if not md5_hash:
+            if payment_doc.get('status') == 'completed':
+                return JsonResponse({'paid': True, 'message': 'Payment completed successfully!'})
+            if not (payment_doc.get('payment_details') or {}).get('md5_hash'):
                 return JsonResponse({'paid': False, 'message': 'MD5 hash not found'})
             
-            # Check payment status using Bakong API
-            try:
-                from bakong_khqr import KHQR
-                from decouple import config
-                
-                bakong_token = config('BAKONG_TOKEN', default='', cast=str).strip()
-                if not bakong_token:
-                    return JsonResponse({'paid': False, 'message': 'Bakong token not configured. Please check your .env file.'})
-                
-                khqr = KHQR(bakong_token)
-                payment_status = khqr.check_payment(md5_hash)
-                
-                is_paid = payment_status == 'PAID' or payment_status == 'paid'
-                
-                # Update payment and order status if paid
-                if is_paid:
-                    payment_id = str(payment_doc.get('_id'))
-                    mongodb_manager.update_payment_status(payment_id, 'completed')
-                    # Update both order status and payment_status
-                    mongodb_manager.update_order_status(order_id, 'completed', payment_status='completed')
-                    # Ensure payment_method is set to the actual method (Bakong here)
-                    try:
-                        from bson import ObjectId
-                        mongodb_manager.orders_collection.update_one(
-                            {'_id': ObjectId(order_id)},
-                            {'$set': {'payment_method': 'Bakong'}}
-                        )
-                        order['payment_method'] = 'Bakong'
-                    except Exception:
-                        pass
-                    # Email: payment completed
-                    try:
-                        recipient = request.user.email
-                        if recipient:
-                            order_url = request.build_absolute_uri(reverse('main:order_detail', args=[order_id]))
-                            subject = f"Payment received for Order {order.get('order_number', order_id)}"
-                            context_email = {
-                                'user_name': request.user.get_full_name() or request.user.username,
-                                'order_number': order.get('order_number', order_id),
-                                'total_amount': f"${order.get('total_amount', 0):.2f}",
-                                'payment_method': order.get('payment_method', 'Bakong'),
-                                'order_url': order_url,
-                                'cta_label': 'View your order',
-                                'headline': 'Payment received ✔',
-                                'subtext': 'Your order is now being processed.'
-                            }
-                            send_html_email(subject, 'emails/payment_received.html', context_email, recipient)
-                    except Exception as e:
-                        logger.exception(f"Email send failed (payment completed). To={getattr(request.user, 'email', None)} Host={getattr(settings, 'EMAIL_HOST', None)} User={getattr(settings, 'EMAIL_HOST_USER', None)} Port={getattr(settings, 'EMAIL_PORT', None)} TLS={getattr(settings, 'EMAIL_USE_TLS', None)}: {e}")
-                    
-                    # Send Telegram notification to owner (Bakong payment completed)
-                    try:
-                        payment_notification_data = {
-                            'order_number': order.get('order_number', order_id),
-                            'total_amount': order.get('total_amount', 0),
-                            'payment_method': order.get('payment_method', 'Bakong'),
-                            'customer_name': request.user.get_full_name() or request.user.username,
-                            'customer_email': request.user.email or '',
-                            'items': order.get('items', []),
-                        }
-                        send_payment_notification(payment_notification_data)
-                    except Exception as e:
-                        logger.exception(f"Telegram notification failed (Bakong payment): {e}")
-                    
-                    # Clear only selected items from user's cart after successful payment
-                    # The frontend will handle removing only checkoutItems from localStorage
-                    # We'll update the cart on server with remaining items when frontend calls save_cart
-                    
+            # The reconcile_bakong_payments worker checks pending payments in bulk;
+            # only ask Bakong directly if it has not looked at this one recently
+            if bakong_reconciler.is_stale(payment_doc):
+                try:
+                    order_link = request.build_absolute_uri(reverse('main:order_detail', args=[order_id]))
+                    if bakong_reconciler.check_one(payment_doc, order_link):
+                        return JsonResponse({'paid': True, 'message': 'Payment completed successfully!'})
+                except ImportError:
                     return JsonResponse({
-                        'paid': True,
-                        'message': 'Payment completed successfully!'
+                        'paid': False,
+                        'message': 'Bakong KHQR package is not installed'
                     })
-                else:
+                except Exception as e:
+                    print(f"Error checking payment status: {e}")
                     return JsonResponse({
                         'paid': False,
-                        'message': 'Payment is still pending'
+                        'message': f'Error checking payment: {str(e)}'
                     })
-                    
-            except ImportError:
-                return JsonResponse({
-                    'paid': False,
-                    'message': 'Bakong KHQR package is not installed'
-                })
-            except Exception as e:
-                print(f"Error checking payment status: {e}")
-                return JsonResponse({
-                    'paid': False,
-                    'message': f'Error checking payment: {str(e)}'
-                })
+            
+            return JsonResponse({
+                'paid': False,
+                'message': 'Payment is still pending'
+            })
             
         except Exception as e:
             import traceback
@@ -1826,6 +1754,97 @@ def check_payment_status(request):
     return JsonResponse({'success': False, 'paid': False, 'message': 'Invalid request method'})
 
 
+
+# --- Payment status push (served by the ASGI app, see ECommerce/asgi.py) ---
+PAYMENT_FINAL_STATUSES = ('completed', 'cancelled', 'failed')
+
+
+def _payment_status_event(payment_status):
+    data = json.dumps({'payment_status': payment_status, 'paid': payment_status == 'completed'})
+    return f"event: status\ndata: {data}\n\n"
+
+
+def _nudge_bakong(order_id, order_link):
+    """Ask Bakong directly if the reconciler worker has not checked this order lately."""
+    try:
+        payment_doc = bakong_reconciler.latest_payment(order_id, {
+            'order_id': 1, 'user_id': 1, 'status': 1, 'updated_at': 1,
+            'bakong_checked_at': 1, 'payment_details.md5_hash': 1,
+        })
+        if (payment_doc and payment_doc.get('status') == 'pending'
+                and (payment_doc.get('payment_details') or {}).get('md5_hash')
+                and bakong_reconciler.is_stale(payment_doc)):
+            bakong_reconciler.check_one(payment_doc, order_link)
+    except Exception as e:
+        print(f"Error checking Bakong payment for order {order_id}: {e}")
+
+
+async def _payment_status_events(order_id, payment_status, order_link):
+    """SSE body: the current status, then every change until final or PAYMENT_STREAM_TIMEOUT."""
+    yield 'retry: 3000\n\n' + _payment_status_event(payment_status)
+    deadline = time.monotonic() + settings.PAYMENT_STREAM_TIMEOUT
+    while payment_status not in PAYMENT_FINAL_STATUSES:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break  # the browser reconnects after `retry`
+        new_status = await payment_hub.wait_for_change(
+            order_id, payment_status, min(settings.PAYMENT_STREAM_HEARTBEAT, remaining),
+        )
+        if new_status is None:
+            await sync_to_async(_nudge_bakong)(order_id, order_link)
+            yield ': keep-alive\n\n'
+            continue
+        payment_status = new_status
+        yield _payment_status_event(payment_status)
+
+
+@login_required
+async def payment_status_stream(request):
+    """
+    Push payment status changes for one order.
+
+    Sends Server-Sent Events when the client accepts text/event-stream,
+    otherwise long-polls: waits up to ?wait= seconds for payment_status to
+    differ from ?since= and returns it as JSON.
+    """
+    order_id = request.GET.get('order_id')
+    if not order_id:
+        return JsonResponse({'success': False, 'message': 'Order ID is required'}, status=400)
+    order = await sync_to_async(mongodb_manager.get_order_by_id)(order_id)
+    if not order:
+        return JsonResponse({'success': False, 'message': 'Order not found'}, status=404)
+    user_id = await sync_to_async(get_mongo_user_id)(request)
+    if order.get('user_id') != user_id:
+        return JsonResponse({'success': False, 'message': 'You do not have permission to view this order'}, status=403)
+    payment_status = order.get('payment_status', 'pending')
+
+    if 'text/event-stream' not in request.headers.get('Accept', ''):
+        since = request.GET.get('since') or payment_status
+        try:
+            wait = min(float(request.GET.get('wait', settings.PAYMENT_STREAM_TIMEOUT)), settings.PAYMENT_STREAM_TIMEOUT)
+        except ValueError:
+            wait = settings.PAYMENT_STREAM_TIMEOUT
+        if payment_status == since and payment_status not in PAYMENT_FINAL_STATUSES and wait > 0:
+            payment_status = await payment_hub.wait_for_change(order_id, since, wait) or since
+        return JsonResponse({
+            'success': True,
+            'payment_status': payment_status,
+            'paid': payment_status == 'completed',
+            'changed': payment_status != since,
+        })
+
+    if isinstance(request, ASGIRequest):
+        order_link = request.build_absolute_uri(reverse('main:order_detail', args=[order_id]))
+        body = _payment_status_events(order_id, payment_status, order_link)
+    else:
+        # Under WSGI a held stream would tie up a worker and be buffered;
+        # send the current state and let EventSource reconnect after `retry`
+        body = ['retry: 3000\n\n' + _payment_status_event(payment_status)]
+    response = StreamingHttpResponse(body, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # disable nginx buffering
+    return response
+
 def order_thanks(request):
     """Thank you page after successful order"""
     order_id = request.GET.get('order_id')
@@ -1862,9 +1881,8 @@ def order_detail(request, order_id):
     
     # Check if order belongs to user
     if request.user.is_authenticated:
-        mongo_user = mongodb_manager.get_user_by_username(request.user.username)
-        if mongo_user:
-            user_id = str(mongo_user.get('_id'))
+        user_id = get_mongo_user_id(request)
+        if user_id:
             if order.get('user_id') != user_id:
                 messages.error(request, 'You do not have permission to view this order')
                 return redirect('main:home')
@@ -1895,11 +1913,10 @@ def cancel_order(request):
                 return JsonResponse({'success': False, 'message': 'Order not found'})
             
             # Check if order belongs to user
-            mongo_user = mongodb_manager.get_user_by_username(request.user.username)
-            if not mongo_user:
+            user_id = get_mongo_user_id(request)
+            if not user_id:
                 return JsonResponse({'success': False, 'message': 'User not found'})
             
-            user_id = str(mongo_user.get('_id'))
             if order.get('user_id') != user_id:
                 return JsonResponse({'success': False, 'message': 'You do not have permission to cancel this order'})
             
@@ -1922,9 +1939,11 @@ def cancel_order(request):
                 except Exception:
                     pass
             success = mongodb_manager.update_order_status(order_id, 'cancelled', payment_status='cancelled' if cancel_payment else order.get('payment_status', 'pending'))
+            if success:
+                order_service.release_stock(order_id)
             
             if success:
-                # Send cancellation email
+                # Queue cancellation email
                 try:
                     recipient = request.user.email
                     if recipient:
@@ -1940,9 +1959,9 @@ def cancel_order(request):
                             'headline': 'Your order was cancelled',
                             'subtext': 'If this was a mistake, you can place a new order.'
                         }
-                        send_html_email(subject, 'emails/order_cancelled.html', context_email, recipient)
+                        notification_outbox.enqueue_email('order_cancelled', order_id, recipient, subject, 'emails/order_cancelled.html', context_email)
                 except Exception as e:
-                    logger.exception(f"Email send failed (order cancelled). To={getattr(request.user, 'email', None)} Host={getattr(settings, 'EMAIL_HOST', None)} User={getattr(settings, 'EMAIL_HOST_USER', None)} Port={getattr(settings, 'EMAIL_PORT', None)} TLS={getattr(settings, 'EMAIL_USE_TLS', None)}: {e}")
+                    logger.exception(f"Queueing email failed (order cancelled): {e}")
                 return JsonResponse({'success': True, 'message': 'Order cancelled successfully'})
             else:
                 return JsonResponse({'success': False, 'message': 'Failed to cancel order'})
@@ -70,6 +70,8 @@ echo "  http://YOUR_VPS_IP"
 echo ""
 echo "To view logs, run:"
 echo "  docker compose logs -f"
+echo "  docker compose logs -f notifications   # email / Telegram worker"
+echo "  docker compose logs -f bakong          # Bakong payment reconciler"
 echo ""
 echo "To stop the application, run:"
 echo "  docker compose down"